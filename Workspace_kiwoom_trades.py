@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
 # Workspace_kiwoom_trades.py: 키움증권 매매 내역(최근 7일)을 조회하여 구글 시트 '매매일지_Raw'에 기록 (공휴일 제외)
 # (텔레그램 알림 수정: 설정 파일 로드 방식)
+# - 누락 기간 백필: 영업일을 청크로 나눠 병렬 조회 (호출 속도는 rate_limiter의 키움 한도), 청크 순서대로 append_rows 1회씩 기록
+# - 일자별 체크포인트(kiwoom_trades_state.json): 시트 기록까지 끝난 지난 날짜는 다시 조회하지 않음
+# - 사용: python Workspace_kiwoom_trades.py [--from=YYYY-MM-DD] [--to=YYYY-MM-DD] [--force(체크포인트 무시)]
 
 import gspread
 import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
+import json
+import sheets_client
+from sheet_decode import clean_num_str, to_date_series # API/시트 값 숫자·날짜 변환 공용 규칙
 from datetime import datetime, timedelta, date
 import time
 import traceback
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 # import requests # telegram_utils 사용하므로 직접 임포트 불필요
 
 # 공휴일 처리를 위한 라이브러리 임포트
@@ -34,6 +40,10 @@ TRADES_WORKSHEET_NAME = '매매일지_Raw' # 키움 거래 기록용 시트 이
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 JSON_KEYFILE_PATH = os.path.join(CURRENT_DIR, 'stock-auto-writer-44eaa06c140c.json')
 DEFAULT_FETCH_DAYS = 7
+MAX_BACKFILL_DAYS = 400 # 마지막 기록일이 이보다 오래됐으면 최근 이 기간만 조회
+BACKFILL_CHUNK_DAYS = 10 # 청크 하나가 조회할 영업일 수 (청크마다 시트 append_rows 1회 + 체크포인트 저장)
+MAX_FETCH_WORKERS = 4 # 동시에 조회할 청크 수 (전체 호출 속도는 rate_limiter의 키움 한도가 결정)
+TRADES_STATE_PATH = os.path.join(CURRENT_DIR, 'kiwoom_trades_state.json') # 일자별 조회 완료 체크포인트 {'days': {YYYY-MM-DD: {trades, fetched_at}}, 'pending': [실패/미완료 날짜]}
 TRADE_LOG_COLUMNS = [
     '날짜', '시간', '증권사', '계좌구분', '종목코드', '종목명',
     '매매구분', '수량', '단가', '금액', '수수료', '세금', '메모'
@@ -46,12 +56,9 @@ def setup_google_sheet():
     """구글 시트에 연결하고 '매매일지_Raw' 워크시트 객체를 반환합니다."""
     worksheet = None
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials)
-        spreadsheet = gc.open(GOOGLE_SHEET_NAME)
+        sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME) # 공용 클라이언트
         try:
-            worksheet = spreadsheet.worksheet(TRADES_WORKSHEET_NAME)
+            worksheet = sheets_client.get_worksheet(TRADES_WORKSHEET_NAME, GOOGLE_SHEET_NAME)
             print(f"✅ Google Sheet '{GOOGLE_SHEET_NAME}/{TRADES_WORKSHEET_NAME}' 워크시트 열기 성공.")
             header = worksheet.row_values(1)
             if not header or header != TRADE_LOG_COLUMNS:
@@ -68,7 +75,7 @@ def setup_google_sheet():
                          print(f"❗️ 헤더 자동 업데이트 실패. 수동 확인 필요: {e_header}")
         except gspread.exceptions.WorksheetNotFound:
             print(f"⚠️ 워크시트 '{TRADES_WORKSHEET_NAME}'을(를) 찾을 수 없어 새로 생성합니다.")
-            worksheet = spreadsheet.add_worksheet(title=TRADES_WORKSHEET_NAME, rows="1000", cols=len(TRADE_LOG_COLUMNS))
+            worksheet = sheets_client.add_worksheet(TRADES_WORKSHEET_NAME, rows="1000", cols=len(TRADE_LOG_COLUMNS), name=GOOGLE_SHEET_NAME)
             worksheet.append_row(TRADE_LOG_COLUMNS, value_input_option='USER_ENTERED')
             print(f"✅ 워크시트 '{TRADES_WORKSHEET_NAME}' 생성 및 헤더 추가 완료.")
         return worksheet
@@ -84,19 +91,6 @@ def setup_google_sheet():
         return None
 
 # --- 데이터 처리 함수 ---
-def clean_num_str(num_str, type_func=int):
-    """문자열 형태의 숫자를 실제 숫자 타입으로 변환"""
-    if not num_str: return type_func(0)
-    try:
-        cleaned_str = str(num_str).replace(',', '')
-        is_negative = cleaned_str.startswith('-')
-        cleaned = cleaned_str.lstrip('-').lstrip('0')
-        if not cleaned: return type_func(0)
-        value = type_func(cleaned)
-        return -value if is_negative else value
-    except (ValueError, TypeError):
-        return type_func(0)
-
 def format_trade_data(api_response_data, base_date):
     """ka10170 응답 데이터를 매매일지 형식에 맞게 변환"""
     formatted_rows = []
@@ -135,8 +129,104 @@ def format_trade_data(api_response_data, base_date):
 
     return formatted_rows
 
+# --- 체크포인트 (일자별 조회 완료 기록) ---
+def load_trades_state():
+    """일자별 체크포인트(JSON)를 읽습니다. 없거나 손상된 경우 빈 체크포인트."""
+    if not os.path.exists(TRADES_STATE_PATH): return {'days': {}, 'pending': []}
+    try:
+        with open(TRADES_STATE_PATH, 'r', encoding='utf-8') as f: state = json.load(f)
+        if not isinstance(state, dict) or not isinstance(state.get('days'), dict): print("⚠️ 매매일지 체크포인트 형식 오류. 무시합니다."); return {'days': {}, 'pending': []}
+        if not isinstance(state.get('pending'), list): state['pending'] = []
+        return state
+    except Exception as e: print(f"⚠️ 매매일지 체크포인트 로드 실패 ({e}). 무시합니다."); return {'days': {}, 'pending': []}
+
+def save_trades_state(state):
+    """체크포인트 저장 (MAX_BACKFILL_DAYS보다 오래된 날짜는 정리)"""
+    oldest = (datetime.now().date() - timedelta(days=MAX_BACKFILL_DAYS)).strftime('%Y-%m-%d')
+    state['days'] = {day: info for day, info in sorted(state['days'].items()) if day >= oldest}
+    state['pending'] = sorted(day for day in set(state.get('pending', [])) if day >= oldest and day not in state['days'])
+    try:
+        with open(TRADES_STATE_PATH, 'w', encoding='utf-8') as f: json.dump(state, f, ensure_ascii=False, indent=4)
+        return True
+    except Exception as e: print(f"❌ 매매일지 체크포인트 저장 실패: {e}"); return False
+# --- ---
+
+# --- 백필 (청크 병렬 조회) ---
+def get_business_days(start_date, end_date):
+    """start_date ~ end_date 중 영업일(주말/공휴일 제외) 리스트"""
+    kr_holidays = {} # 공휴일 정보 초기화
+    if holidays:
+        try:
+            kr_holidays = holidays.KR(years=range(start_date.year, end_date.year + 1), observed=True)
+            print(f"ℹ️ {start_date.year}-{end_date.year}년 공휴일 정보 로드 완료.")
+        except Exception as e_holiday:
+            print(f"⚠️ 공휴일 정보 로드 중 오류 발생: {e_holiday}. 공휴일 제외 없이 진행합니다.")
+            kr_holidays = {} # 오류 시 빈 딕셔너리로 설정
+    days = []; current_date = start_date
+    while current_date <= end_date:
+        if current_date.weekday() < 5 and current_date not in kr_holidays: days.append(current_date)
+        current_date += timedelta(days=1)
+    return days
+
+def fetch_trades_for_day(day):
+    """
+    하루치 매매일지 조회 (연속 페이지 포함) → (YYYY-MM-DD, 매매일지 행 리스트, 완료 여부).
+    API 실패 시 행 리스트 None. 연속 조회가 중간에 멈췄으면 받은 행은 반환하되 완료 여부 False (체크포인트에 기록하지 않음)
+    """
+    date_str_ymd = day.strftime("%Y-%m-%d")
+    trade_log_result = kiwoom_api.get_daily_trading_log(base_date=day.strftime("%Y%m%d"), ottks_type='0', cash_credit_type='0')
+    if not trade_log_result or not trade_log_result.get('success'):
+        print(f"    - {date_str_ymd}: API 조회 실패 또는 오류 응답. 다음 실행 때 다시 조회합니다."); return date_str_ymd, None, False
+    complete = bool(trade_log_result.get('complete'))
+    if not complete: print(f"    - {date_str_ymd}: 연속 조회 미완료 ({trade_log_result.get('pages')}페이지까지). 받은 내역만 기록하고 다음 실행 때 다시 조회합니다.")
+    return date_str_ymd, format_trade_data(trade_log_result.get('data') or {}, date_str_ymd), complete
+
+def fetch_chunk(days):
+    """청크(영업일 리스트)를 날짜 순서대로 조회 → [(YYYY-MM-DD, 행 리스트 또는 None, 완료 여부)]"""
+    return [fetch_trades_for_day(day) for day in days]
+
+def backfill_trades(worksheet, days, existing_records_keys, state, chunk_days=BACKFILL_CHUNK_DAYS, max_workers=MAX_FETCH_WORKERS):
+    """
+    영업일 리스트를 청크로 나눠 병렬 조회하고, 청크 순서대로 (시트 날짜 순서 유지) 중복 제거 후 append_rows 1회씩 기록합니다.
+    기록이 끝난 지난 날짜는 체크포인트에 저장 (오늘은 거래가 더 생길 수 있어 저장하지 않음).
+    API 실패 / 연속 조회 미완료 날짜는 실패 일수로 세고 체크포인트의 pending에 저장 (마지막 기록일 이전이어도 다음 실행 때 다시 조회).
+    반환: (신규 거래 건수, API 조회 일수, 실패 일수). 시트 기록 실패 시 IOError (그 전 청크까지는 기록/체크포인트 완료).
+    """
+    chunks = [days[i:i + chunk_days] for i in range(0, len(days), chunk_days)]
+    if not chunks: return 0, 0, 0
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    total_new = 0; fetched_days = 0; failed_days = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))))
+    try:
+        for chunk_no, chunk_result in enumerate(executor.map(fetch_chunk, chunks), start=1): # 조회는 병렬, 결과는 청크 순서대로
+            chunk = chunks[chunk_no - 1]; new_rows = []; done_days = {}; retry_days = []
+            for date_str_ymd, formatted_trades, complete in chunk_result:
+                fetched_days += 1
+                if formatted_trades is None: failed_days += 1; retry_days.append(date_str_ymd); continue
+                if not complete: failed_days += 1; retry_days.append(date_str_ymd) # 받은 행은 기록 (중복 체크로 재조회 시 중복 없음), 완료 기록 제외
+                for trade_row in formatted_trades:
+                    key = (trade_row[0], str(trade_row[4]).strip(), str(trade_row[6]).strip())
+                    if key not in existing_records_keys:
+                        new_rows.append(trade_row)
+                        existing_records_keys.add(key) # 추가된 키도 중복 방지 위해 기록
+                if complete: done_days[date_str_ymd] = len(formatted_trades)
+            if new_rows:
+                try: worksheet.append_rows(new_rows, value_input_option='USER_ENTERED')
+                except Exception as e: raise IOError(f"❌ 구글 시트 데이터 추가 중 오류 발생 ({chunk[0]}~): {e}") from e
+                total_new += len(new_rows)
+            print(f"  > 청크 {chunk_no}/{len(chunks)} ({chunk[0]} ~ {chunk[-1]}): 조회 {len(chunk_result)}일, 신규 {len(new_rows)}건 기록")
+            fetched_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for date_str_ymd, trade_count in done_days.items():
+                if date_str_ymd < today_str: state['days'][date_str_ymd] = {'trades': trade_count, 'fetched_at': fetched_at}
+            state['pending'] = [day for day in state['pending'] if day not in done_days] + retry_days
+            save_trades_state(state)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True) # 시트 기록 실패 시 아직 시작하지 않은 청크는 취소
+    return total_new, fetched_days, failed_days
+# --- ---
+
 # --- 메인 실행 로직 ---
-def main():
+def main(start_date=None, end_date=None, force=False):
     start_time = time.time() # 시작 시간 기록
     print(f"🚀 키움증권 매매일지 기록 시작 (최근 {DEFAULT_FETCH_DAYS}일 기본)")
     total_new_trades = 0 # 새로 추가된 거래 건수
@@ -150,9 +240,9 @@ def main():
     if not worksheet:
         raise ConnectionError("🔥 구글 시트 연결 실패! 프로그램 종료.")
 
-    # 3. 마지막 기록 날짜 확인 및 시작 날짜 결정
+    # 3. 마지막 기록 날짜 확인
     last_processed_date_str = None # 마지막 기록된 날짜 (YYYY-MM-DD)
-    existing_records_keys = set() # 중복 체크용 키: (날짜(YYYY-MM-DD), 종목코드, 매매구분)
+    valid_trades = None # 시트의 '키움' 거래 기록 (날짜 변환 성공분, 중복 체크용)
     try:
         all_data = worksheet.get_all_values() # 헤더 포함 전체 데이터 가져오기
         if len(all_data) > 1: # 헤더 외 데이터 있는지 확인
@@ -161,18 +251,11 @@ def main():
             if all(col in df_sheet.columns for col in required_cols):
                 df_kiwoom = df_sheet[df_sheet['증권사'] == '키움'].copy()
                 if not df_kiwoom.empty:
-                    df_kiwoom['날짜_dt'] = pd.to_datetime(df_kiwoom['날짜'], errors='coerce')
+                    df_kiwoom['날짜_dt'] = to_date_series(df_kiwoom['날짜'])
                     valid_trades = df_kiwoom.dropna(subset=['날짜_dt']).copy() # 날짜 변환 성공한 데이터만
                     if not valid_trades.empty:
-                        last_date = valid_trades['날짜_dt'].max().date()
-                        last_processed_date_str = last_date.strftime('%Y-%m-%d')
+                        last_processed_date_str = valid_trades['날짜_dt'].max().date().strftime('%Y-%m-%d')
                         print(f"✅ 마지막 '키움' 거래 기록 날짜: {last_processed_date_str}.")
-                        recent_start_date = last_date - timedelta(days=DEFAULT_FETCH_DAYS + 5) # 여유있게 범위 설정
-                        recent_trades = valid_trades[valid_trades['날짜_dt'].dt.date >= recent_start_date]
-                        for index, row in recent_trades.iterrows():
-                            key = (row['날짜_dt'].strftime('%Y-%m-%d'), str(row.get('종목코드', '')).strip(), str(row.get('매매구분', '')).strip())
-                            existing_records_keys.add(key)
-                        print(f"  > 최근 기존 '키움' 기록 {len(existing_records_keys)}건 확인 (중복 체크용)")
                     else: print(f"ℹ️ 시트에 유효한 날짜의 '키움' 거래 기록 없음.")
                 else: print(f"ℹ️ 시트에 '키움' 증권사 거래 기록 없음.")
             else: print(f"ℹ️ 시트 헤더에 필요한 컬럼({required_cols}) 없음.")
@@ -180,94 +263,61 @@ def main():
     except Exception as e:
         print(f"⚠️ 기존 매매일지 로드/처리 중 오류 발생: {e}. 기본 조회 기간(최근 {DEFAULT_FETCH_DAYS}일)을 사용합니다.")
         traceback.print_exc()
-        last_processed_date_str = None # 오류 시 처음부터 조회하도록
+        last_processed_date_str = None; valid_trades = None # 오류 시 처음부터 조회하도록
 
-    # 4. API 조회 시작/종료 날짜 결정
+    # 4. API 조회 시작/종료 날짜 결정 (--from / --to 지정 시 그 기간)
     today = datetime.now().date()
-    end_fetch_date = today # 조회 종료일은 오늘
-    if last_processed_date_str:
+    end_fetch_date = min(end_date, today) if end_date else today # 조회 종료일은 오늘
+    if start_date:
+        start_fetch_date = start_date
+    elif last_processed_date_str:
         start_fetch_date = datetime.strptime(last_processed_date_str, '%Y-%m-%d').date() + timedelta(days=1)
-        max_fetch_days = 30
-        if (today - start_fetch_date).days > max_fetch_days:
-             print(f"⚠️ 마지막 기록일로부터 너무 오래되었습니다. 최대 {max_fetch_days}일 데이터만 조회합니다.")
-             start_fetch_date = today - timedelta(days=max_fetch_days -1)
+        if (today - start_fetch_date).days > MAX_BACKFILL_DAYS:
+             print(f"⚠️ 마지막 기록일로부터 너무 오래되었습니다. 최대 {MAX_BACKFILL_DAYS}일 데이터만 조회합니다.")
+             start_fetch_date = today - timedelta(days=MAX_BACKFILL_DAYS - 1)
     else:
          start_fetch_date = today - timedelta(days=DEFAULT_FETCH_DAYS - 1)
          print(f"ℹ️ 기록 없음. 시작 날짜를 오늘로부터 {DEFAULT_FETCH_DAYS}일 전({start_fetch_date})으로 설정.")
 
-    if start_fetch_date > end_fetch_date:
+    state = load_trades_state()
+    if start_fetch_date > end_fetch_date and (start_date or not state['pending']):
         print(f"ℹ️ 조회할 새로운 날짜 범위가 없습니다 (시작: {start_fetch_date}, 종료: {end_fetch_date}). 종료합니다.")
         end_time = time.time()
         elapsed_time = end_time - start_time
-        return f"✅ `{SCRIPT_NAME}` 실행 완료 (신규 조회 대상 없음, 소요 시간: {elapsed_time:.2f}초)"
+        return f"✅ `{SCRIPT_NAME}` 실행 완료 (신규 조회 대상 없음, 소요 시간: {elapsed_time:.2f}초)", False
 
     print(f"🗓️ 키움 매매 내역 API 조회 기간: {start_fetch_date} ~ {end_fetch_date}")
 
-    # 5. 날짜별 API 호출 및 데이터 처리/기록
-    all_new_trades_formatted = [] # 새로 추가할 전체 거래 내역 리스트
-    current_date = start_fetch_date
-    api_call_count = 0
-    kr_holidays = {} # 공휴일 정보 초기화
-    if holidays:
-        try:
-            kr_holidays = holidays.KR(years=range(start_fetch_date.year, end_fetch_date.year + 1), observed=True)
-            print(f"ℹ️ {start_fetch_date.year}-{end_fetch_date.year}년 공휴일 정보 로드 완료.")
-        except Exception as e_holiday:
-            print(f"⚠️ 공휴일 정보 로드 중 오류 발생: {e_holiday}. 공휴일 제외 없이 진행합니다.")
-            kr_holidays = {} # 오류 시 빈 딕셔너리로 설정
-
-    while current_date <= end_fetch_date:
-        date_str_ymd = current_date.strftime("%Y-%m-%d") #<y_bin_46>-MM-DD
-        date_yyyymmdd = current_date.strftime("%Y%m%d") #<y_bin_46>MMDD (API 파라미터용)
-        weekday = current_date.weekday()
-        is_holiday_check = current_date in kr_holidays
-
-        if weekday >= 5 or is_holiday_check:
-            day_type = "주말" if weekday >= 5 else "공휴일"
-            # print(f"  > {date_str_ymd} ({day_type}): 건너<0xEB><0x81><0x91니다.") # 로그 간소화
-        else:
-            # --- 영업일에만 API 호출 ---
-            print(f"  > {date_str_ymd}: 키움 매매 내역 API 조회 시도...")
-            trade_log_result = kiwoom_api.get_daily_trading_log(base_date=date_yyyymmdd, ottks_type='0', cash_credit_type='0')
-            api_call_count += 1
-
-            if trade_log_result and trade_log_result.get('success'):
-                formatted_trades = format_trade_data(trade_log_result.get('data', {}), date_str_ymd)
-                if formatted_trades:
-                    print(f"    - {len(formatted_trades)}건의 거래 내역 확인.")
-                    added_count = 0
-                    for trade_row in formatted_trades:
-                        key = (trade_row[0], str(trade_row[4]).strip(), str(trade_row[6]).strip())
-                        if key not in existing_records_keys:
-                            all_new_trades_formatted.append(trade_row)
-                            existing_records_keys.add(key) # 추가된 키도 중복 방지 위해 기록
-                            added_count += 1
-                    if added_count > 0:
-                         print(f"    - {added_count}건의 신규 거래 내역 추가 예정.")
-                         total_new_trades += added_count # 총 신규 거래 건수 누적
-                else: print(f"    - 해당 날짜 거래 내역 없음.")
-            else: print(f"    - API 조회 실패 또는 오류 응답. 건너<0xEB><0x81><0x91니다.")
-            time.sleep(0.21) # API 연속 호출 방지 딜레이
-            # --- API 호출 종료 ---
-        current_date += timedelta(days=1)
+    # 5. 조회 대상 영업일 결정 (체크포인트에 기록 완료된 날짜 제외) + 중복 체크 키 준비
+    business_days = get_business_days(start_fetch_date, end_fetch_date)
+    fetch_days = business_days if force else [day for day in business_days if day.strftime('%Y-%m-%d') not in state['days']]
+    if len(fetch_days) < len(business_days): print(f"ℹ️ 체크포인트 기준 조회 완료된 {len(business_days) - len(fetch_days)}일은 건너뜁니다. (--force로 다시 조회)")
+    if not start_date: # 이전 실행에서 실패/미완료로 남은 날짜 (조회 기간 이전이어도) 다시 조회
+        retry_days = sorted({datetime.strptime(day, '%Y-%m-%d').date() for day in state['pending'] if day not in state['days']} - set(fetch_days))
+        retry_days = [day for day in retry_days if day <= end_fetch_date]
+        if retry_days: print(f"ℹ️ 이전 실행에서 실패/미완료된 {len(retry_days)}일을 다시 조회합니다: {', '.join(str(day) for day in retry_days)}")
+        fetch_days = sorted(set(fetch_days) | set(retry_days))
+    existing_records_keys = set() # 중복 체크용 키: (날짜(YYYY-MM-DD), 종목코드, 매매구분)
+    if valid_trades is not None and not valid_trades.empty and fetch_days:
+        range_trades = valid_trades[valid_trades['날짜_dt'].dt.date >= fetch_days[0]] # 조회 범위의 기존 기록만
+        for date_value, code, trade_type in zip(range_trades['날짜_dt'], range_trades['종목코드'], range_trades['매매구분']):
+            existing_records_keys.add((date_value.strftime('%Y-%m-%d'), str(code).strip(), str(trade_type).strip()))
+        print(f"  > 조회 범위의 기존 '키움' 기록 {len(existing_records_keys)}건 확인 (중복 체크용)")
 
-    # 6. 구글 시트에 신규 데이터 추가
-    if all_new_trades_formatted:
-        print(f"\n💾 총 {len(all_new_trades_formatted)} 건의 신규 '키움' 거래 내역을 '{TRADES_WORKSHEET_NAME}' 시트에 추가합니다...")
-        try:
-            worksheet.append_rows(all_new_trades_formatted, value_input_option='USER_ENTERED')
-            print("✅ 데이터 추가 완료!")
-        except Exception as e:
-            # 데이터 추가 실패 시 오류 발생
-            raise IOError(f"❌ 구글 시트 데이터 추가 중 오류 발생: {e}") from e
-    else:
-        print("\nℹ️ 구글 시트에 추가할 신규 '키움' 거래 내역이 없습니다.")
+    # 6. 청크 병렬 조회 + 청크별 구글 시트 기록
+    if fetch_days:
+        print(f"📥 {len(fetch_days)}개 영업일을 {BACKFILL_CHUNK_DAYS}일 단위 청크로 나눠 조회합니다 (동시 {MAX_FETCH_WORKERS}개).")
+    total_new_trades, api_call_count, failed_days = backfill_trades(worksheet, fetch_days, existing_records_keys, state)
+    if total_new_trades: print(f"\n✅ 총 {total_new_trades} 건의 신규 '키움' 거래 내역을 '{TRADES_WORKSHEET_NAME}' 시트에 추가했습니다.")
+    else: print("\nℹ️ 구글 시트에 추가할 신규 '키움' 거래 내역이 없습니다.")
+    if failed_days: print(f"⚠️ {failed_days}일은 API 조회 실패 또는 연속 조회 미완료로 다음 실행 때 다시 조회합니다.")
 
     end_time = time.time() # 종료 시간 기록
     elapsed_time = end_time - start_time
-    print(f"\n🏁 키움증권 매매일지 기록 작업 완료 (API 호출 {api_call_count}회, 소요 시간: {elapsed_time:.2f}초).")
-    # 성공 메시지 반환
-    return f"✅ `{SCRIPT_NAME}` 실행 완료 (신규 거래 {total_new_trades}건 추가, 소요 시간: {elapsed_time:.2f}초)"
+    print(f"\n🏁 키움증권 매매일지 기록 작업 완료 (API 조회 {api_call_count}일, 소요 시간: {elapsed_time:.2f}초).")
+    # 결과 메시지 + 실패 여부 반환 (실패/미완료 날짜가 있으면 경고 → 파이프라인이 같은 날 재실행 허용)
+    if failed_days: return f"⚠️ `{SCRIPT_NAME}` 실행 완료 (신규 거래 {total_new_trades}건 추가, {failed_days}일 조회 실패/미완료, 소요 시간: {elapsed_time:.2f}초)", True
+    return f"✅ `{SCRIPT_NAME}` 실행 완료 (신규 거래 {total_new_trades}건 추가, 소요 시간: {elapsed_time:.2f}초)", False
 
 # --- 스크립트 실행 및 텔레그램 알림 ---
 if __name__ == '__main__':
@@ -275,10 +325,12 @@ if __name__ == '__main__':
     final_message = ""
     error_occurred = False
     error_details_str = ""
+    result_message = ""; has_failures = False
 
     try:
-        # 메인 로직 실행
-        main() # main 함수는 이제 성공 메시지를 반환하지 않음
+        # 메인 로직 실행 (--from / --to: 백필 기간 지정, --force: 체크포인트 무시)
+        date_args = {key: next((datetime.strptime(arg.split('=', 1)[1], '%Y-%m-%d').date() for arg in sys.argv if arg.startswith(f'--{key}=')), None) for key in ('from', 'to')}
+        result_message, has_failures = main(start_date=date_args['from'], end_date=date_args['to'], force='--force' in sys.argv) # (메시지, 실패/미완료 날짜 여부)
     except ConnectionError as e:
         error_occurred = True
         print(f"🔥 스크립트 실행 중 연결 오류 발생: {e}")
@@ -298,6 +350,9 @@ if __name__ == '__main__':
         if error_occurred:
             # 실패 메시지 생성 (오류 내용 포함)
             final_message = f"🔥 `{SCRIPT_NAME}` 실행 실패 (소요 시간: {elapsed_time:.2f}초)\n```\n{error_details_str[-1000:]}\n```"
+        elif result_message:
+            # main() 결과 메시지 사용 (실패/미완료 날짜가 있으면 ⚠️ 경고, 다음 실행 때 재시도)
+            final_message = result_message + ("\n(실패/미완료 날짜는 다음 실행 때 다시 조회합니다)" if has_failures else "")
         else:
             # 성공 메시지 생성 (단순화)
             final_message = f"✅ `{SCRIPT_NAME}` 실행 성공 (소요 시간: {elapsed_time:.2f}초)"
@@ -1,8 +1,7 @@
 import streamlit as st
-import pandas as pd
-import yfinance as yf
+import benchmark_returns # 지수 누적 수익률(TWR) 공용 모듈
 import matplotlib.pyplot as plt
-from datetime import datetime
+from datetime import datetime, timedelta
 import matplotlib.dates as mdates
 
 # 폰트 설정 (Windows 환경을 기준으로 'Malgun Gothic' 폰트 사용)
@@ -23,51 +22,18 @@ st.subheader("기간 설정")
 start_date = st.date_input("시작 날짜:", datetime(2024, 3, 28))
 end_date = st.date_input("종료 날짜:", datetime.today())
 
-# 3. 데이터 다운로드 함수 정의
+# 3. 데이터 다운로드 및 TWR 계산 함수 정의
 @st.cache_data # Streamlit 캐싱 기능으로 데이터 다운로드 효율성 향상
-def download_stock_data(ticker, start, end):
-    print(f"📥 Yahoo Finance에서 {ticker} 데이터 다운로드 중...")
-    data = yf.download(ticker, start=start, end=end)
-    return data
+def load_index_twr(tickers, start, end):
+    print(f"📥 {', '.join(tickers)} 데이터 로드 중 (로컬 저장소에 없는 구간만 Yahoo Finance에서 1회 요청으로 다운로드)...")
+    return benchmark_returns.get_benchmark_twr(tickers, start, end - timedelta(days=1)) # yf.download와 같이 종료일 미포함
 
-# 데이터 다운로드
-kospi_data = download_stock_data(kospi_ticker, start_date, end_date)
-sp500_data = download_stock_data(sp500_ticker, start_date, end_date)
-
-# 4. TWR 계산 함수 정의
-def calculate_twr(df, ticker_name):
-    if df.empty:
-        st.warning(f"⚠️ {ticker_name} 데이터를 다운로드하지 못했습니다.")
-        return pd.DataFrame()
-
-    data = df[["Close"]].copy()
-    data = data.reset_index()
-    data["cashflow"] = 0
-    data["value"] = data["Close"]
-    data["date"] = pd.to_datetime(data["Date"])
-    data = data[["date", "value", "cashflow"]].copy()
-
-    twr = 1.0
-    returns = []
-    for i in range(1, len(data)):
-        previous_value = data.loc[i - 1, "value"].item()
-        current_cashflow = data.loc[i, "cashflow"].item()
-        denominator = previous_value + current_cashflow
-        if pd.isna(denominator) or denominator == 0:
-            continue
-        numerator = data.loc[i, "value"].item()
-        r = numerator / denominator
-        twr *= r
-        returns.append({
-            "date": data.loc[i, "date"].item(),
-            "twr": (twr - 1) * 100
-        })
-    twr_df = pd.DataFrame(returns)
-    return twr_df
-
-# TWR 계산
-kospi_twr_df = calculate_twr(kospi_data, "코스피200")
-sp500_twr_df = calculate_twr(sp500_data, "S&P500")
+# 4. TWR 계산 (benchmark_returns 공용 모듈: 두 지수 종가 1회 요청 + 일괄 벡터 연산)
+index_twr = load_index_twr((kospi_ticker, sp500_ticker), start_date, end_date)
+kospi_twr_df = index_twr[kospi_ticker]
+sp500_twr_df = index_twr[sp500_ticker]
+for twr_df, ticker_name in ((kospi_twr_df, "코스피200"), (sp500_twr_df, "S&P500")):
+    if twr_df.empty: st.warning(f"⚠️ {ticker_name} 데이터를 다운로드하지 못했습니다.")
 
 # 5. 그래프 출력
 st.subheader("📈 시간가중수익률 (TWR) 그래프")
@@ -76,10 +42,10 @@ st.subheader("📈 시간가중수익률 (TWR) 그래프")
 fig, ax = plt.subplots(figsize=(12, 6))
 
 if not kospi_twr_df.empty:
-    ax.plot(kospi_twr_df["date"], kospi_twr_df["twr"], linestyle=(0, (1, 1)), color='red', linewidth=2, label='코스피200 TWR')
+    ax.plot(kospi_twr_df["Date"], kospi_twr_df["TWR"], linestyle=(0, (1, 1)), color='red', linewidth=2, label='코스피200 TWR')
 
 if not sp500_twr_df.empty:
-    ax.plot(sp500_twr_df["date"], sp500_twr_df["twr"], linestyle=(0, (1, 1)), color='blue', linewidth=2, label='S&P500 TWR')
+    ax.plot(sp500_twr_df["Date"], sp500_twr_df["TWR"], linestyle=(0, (1, 1)), color='blue', linewidth=2, label='S&P500 TWR')
 
 # x축 눈금 간격 설정 (1개월)
 month_interval = 1
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# benchmark_returns.py: 시장 지수(벤치마크) 누적 수익률(TWR) 공용 계산 모듈
+# - 여러 지수의 종가(날짜 × 티커)를 한 번의 벡터 연산으로 누적 수익률(%)로 변환 (행 루프 없음)
+# - yfinance 결과(MultiIndex (Price, Ticker) 컬럼 / 'Adj Close'·'Close' 컬럼) 또는 종가 표를 그대로 입력 가능
+# - (티커, 시작일, 종료일) 단위로 결과를 메모리에 캐시 → 같은 구간 재요청 시 재계산/재조회 생략
+# - 사용: streamlit_app.py(전체 TWR vs 지수 비교), app.py(지수 TWR 그래프)
+
+import threading
+import time
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import price_cache # Yahoo Finance 로컬 가격 저장소 (증분 갱신)
+
+# --- 설정 ---
+MIN_DENOMINATOR = 1e-9 # 전일 종가가 이 값 이하이면 당일 수익률 계산 생략 (계수 1)
+DAILY_FACTOR_CLIP = (0.1, 10.0) # 극단적인 일일 변동 제한 (데이터 오류 방지)
+CACHE_TTL_SECONDS = 3600 # 결과 캐시 유지 시간 (당일 종가 갱신 반영)
+# --- ---
+
+_cache_lock = threading.Lock()
+_twr_cache = {} # {(티커, 시작일, 종료일): (계산 시각, TWR Series)}
+
+def to_close_frame(data, ticker=None):
+    """
+    가격 데이터를 날짜 × 티커 종가(float) DataFrame으로 변환합니다.
+    - yfinance MultiIndex 컬럼: 'Adj Close' 우선, 없으면 'Close' 레벨 선택 (2단계 컬럼 = 티커)
+    - 일반 컬럼('Adj Close'/'Close' 포함): 해당 컬럼 1개를 ticker 이름으로 사용
+    - 그 외: 이미 종가 표(컬럼 = 티커)로 간주
+    """
+    if data is None or data.empty: return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        level_zero = data.columns.get_level_values(0)
+        price_field = 'Adj Close' if 'Adj Close' in level_zero else ('Close' if 'Close' in level_zero else None)
+        if price_field is None: return pd.DataFrame()
+        closes = data[price_field]
+        if isinstance(closes, pd.Series): closes = closes.to_frame(ticker or price_field)
+        elif ticker and closes.shape[1] == 1 and closes.columns[0] in ('', None): closes.columns = [ticker]
+    elif 'Adj Close' in data.columns or 'Close' in data.columns:
+        price_field = 'Adj Close' if 'Adj Close' in data.columns else 'Close'
+        closes = data[[price_field]].rename(columns={price_field: ticker or price_field})
+    else: closes = data
+    closes = closes.apply(pd.to_numeric, errors='coerce').astype('float64')
+    closes.index = pd.to_datetime(closes.index)
+    if closes.index.tz is not None: closes.index = closes.index.tz_localize(None)
+    return closes.sort_index()
+
+def cumulative_returns(close_frame):
+    """
+    날짜 × 티커 종가 표 → 날짜 × 티커 누적 수익률(%) 표 (모든 티커를 한 번에 계산).
+    티커별로 종가가 있는 날만 계산하며(거래일이 달라 생기는 NaN은 건너뜀), 각 티커의 첫 거래일은 기준일이므로 NaN입니다.
+    """
+    if close_frame is None or close_frame.empty: return pd.DataFrame()
+    closes = close_frame.astype('float64')
+    valid = closes.notna()
+    prev_close = closes.ffill().shift(1) # 티커별 직전 유효 종가
+    has_base = valid & prev_close.notna()
+    daily_factor = closes / prev_close.where(prev_close.abs() > MIN_DENOMINATOR)
+    daily_factor = daily_factor.replace([np.inf, -np.inf], np.nan).fillna(1.0).clip(*DAILY_FACTOR_CLIP)
+    cumulative_factor = daily_factor.where(has_base).cumprod() # NaN(휴장일/기준일)은 건너뛰고 누적
+    return ((cumulative_factor - 1.0) * 100.0).where(has_base)
+
+def cumulative_returns_from_prices(data, ticker=None):
+    """yfinance 다운로드 결과 등 가격 데이터 → 날짜 × 티커 누적 수익률(%) 표"""
+    return cumulative_returns(to_close_frame(data, ticker))
+
+def twr_series_to_df(twr_series):
+    """누적 수익률 Series → ['Date', 'TWR'] DataFrame (NaN 제외, 그래프용)"""
+    if twr_series is None: return pd.DataFrame(columns=['Date', 'TWR'])
+    df = twr_series.dropna().rename('TWR').to_frame(); df.index.name = 'Date'
+    return df.reset_index()
+
+def _date_key(value):
+    if isinstance(value, datetime): return value.date().isoformat()
+    if isinstance(value, date): return value.isoformat()
+    return pd.to_datetime(value).date().isoformat()
+
+def get_benchmark_twr(tickers, start_date, end_date):
+    """
+    지수들의 start_date~end_date(포함) 누적 수익률(TWR, %)을 반환합니다.
+    캐시에 없는 티커만 가격 저장소에서 1회 요청으로 종가를 받아 한 번에 계산합니다.
+    반환: {티커: ['Date', 'TWR'] DataFrame} (데이터 없으면 빈 DataFrame)
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    start_key = _date_key(start_date); end_key = _date_key(end_date)
+    now = time.time(); results = {}
+    with _cache_lock:
+        for ticker in tickers:
+            cached = _twr_cache.get((ticker, start_key, end_key))
+            if cached and now - cached[0] < CACHE_TTL_SECONDS: results[ticker] = cached[1]
+    missing = [t for t in tickers if t not in results]
+    if missing:
+        twr_frame = cumulative_returns(price_cache.get_close_frame(missing, start_key, end_key))
+        with _cache_lock:
+            for ticker in missing:
+                series = twr_frame[ticker] if ticker in twr_frame.columns else pd.Series(dtype='float64')
+                results[ticker] = series
+                if not series.dropna().empty: _twr_cache[(ticker, start_key, end_key)] = (now, series)
+    return {ticker: twr_series_to_df(results[ticker]) for ticker in tickers}
+
+def clear_cache():
+    with _cache_lock: _twr_cache.clear()
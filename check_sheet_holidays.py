@@ -1,5 +1,5 @@
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_client
 import pandas as pd
 from datetime import datetime
 import holidays # 공휴일 확인용 라이브러리
@@ -21,13 +21,10 @@ def find_closed_market_days_in_sheets():
 
     # 1. Google Sheet 연결
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
         if not os.path.exists(JSON_KEYFILE_PATH):
             print(f"오류: 서비스 계정 키 파일을 찾을 수 없습니다: {JSON_KEYFILE_PATH}")
             return None
-        creds = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(creds)
-        spreadsheet = gc.open(GOOGLE_SHEET_NAME)
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME)
         print("✅ Google Sheets 연결 성공.")
     except Exception as e:
         print(f"❌ Google Sheets 연결 실패: {e}")
@@ -41,7 +38,7 @@ def find_closed_market_days_in_sheets():
     for sheet_name in SHEET_NAMES:
         try:
             print(f"\n📄 시트 '{sheet_name}' 처리 중...")
-            worksheet = spreadsheet.worksheet(sheet_name)
+            worksheet = sheets_client.get_worksheet(sheet_name, GOOGLE_SHEET_NAME)
             # A열 전체 값 가져오기
             date_values_raw = worksheet.col_values(DATE_COLUMN_INDEX)
             if not date_values_raw:
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# cost_basis.py: 이동평균법 평단가 계산 엔진 (벡터화)
+# - 매매 원장 전체를 종목별 누적 연산(groupby cumsum/cummin, 로그 공간 누적합)으로 한 번에 계산
+# - 부분 매도 비율의 누적곱은 로그 공간에서 계산 (긴 보유 구간에서 누적곱이 0으로 언더플로하지 않도록)
+# - 기존 행 단위 루프와 동일한 규칙: 매도는 보유 수량까지만 반영, 보유 수량이 0이 되면 비용 초기화
+# - 거래(행)별 보유 수량 / 총 비용 / 평단가 이력을 반환 → 날짜별 평단가 추이 라인 그리기에 사용
+
+import numpy as np
+import pandas as pd
+
+ZERO_QTY_EPS = 1e-9 # 이 값 이하의 보유 수량은 0으로 간주
+
+def compute_avg_cost_history(ledger, date_col='Date', code_col='CodeKey', type_col='Type', qty_col='Qty', price_col='Price'):
+    """
+    매매 원장(날짜순 정렬)으로 종목별 이동평균 평단가 이력을 계산합니다.
+    반환: 원장 행 순서 그대로의 DataFrame (columns: date_col, code_col, Qty, TotalCost, AvgCost)
+    - 보유 수량: 매수 +, 매도 - 누적 (0 아래로 내려가지 않음 → 보유 수량 초과 매도는 보유분까지만)
+    - 총 비용: 매수 시 수량×단가 가산, 매도 시 남은 수량 비율만큼 유지 (평단가 불변), 수량 0이면 초기화
+    """
+    result_cols = [date_col, code_col, 'Qty', 'TotalCost', 'AvgCost']
+    if ledger is None or ledger.empty: return pd.DataFrame(columns=result_cols)
+    df = ledger[[date_col, code_col]].reset_index(drop=True)
+    codes = df[code_col]
+    row_type = ledger[type_col].astype(str).str.strip().to_numpy()
+    qty = ledger[qty_col].to_numpy(dtype=float); price = ledger[price_col].to_numpy(dtype=float)
+    is_buy = (row_type == '매수') & (qty > 0) & (price >= 0)
+    is_sell = (row_type == '매도') & (qty > 0)
+
+    # 보유 수량: 0에서 반사되는 누적합 (q_t = max(0, q_{t-1} + d_t) = S_t - min(0, min_{k<=t} S_k))
+    delta = pd.Series(np.where(is_buy, qty, np.where(is_sell, -qty, 0.0)))
+    cum_delta = delta.groupby(codes).cumsum()
+    running_min = cum_delta.groupby(codes).cummin().clip(upper=0.0)
+    position = (cum_delta - running_min).to_numpy(copy=True)
+    position[position < ZERO_QTY_EPS] = 0.0
+    prev_position = pd.Series(position).groupby(codes).shift(1).fillna(0.0).to_numpy()
+
+    # 보유 구간(episode): 매도로 수량이 0이 된 다음 행부터 새 구간 (비용 초기화)
+    closes_position = is_sell & (prev_position > 0) & (position == 0)
+    closes = pd.Series(closes_position.astype(int))
+    episode = (closes.groupby(codes).cumsum() - closes).to_numpy()
+
+    # 총 비용: cost_t = a_t * cost_{t-1} + c_t (a: 매도 후 남은 수량 비율, c: 매수 금액)
+    # → cost_t = R_t * Σ_j c_j / R_j (R: 구간 내 a 누적곱). R은 로그(L = Σ log a)로, Σ는 logaddexp 누적으로 계산
+    log_retain = np.zeros_like(position)
+    partial_sell = is_sell & (prev_position > 0) & ~closes_position
+    log_retain[partial_sell] = np.log(position[partial_sell] / prev_position[partial_sell])
+    buy_cost = np.where(is_buy, qty * price, 0.0)
+    group_keys = [codes, pd.Series(episode)]
+    log_prod = pd.Series(log_retain).groupby(group_keys).cumsum().to_numpy()
+    with np.errstate(divide='ignore'): log_scaled_cost = np.log(buy_cost) - log_prod # 매수 없는 행은 -inf (합에 기여 없음)
+    log_cost_sum = pd.Series(log_scaled_cost).groupby(group_keys).transform(lambda s: np.logaddexp.accumulate(s.to_numpy())).to_numpy()
+    total_cost = np.exp(log_prod + log_cost_sum)
+    total_cost[position == 0] = 0.0
+
+    df['Qty'] = position; df['TotalCost'] = total_cost
+    df['AvgCost'] = np.divide(total_cost, position, out=np.zeros_like(total_cost), where=position > 0)
+    return df[result_cols]
+
+def daily_avg_cost_history(history, date_col='Date', code_col='CodeKey'):
+    """거래별 이력을 (종목, 날짜)별 마지막 값으로 축약 (같은 날 여러 거래 시 당일 마감 기준)"""
+    if history is None or history.empty: return history
+    return history.groupby([code_col, date_col], sort=True).last().reset_index()
+
+# --- 단독 실행: 행 단위 루프(기존 계산 방식)와 결과 비교 ---
+def _avg_cost_loop(ledger):
+    """기존 행 단위 이동평균 계산 (검증 기준)"""
+    holdings = {}; rows = []
+    for _, trade in ledger.iterrows():
+        qty_held, cost = holdings.get(trade['CodeKey'], (0.0, 0.0))
+        if trade['Type'] == '매수' and trade['Qty'] > 0 and trade['Price'] >= 0: qty_held += trade['Qty']; cost += trade['Qty'] * trade['Price']
+        elif trade['Type'] == '매도' and trade['Qty'] > 0 and qty_held > 0:
+            sell_qty = min(trade['Qty'], qty_held); cost -= cost * sell_qty / qty_held; qty_held -= sell_qty
+            if qty_held <= ZERO_QTY_EPS: qty_held, cost = 0.0, 0.0
+        holdings[trade['CodeKey']] = (qty_held, cost)
+        rows.append((qty_held, cost, cost / qty_held if qty_held > 0 else 0.0))
+    return rows
+
+if __name__ == '__main__':
+    cases = {
+        '기본 (매수/부분 매도/전량 매도/초과 매도)': [('A', '매수', 10, 100), ('A', '매도', 4, 120), ('A', '매수', 6, 130), ('B', '매수', 3, 50), ('A', '매도', 20, 140), ('A', '매수', 2, 90), ('B', '매도', 1, 60)],
+        '장기 보유 (매수 2 후 매도 1/매수 1 × 1,200회)': [('A', '매수', 2, 20)] + [('A', '매도', 1, 25), ('A', '매수', 1, 20)] * 1200,
+    }
+    all_ok = True
+    for case_name, trades in cases.items():
+        ledger = pd.DataFrame(trades, columns=['CodeKey', 'Type', 'Qty', 'Price']); ledger['Date'] = pd.Timestamp('2024-01-01')
+        history = compute_avg_cost_history(ledger)
+        expected = np.array(_avg_cost_loop(ledger), dtype=float)
+        ok = np.allclose(history[['Qty', 'TotalCost', 'AvgCost']].to_numpy(dtype=float), expected, rtol=1e-9, atol=1e-9)
+        all_ok = all_ok and ok
+        print(f"{'✅' if ok else '❌'} {case_name}: 마지막 평단가 {history['AvgCost'].iloc[-1]:.6f} (기준 {expected[-1, 2]:.6f})")
+    if not all_ok: raise SystemExit(1)
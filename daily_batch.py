@@ -4,12 +4,17 @@
 
 import gspread
 import pandas as pd
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_client
+import sheet_columns # 필요한 열만 골라 읽기
+from sheet_decode import clean_num_str, to_numeric_series, to_date, to_date_series # 시트/API 값 숫자·날짜 변환 공용 규칙
 from datetime import datetime, timedelta, date
 import time
 import traceback
 import os
+import re
+import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # 공휴일 처리
 try:
@@ -37,6 +42,12 @@ except ModuleNotFoundError:
             print("INFO: telegram_utils 모듈 없음 - 텔레그램 메시지 발송 건너<0xEB><0x81><0x91:", message[:100])
     telegram_utils = MockTelegramUtils()
 
+# --- 로컬 시트 미러 임포트 (없으면 시트 직접 읽기) ---
+try:
+    import sheet_mirror
+except ImportError:
+    print("⚠️ sheet_mirror.py 모듈을 찾을 수 없습니다. 구글 시트를 직접 읽습니다.")
+    sheet_mirror = None
 
 # --- 설정 ---
 GOOGLE_SHEET_NAME = 'KYI_자산배분'
@@ -55,29 +66,103 @@ ACCOUNTS = {
     '금현물': {'auth': None, 'api': None, 'type': 'GOLD'}
 }
 SCRIPT_NAME = os.path.basename(__file__)
+USE_SHEET_MIRROR = True # True: 로컬 미러(sheet_mirror.py) 동기화 후 읽기, False: 시트 직접 읽기
+MAX_BROKER_WORKERS = 4 # 증권사 인증/조회 병렬 스레드 수
+SETTINGS_COLUMNS = ['Q:T'] # 설정 시트 매핑 열 (종목명 / 종목코드 / 구분 / 국적). 헤더가 없으면 전체 읽기로 대체
+RAW_TAIL_ROWS = {BALANCE_RAW_SHEET: 40, WEIGHTS_RAW_SHEET: 400} # 중복 확인 시 읽을 최근 행 수 (대상 날짜를 다 덮지 못하면 2배씩 확장)
+RAW_ROWS_STATE_PATH = os.path.join(CURRENT_DIR, 'raw_rows_state.json') # Raw 시트별 마지막 데이터 행 번호 (append 응답 범위 / 최근 확인 결과로 갱신)
 # --- ---
 
 # --- 유틸리티 함수 ---
-def clean_num_str(num_str, type_func=int):
-    if isinstance(num_str, (int, float)): return num_str
-    if not num_str: return type_func(0)
+def read_sheet_values(spreadsheet, worksheet):
+    """시트 전체 값 읽기 (미러 사용 가능 시 미러에서, 아니면 get_all_values)"""
+    if USE_SHEET_MIRROR and sheet_mirror is not None:
+        values = sheet_mirror.get_values(spreadsheet, worksheet.title)
+        if values is not None: return values
+    return worksheet.get_all_values()
+
+def read_settings_values(spreadsheet, worksheet, required_headers):
+    """설정 시트의 매핑 열(SETTINGS_COLUMNS)만 읽어 get_all_values 형태([헤더, 행, ...])로 반환. 필요한 헤더가 없으면 전체 읽기"""
+    try:
+        frame = sheet_columns.read_columns(spreadsheet, [(worksheet.title, SETTINGS_COLUMNS)], use_mirror=USE_SHEET_MIRROR)[worksheet.title]
+        header = [frame.attrs.get('header', {}).get(letter, '') for letter in frame.columns]
+        if not frame.attrs.get('missing') and all(h in header for h in required_headers): return [header] + frame.values.tolist()
+        print(f"  > ℹ️ 설정 시트 {SETTINGS_COLUMNS} 열에서 헤더를 찾지 못함 → 전체 읽기")
+    except Exception as e: print(f"  > ⚠️ 설정 시트 열 읽기 실패 → 전체 읽기: {e}")
+    return read_sheet_values(spreadsheet, worksheet)
+
+def read_sheet_records(spreadsheet, worksheet, expected_headers=None):
+    """시트 레코드 읽기 (미러 사용 가능 시 미러에서, 아니면 get_all_records)"""
+    if USE_SHEET_MIRROR and sheet_mirror is not None:
+        records = sheet_mirror.get_records(spreadsheet, worksheet.title)
+        if records is not None: return records
+    return worksheet.get_all_records(expected_headers=expected_headers)
+
+def load_raw_rows_state():
+    """Raw 시트별 마지막 데이터 행 기록(JSON)을 읽습니다. 없거나 손상된 경우 빈 딕셔너리."""
+    if not os.path.exists(RAW_ROWS_STATE_PATH): return {}
+    try:
+        with open(RAW_ROWS_STATE_PATH, 'r', encoding='utf-8') as f: state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except Exception as e: print(f"  > ⚠️ Raw 시트 행 기록 로드 실패 ({e}). A열로 마지막 행을 확인합니다."); return {}
+
+def remember_last_row(spreadsheet, worksheet, last_row):
+    """워크시트의 마지막 데이터 행 번호 기록 (다음 실행의 최근 구간 읽기 기준)"""
+    state = load_raw_rows_state(); state[f"{spreadsheet.id}:{worksheet.title}"] = int(last_row)
     try:
-        cleaned_str = str(num_str).replace(',', '')
-        is_negative = cleaned_str.startswith('-')
-        cleaned = cleaned_str.lstrip('-').lstrip('0')
-        if not cleaned: return type_func(0)
-        value = type_func(cleaned)
-        return -value if is_negative else value
-    except (ValueError, TypeError): return type_func(0)
+        with open(RAW_ROWS_STATE_PATH, 'w', encoding='utf-8') as f: json.dump(state, f, ensure_ascii=False, indent=4)
+    except Exception as e: print(f"  > ⚠️ Raw 시트 행 기록 저장 실패: {e}")
+
+def remember_appended_range(spreadsheet, worksheet, response):
+    """append_rows 응답의 추가 범위(updates.updatedRange, 예: "'일별잔고_Raw'!A301:C304") 끝 행을 마지막 데이터 행으로 기록"""
+    updated_range = ((response or {}).get('updates') or {}).get('updatedRange', '')
+    match = re.search(r'(\d+)$', updated_range)
+    if match: remember_last_row(spreadsheet, worksheet, int(match.group(1)))
+
+def find_last_data_row(spreadsheet, worksheet, last_col, tail_rows, fetched):
+    """
+    마지막 데이터 행 번호. 기록된 행 주변 구간(앞뒤 tail_rows 행)만 읽어 확인하고 읽은 값은 fetched에 남깁니다.
+    기록이 없거나 실제 끝이 구간 밖이면 A열을 1회 읽어 확인합니다 (시트 격자 행 수는 빈 행을 포함하므로 사용하지 않음).
+    """
+    known_row = load_raw_rows_state().get(f"{spreadsheet.id}:{worksheet.title}")
+    if isinstance(known_row, int) and known_row >= 2:
+        probe_start = max(2, known_row - tail_rows + 1); probe_end = known_row + tail_rows # 다른 실행이 추가한 행까지 포함
+        probe = worksheet.get(f'A{probe_start}:{last_col}{probe_end}') # 값 범위는 뒤쪽 빈 행이 잘려 옴 → 길이로 끝 행 계산
+        last_row = probe_start + len(probe) - 1
+        if probe and last_row < probe_end: fetched[(probe_start, last_row)] = probe; return last_row
+    last_row = max(1, len(worksheet.col_values(1)))
+    print(f"  > ℹ️ '{worksheet.title}' 마지막 행 기록 없음/불일치 → A열 확인 ({last_row}행)")
+    return last_row
+
+def read_recent_records(spreadsheet, worksheet, header, target_date_str, tail_rows):
+    """
+    추가 전용 Raw 시트의 마지막 tail_rows 행만 시트에서 직접 읽어 레코드(dict) 목록 반환 (전체 이력/미러 동기화 대신 최근 구간만 확인).
+    구간 첫 행의 날짜가 대상 날짜 이상이면 대상 날짜 행이 구간 앞쪽에 더 있을 수 있으므로 구간을 2배로 넓혀 다시 읽습니다.
+    """
+    last_col = gspread.utils.rowcol_to_a1(1, len(header)).rstrip('1')
+    fetched = {} # {(시작 행, 끝 행): 값} 같은 구간 중복 조회 방지
+    last_row = find_last_data_row(spreadsheet, worksheet, last_col, tail_rows, fetched)
+    remember_last_row(spreadsheet, worksheet, last_row)
+    def read_rows(start_row):
+        cached = next(((first, values) for (first, end), values in fetched.items() if end == last_row and first <= start_row), None) # 이미 읽은 구간 재사용
+        if cached: return cached[1][start_row - cached[0]:]
+        fetched[(start_row, last_row)] = worksheet.get(f'A{start_row}:{last_col}{last_row}'); return fetched[(start_row, last_row)]
+    window = tail_rows; target_date = to_date(target_date_str)
+    while True:
+        start_row = max(2, last_row - window + 1)
+        rows = read_rows(start_row) if last_row >= 2 else []
+        first_date = next((to_date(row[0]) for row in rows if row and str(row[0]).strip()), pd.NaT) # 날짜 형식과 무관하게 날짜로 비교
+        if start_row == 2 or (pd.notna(first_date) and first_date < target_date): break
+        window *= 2
+    print(f"  > '{worksheet.title}' 최근 {len(rows)}행 확인 ({start_row}~{last_row}행)")
+    return [dict(zip(header, list(row) + [''] * (len(header) - len(row)))) for row in rows]
 
 def setup_google_sheet(sheet_name, worksheet_name, header_columns):
     worksheet = None
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials); spreadsheet = gc.open(sheet_name)
+        sheets_client.get_spreadsheet(sheet_name) # 공용 클라이언트 (인증/스프레드시트 1회만)
         try:
-            worksheet = spreadsheet.worksheet(worksheet_name)
+            worksheet = sheets_client.get_worksheet(worksheet_name, sheet_name)
             print(f"✅ Google Sheet '{sheet_name}/{worksheet_name}' 열기 성공.")
             header = []
             try: header = worksheet.row_values(1)
@@ -94,7 +179,7 @@ def setup_google_sheet(sheet_name, worksheet_name, header_columns):
                          print(f"✅ 헤더 업데이트 완료 ({worksheet_name}).")
                      except Exception as e_header: print(f"❗️ 헤더 자동 업데이트 실패: {e_header}.")
         except gspread.exceptions.WorksheetNotFound:
-            print(f"⚠️ 워크시트 '{worksheet_name}' 생성 및 헤더 추가."); worksheet = spreadsheet.add_worksheet(title=worksheet_name, rows="1000", cols=len(header_columns))
+            print(f"⚠️ 워크시트 '{worksheet_name}' 생성 및 헤더 추가."); worksheet = sheets_client.add_worksheet(worksheet_name, rows="1000", cols=len(header_columns), name=sheet_name)
             worksheet.append_row(header_columns, value_input_option='USER_ENTERED')
         return worksheet
     except FileNotFoundError: print(f"❌ 오류: 키 파일({JSON_KEYFILE_PATH}) 없음."); return None
@@ -102,12 +187,81 @@ def setup_google_sheet(sheet_name, worksheet_name, header_columns):
     except Exception as e: print(f"❌ 시트 연결/설정 오류: {e}"); traceback.print_exc(); return None
 # --- ---
 
+# --- 증권사 인증/조회 (계좌별 스레드에서 실행) ---
+def authenticate_account(acc_name, acc_info, logs):
+    """계좌 API 인증. 성공 여부 반환 (로그는 logs에 모아 메인 스레드에서 출력)"""
+    if not acc_info['auth']: logs.append(f"  > {acc_name} 인증 불필요."); return True
+    try:
+        auth_function_name = 'auth' if acc_info['type'].startswith('KIS') else 'authenticate'
+        auth_func = getattr(acc_info['auth'], auth_function_name, None)
+        if auth_func and callable(auth_func):
+            auth_result = auth_func()
+            if auth_result is True: logs.append(f"  > {acc_name} 인증 성공."); return True
+            elif auth_result is False: logs.append(f"🔥 {acc_name} 인증 실패 (함수 반환값 False).")
+            else: logs.append(f"🔥 {acc_name} 인증 실패: '{auth_function_name}' 함수가 True/False를 명시적으로 반환하지 않음 (반환값: {auth_result}).")
+        else: logs.append(f"🔥 {acc_name} 인증 실패: '{auth_function_name}' 함수 없음.")
+    except Exception as e_auth: logs.append(f"🔥 {acc_name} 인증 중 오류: {e_auth}\n{traceback.format_exc()}")
+    return False
+
+def fetch_account_api_data(acc_name, acc_info, target_date_yyyymmdd, logs):
+    """증권사 API로 잔고 및 보유 현황 조회. (잔고, 보유 현황 결과) 반환. 호출 간격은 rate_limiter(증권사별 토큰 버킷)가 관리"""
+    balance = 0; holding_result = None
+    if acc_info['type'] == 'KIWOOM_ISA':
+        kiwoom_bal_result = None
+        try: kiwoom_bal_result = kiwoom_api.get_daily_account_profit_loss(target_date_yyyymmdd, target_date_yyyymmdd)
+        except Exception as e_kw_bal: logs.append(f"    - API(kt00016) 호출 오류: {e_kw_bal}")
+        try: holding_result = kiwoom_api.get_account_evaluation_balance()
+        except Exception as e_kw_hold: logs.append(f"    - API(kt00018) 호출 오류: {e_kw_hold}")
+        if kiwoom_bal_result and kiwoom_bal_result.get('success'): balance = clean_num_str(kiwoom_bal_result['data'].get('tot_amt_to', '0')); logs.append(f"    - API(kt00016) 조회 성공: {balance:,} 원")
+        else:
+            logs.append(f"    - API(kt00016) 조회 실패 또는 오류 응답.")
+            if holding_result and holding_result.get('success'): balance = clean_num_str(holding_result['data'].get('tot_evlt_amt', '0')); logs.append(f"    - API(kt00018)의 총평가금액으로 대체: {balance:,} 원 (예수금 확인 필요)")
+            else: logs.append(f"    - API(kt00018) 조회도 실패하여 잔고 0 처리.")
+    elif acc_info['type'] == 'KIS_PEN':
+        try: holding_result = kis_api_pen.get_inquire_balance_obj()
+        except Exception as e_pen_bal: logs.append(f"    - API(TTTC8434R) 호출 오류: {e_pen_bal}")
+        if holding_result and holding_result.get("rt_cd") == "0": balance = clean_num_str(holding_result.get('output2', [{}])[0].get('tot_evlu_amt', '0')); logs.append(f"    - API(TTTC8434R) 조회 성공: {balance:,} 원")
+        else: logs.append(f"    - API(TTTC8434R) 조회 실패 또는 오류 응답.")
+    elif acc_info['type'] == 'KIS_IRP':
+        try: holding_result = kis_api_irp.get_inquire_present_balance_irp()
+        except Exception as e_irp_bal: logs.append(f"    - API(TTTC2202R) 호출 오류: {e_irp_bal}")
+        if isinstance(holding_result, pd.DataFrame) and not holding_result.empty and 'evlu_amt' in holding_result.columns:
+            try:
+                holding_result['evlu_amt_num'] = to_numeric_series(holding_result['evlu_amt'], int)
+                balance = holding_result['evlu_amt_num'].sum(); logs.append(f"    - API(TTTC2202R) 조회 성공 (보유 종목 평가액 합계): {balance:,} 원"); logs.append(f"    ⚠️ IRP 예수금 확인 필요.")
+            except Exception as e_irp_sum: logs.append(f"    - 잔고 계산 오류: {e_irp_sum}")
+        else: logs.append(f"    - API(TTTC2202R) 조회 실패 또는 빈 결과.")
+    return balance, holding_result
+
+def read_gold_balance(spreadsheet, gold_ws, target_date_str, logs):
+    """금현물 수익률 시트에서 대상 날짜 평가액 읽기"""
+    balance = 0
+    try:
+        gold_data = read_sheet_records(spreadsheet, gold_ws, expected_headers=['날짜', '평가액']); df_gold = pd.DataFrame(gold_data)
+        if not df_gold.empty:
+            gold_row = df_gold[df_gold['날짜'] == target_date_str]
+            if not gold_row.empty: balance = clean_num_str(gold_row.iloc[0]['평가액'])
+            else: logs.append(f"    - 시트에서 {target_date_str} 데이터 없음.")
+        else: logs.append(f"    - {GOLD_SHEET} 시트 데이터 없음.")
+        logs.append(f"    - 시트 읽기 값: {balance:,} 원")
+    except Exception as e_gold: logs.append(f"    - 시트 읽기 오류: {e_gold}")
+    return balance
+
+def run_broker_pipeline(acc_name, acc_info, target_date_yyyymmdd):
+    """한 계좌의 인증 → 잔고/보유 조회를 순서대로 실행 (스레드 작업). 결과 dict 반환"""
+    auth_logs = []; fetch_logs = []
+    auth_ok = authenticate_account(acc_name, acc_info, auth_logs)
+    balance = 0; holding_result = None
+    if auth_ok:
+        try: balance, holding_result = fetch_account_api_data(acc_name, acc_info, target_date_yyyymmdd, fetch_logs)
+        except Exception as e_fetch: fetch_logs.append(f"    - 조회 중 오류: {e_fetch}\n{traceback.format_exc()}")
+    return {'auth_ok': auth_ok, 'balance': balance, 'holding_result': holding_result, 'auth_logs': auth_logs, 'fetch_logs': fetch_logs}
+# --- ---
+
 # --- 메인 실행 로직 ---
-def main():
-    start_time = time.time()
-    print("🚀 일별 잔고 및 비중 기록 배치 시작")
-    # 0. 대상 날짜 결정
-    today = datetime.now().date(); target_date_dt = today - timedelta(days=1); kr_holidays = {}
+def get_target_date(today=None):
+    """대상 날짜: 오늘 이전의 가장 최근 영업일 (주말/공휴일 제외, 최대 5일 전까지 확인)"""
+    today = today or datetime.now().date(); target_date_dt = today - timedelta(days=1); kr_holidays = {}
     if holidays:
         try: kr_holidays = holidays.KR(years=target_date_dt.year, observed=True)
         except Exception as e_holiday: print(f"⚠️ 공휴일 정보 로드 오류: {e_holiday}")
@@ -116,62 +270,75 @@ def main():
         is_holiday = target_date_dt in kr_holidays if holidays else False
         if target_date_dt.weekday() < 5 and not is_holiday: break
         target_date_dt -= timedelta(days=1); days_to_check += 1
+    return target_date_dt
+
+def main():
+    start_time = time.time()
+    print("🚀 일별 잔고 및 비중 기록 배치 시작")
+    # 0. 대상 날짜 결정
+    target_date_dt = get_target_date()
     target_date_str = target_date_dt.strftime("%Y-%m-%d"); target_date_yyyymmdd = target_date_dt.strftime("%Y%m%d")
     print(f"🎯 대상 날짜 (영업일 기준): {target_date_str}")
 
-    # 1. API 인증
-    print("\n[인증] 모든 증권사 API 인증 시도...")
-    auth_success_map = {}; all_auth_successful = True
-    for acc_name, acc_info in ACCOUNTS.items():
-        auth_success_map[acc_name] = False
-        if acc_info['auth']:
-            try:
-                auth_function_name = 'auth' if acc_info['type'].startswith('KIS') else 'authenticate'
-                auth_func = getattr(acc_info['auth'], auth_function_name, None)
-                if auth_func and callable(auth_func):
-                    auth_result = auth_func()
-                    if auth_result is True: auth_success_map[acc_name] = True; print(f"  > {acc_name} 인증 성공.")
-                    elif auth_result is False: print(f"🔥 {acc_name} 인증 실패 (함수 반환값 False)."); all_auth_successful = False
-                    else: print(f"🔥 {acc_name} 인증 실패: '{auth_function_name}' 함수가 True/False를 명시적으로 반환하지 않음 (반환값: {auth_result})."); all_auth_successful = False
-                else: print(f"🔥 {acc_name} 인증 실패: '{auth_function_name}' 함수 없음."); all_auth_successful = False
-            except Exception as e_auth: print(f"🔥 {acc_name} 인증 중 오류: {e_auth}"); traceback.print_exc(); all_auth_successful = False
-        else: auth_success_map[acc_name] = True; print(f"  > {acc_name} 인증 불필요.")
-    if not all_auth_successful: print("⚠️ 일부 계좌 인증 실패.")
-
+    # 1. 증권사 API 인증 + 잔고/보유 조회 (증권사별 스레드에서 병렬 실행, 시트 준비와 동시 진행)
+    print("\n[인증/조회] 증권사 API 인증 및 잔고 조회를 계좌별로 병렬 시작...")
+    broker_executor = ThreadPoolExecutor(max_workers=MAX_BROKER_WORKERS)
+    try:
+        broker_futures = {acc_name: broker_executor.submit(run_broker_pipeline, acc_name, acc_info, target_date_yyyymmdd)
+                          for acc_name, acc_info in ACCOUNTS.items() if acc_info['type'] != 'GOLD'}
+        return record_daily_data(start_time, target_date_str, broker_futures)
+    finally: # 오류로 일찍 끝나도 대기 중인 조회는 취소, 실행 중인 조회는 끝날 때까지 대기 (main 반환 후 증권사 API 호출 없음)
+        broker_executor.shutdown(wait=True, cancel_futures=True)
+
+def record_daily_data(start_time, target_date_str, broker_futures):
+    """시트 준비 → 기존 Raw 확인 → 증권사 조회 결과 취합 → 잔고/비중 기록 (main에서 증권사 조회 스레드를 시작한 뒤 호출)"""
     # 2. 구글 시트 연결
     print("\n[준비] 구글 시트 연결 및 Raw 시트 확인/생성...")
     balance_ws = setup_google_sheet(GOOGLE_SHEET_NAME, BALANCE_RAW_SHEET, BALANCE_HEADER)
     weights_ws = setup_google_sheet(GOOGLE_SHEET_NAME, WEIGHTS_RAW_SHEET, WEIGHTS_HEADER)
     gold_ws = None; settings_ws = None
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials); spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-        gold_ws = spreadsheet.worksheet(GOLD_SHEET); settings_ws = spreadsheet.worksheet(SETTINGS_SHEET)
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME)
+        gold_ws = sheets_client.get_worksheet(GOLD_SHEET); settings_ws = sheets_client.get_worksheet(SETTINGS_SHEET)
         print(f"✅ 읽기용 시트 ({GOLD_SHEET}, {SETTINGS_SHEET}) 열기 성공.")
     except gspread.exceptions.APIError as e_read_ws: raise ConnectionError(f"❌ 읽기용 구글 시트 열기 중 API 오류: {e_read_ws}") from e_read_ws
     except Exception as e: raise ConnectionError(f"❌ 읽기용 시트 열기 실패: {e}") from e
     if not balance_ws or not weights_ws or not gold_ws or not settings_ws: raise ConnectionError("🔥 필요 시트 준비 실패. 종료합니다.")
 
     # 3. 기존 Raw 데이터 확인
-    existing_balances = {}; existing_weights = set()
+    existing_balances = {}; existing_weights = set(); target_date = to_date(target_date_str)
     print(f"\n[확인] {target_date_str} 기준 기존 Raw 데이터 확인...")
     try:
-        balance_data = balance_ws.get_all_records(expected_headers=BALANCE_HEADER)
-        for row in balance_data:
-            if str(row.get('날짜')).strip() == target_date_str and row.get('계좌명'): existing_balances[str(row['계좌명']).strip()] = row['총자산']
+        balance_data = read_recent_records(spreadsheet, balance_ws, BALANCE_HEADER, target_date_str, RAW_TAIL_ROWS[BALANCE_RAW_SHEET])
+        balance_dates = to_date_series([row.get('날짜') for row in balance_data]) # 날짜 형식과 무관하게 날짜로 비교 (일괄 변환)
+        for row, row_date in zip(balance_data, balance_dates):
+            if row.get('계좌명') and row_date == target_date: existing_balances[str(row['계좌명']).strip()] = row['총자산']
         print(f"✅ '{BALANCE_RAW_SHEET}' 확인: {len(existing_balances)}개 계좌 데이터 존재.")
     except Exception as e: print(f"⚠️ '{BALANCE_RAW_SHEET}' 읽기 오류: {e}")
     try:
-        weights_data = weights_ws.get_all_records(expected_headers=WEIGHTS_HEADER)
-        for row in weights_data:
-            if str(row.get('날짜')).strip() == target_date_str and row.get('계좌명') and row.get('종목코드'):
+        weights_data = read_recent_records(spreadsheet, weights_ws, WEIGHTS_HEADER, target_date_str, RAW_TAIL_ROWS[WEIGHTS_RAW_SHEET])
+        weights_dates = to_date_series([row.get('날짜') for row in weights_data])
+        for row, row_date in zip(weights_data, weights_dates):
+            if row.get('계좌명') and row.get('종목코드') and row_date == target_date:
                 key = (str(row['계좌명']).strip(), str(row['종목코드']).strip())
                 existing_weights.add(key)
         print(f"✅ '{WEIGHTS_RAW_SHEET}' 확인: {len(existing_weights)}개 비중 데이터 존재.")
     except Exception as e: print(f"⚠️ '{WEIGHTS_RAW_SHEET}' 읽기 오류: {e}")
 
-    # 4. 일별 잔고 조회 및 기록 준비
+    # 4. 금현물 시트 읽기 (메인 스레드, 증권사 조회와 병렬) 및 증권사 인증/조회 결과 취합
+    gold_logs = []; gold_balance = read_gold_balance(spreadsheet, gold_ws, target_date_str, gold_logs)
+    print("\n[인증] 증권사 API 인증 결과 (조회 완료 대기)...")
+    broker_results = {}; auth_success_map = {}; all_auth_successful = True
+    for acc_name, acc_info in ACCOUNTS.items():
+        if acc_name not in broker_futures: auth_success_map[acc_name] = True; print(f"  > {acc_name} 인증 불필요."); continue
+        try: broker_results[acc_name] = broker_futures[acc_name].result()
+        except Exception as e_future:
+            broker_results[acc_name] = {'auth_ok': False, 'balance': 0, 'holding_result': None, 'auth_logs': [f"🔥 {acc_name} 인증/조회 작업 오류: {e_future}"], 'fetch_logs': []}
+        for log_line in broker_results[acc_name]['auth_logs']: print(log_line)
+        auth_success_map[acc_name] = broker_results[acc_name]['auth_ok']
+        if not auth_success_map[acc_name]: all_auth_successful = False
+    if not all_auth_successful: print("⚠️ 일부 계좌 인증 실패.")
+
     print(f"\n[잔고 조회/기록] {target_date_str} 기준 시작...")
     daily_balances_to_add = []; account_balances = {}; holding_api_results = {}
     for acc_name, acc_info in ACCOUNTS.items():
@@ -183,50 +350,13 @@ def main():
             print(f"  > {acc_name}: 인증 실패 또는 확인 불가, 잔고 0 처리 및 건너<0xEB><0x81><0x91.")
             balance = 0; holding_api_results[acc_name] = None
         else:
-            api_call_needed = (acc_info['type'] != 'GOLD')
-            print(f"  > {acc_name}: 잔고 및 보유 현황 조회/읽기 시도 ({'신규' if not was_already_in_sheet else '기존 잔고 있으나 Holdings 확인'}) ...")
-            if acc_info['type'] == 'KIWOOM_ISA':
-                kiwoom_bal_result = None; kiwoom_holding_result = None
-                try: kiwoom_bal_result = kiwoom_api.get_daily_account_profit_loss(target_date_yyyymmdd, target_date_yyyymmdd)
-                except Exception as e_kw_bal: print(f"    - API(kt00016) 호출 오류: {e_kw_bal}")
-                try: kiwoom_holding_result = kiwoom_api.get_account_evaluation_balance()
-                except Exception as e_kw_hold: print(f"    - API(kt00018) 호출 오류: {e_kw_hold}")
-                holding_api_results[acc_name] = kiwoom_holding_result
-                if kiwoom_bal_result and kiwoom_bal_result.get('success'): balance = clean_num_str(kiwoom_bal_result['data'].get('tot_amt_to', '0')); print(f"    - API(kt00016) 조회 성공: {balance:,} 원")
-                else:
-                    print(f"    - API(kt00016) 조회 실패 또는 오류 응답.")
-                    if kiwoom_holding_result and kiwoom_holding_result.get('success'): balance = clean_num_str(kiwoom_holding_result['data'].get('tot_evlt_amt', '0')); print(f"    - API(kt00018)의 총평가금액으로 대체: {balance:,} 원 (예수금 확인 필요)")
-                    else: print(f"    - API(kt00018) 조회도 실패하여 잔고 0 처리.")
-            elif acc_info['type'] == 'KIS_PEN':
-                pen_bal_result = None
-                try: pen_bal_result = kis_api_pen.get_inquire_balance_obj()
-                except Exception as e_pen_bal: print(f"    - API(TTTC8434R) 호출 오류: {e_pen_bal}")
-                holding_api_results[acc_name] = pen_bal_result
-                if pen_bal_result and pen_bal_result.get("rt_cd") == "0": balance = clean_num_str(pen_bal_result.get('output2', [{}])[0].get('tot_evlu_amt', '0')); print(f"    - API(TTTC8434R) 조회 성공: {balance:,} 원")
-                else: print(f"    - API(TTTC8434R) 조회 실패 또는 오류 응답.")
-            elif acc_info['type'] == 'KIS_IRP':
-                df_irp_holdings_bal = None
-                try: df_irp_holdings_bal = kis_api_irp.get_inquire_present_balance_irp()
-                except Exception as e_irp_bal: print(f"    - API(TTTC2202R) 호출 오류: {e_irp_bal}")
-                holding_api_results[acc_name] = df_irp_holdings_bal
-                if isinstance(df_irp_holdings_bal, pd.DataFrame) and not df_irp_holdings_bal.empty and 'evlu_amt' in df_irp_holdings_bal.columns:
-                    try:
-                        df_irp_holdings_bal['evlu_amt_num'] = df_irp_holdings_bal['evlu_amt'].apply(lambda x: clean_num_str(x, int))
-                        balance = df_irp_holdings_bal['evlu_amt_num'].sum(); print(f"    - API(TTTC2202R) 조회 성공 (보유 종목 평가액 합계): {balance:,} 원"); print(f"    ⚠️ IRP 예수금 확인 필요.")
-                    except Exception as e_irp_sum: print(f"    - 잔고 계산 오류: {e_irp_sum}")
-                else: print(f"    - API(TTTC2202R) 조회 실패 또는 빈 결과.")
-            elif acc_info['type'] == 'GOLD':
-                api_call_needed = False
-                try:
-                    gold_data = gold_ws.get_all_records(expected_headers=['날짜', '평가액']); df_gold = pd.DataFrame(gold_data)
-                    if not df_gold.empty:
-                        gold_row = df_gold[df_gold['날짜'] == target_date_str]
-                        if not gold_row.empty: balance = clean_num_str(gold_row.iloc[0]['평가액'])
-                        else: print(f"    - 시트에서 {target_date_str} 데이터 없음.")
-                    else: print(f"    - {GOLD_SHEET} 시트 데이터 없음.")
-                    print(f"    - 시트 읽기 값: {balance:,} 원")
-                except Exception as e_gold: print(f"    - 시트 읽기 오류: {e_gold}")
-            if api_call_needed: time.sleep(0.21)
+            print(f"  > {acc_name}: 잔고 및 보유 현황 조회/읽기 결과 ({'신규' if not was_already_in_sheet else '기존 잔고 있으나 Holdings 확인'}) ...")
+            if acc_info['type'] == 'GOLD':
+                for log_line in gold_logs: print(log_line)
+                balance = gold_balance
+            else:
+                for log_line in broker_results[acc_name]['fetch_logs']: print(log_line)
+                balance = broker_results[acc_name]['balance']; holding_api_results[acc_name] = broker_results[acc_name]['holding_result']
         try: python_balance_value = int(float(balance))
         except (ValueError, TypeError): python_balance_value = 0
         account_balances[acc_name] = python_balance_value
@@ -238,7 +368,7 @@ def main():
     # 4-5. 일별 잔고 시트 기록
     if daily_balances_to_add:
         print(f"\n💾 '{BALANCE_RAW_SHEET}' 시트에 {len(daily_balances_to_add)} 건의 신규 잔고 데이터 추가 시도...")
-        try: balance_ws.append_rows(daily_balances_to_add, value_input_option='USER_ENTERED'); print("✅ 잔고 데이터 추가 완료!")
+        try: remember_appended_range(spreadsheet, balance_ws, balance_ws.append_rows(daily_balances_to_add, value_input_option='USER_ENTERED')); print("✅ 잔고 데이터 추가 완료!")
         except Exception as e: raise IOError(f"❌ 잔고 데이터 추가 오류: {e}") from e
     else: print(f"\nℹ️ '{BALANCE_RAW_SHEET}' 시트에 추가할 신규 잔고 데이터 없음.")
 
@@ -251,11 +381,11 @@ def main():
         # 5-1. 설정 시트 매핑 정보 읽기 ('국적' 헤더 사용)
         asset_map = {}; settings_map_success = False
         try:
-            print("  > 설정 시트 데이터 읽는 중..."); settings_values = settings_ws.get_all_values()
+            required_cols = ['종목코드', '종목명', '구분', '국적']
+            print("  > 설정 시트 데이터 읽는 중..."); settings_values = read_settings_values(spreadsheet, settings_ws, required_cols)
             if len(settings_values) > 1:
                 header = settings_values[0]
                 try:
-                    required_cols = ['종목코드', '종목명', '구분', '국적']
                     col_indices = {}
                     missing_cols = []
                     for col in required_cols:
@@ -306,7 +436,9 @@ def main():
                  continue
 
             acc_type = ACCOUNTS[acc_name]['type']; stock_list = []
-            if acc_type == 'KIWOOM_ISA' and isinstance(result, dict) and result.get('success'): stock_list = result['data'].get('acnt_evlt_remn_indv_tot', [])
+            if acc_type == 'KIWOOM_ISA' and isinstance(result, dict) and result.get('success'):
+                stock_list = result['data'].get('acnt_evlt_remn_indv_tot', [])
+                if not result.get('complete', True): print(f"    ⚠️ {acc_name} 보유 종목 연속 조회 미완료 ({result.get('pages')}페이지까지) → 일부 종목이 비중에서 빠질 수 있습니다.")
             elif acc_type == 'KIS_PEN' and isinstance(result, dict) and result.get("rt_cd") == "0": stock_list = result.get('output1', [])
             elif acc_type == 'KIS_IRP' and isinstance(result, pd.DataFrame) and not result.empty:
                 try:
@@ -388,7 +520,7 @@ def main():
         # 5-4. 일별 비중 시트 기록
         if weights_rows_to_add:
             print(f"\n💾 '{WEIGHTS_RAW_SHEET}' 시트에 {len(weights_rows_to_add)} 건의 비중 데이터 추가 시도...")
-            try: weights_ws.append_rows(weights_rows_to_add, value_input_option='USER_ENTERED'); print("✅ 비중 데이터 추가 완료!")
+            try: remember_appended_range(spreadsheet, weights_ws, weights_ws.append_rows(weights_rows_to_add, value_input_option='USER_ENTERED')); print("✅ 비중 데이터 추가 완료!")
             except Exception as e: raise IOError(f"❌ 비중 데이터 추가 오류: {e}") from e
         else: print(f"\nℹ️ '{WEIGHTS_RAW_SHEET}' 시트에 추가할 신규 비중 데이터 없음.")
 
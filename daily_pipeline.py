@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# daily_pipeline.py: 일일 업데이트 스크립트들을 한 프로세스 안에서 의존성 그래프(DAG)로 실행
+# - 단계: 키움 매매일지(trades) / 수익률 시트 날짜·가격(prices) → 잔고·비중(balances) → TWR·손익(performance) → 결과 파일 Git 동기화(git_sync)
+# - 한 프로세스에서 실행하므로 구글 시트 인증·스프레드시트/워크시트 핸들(sheets_client), 로컬 시트 미러(sheet_mirror), 증권사 토큰(인증 모듈 상태)을 단계끼리 공유
+# - 선행 단계가 모두 끝난 단계부터 바로 시작 (서로 독립인 매매일지 동기화와 가격 업데이트는 병렬 실행)
+# - 단계별 입력 지문(fingerprint)이 마지막 성공 실행과 같으면 건너뜀 (pipeline_state.json, --force로 무시)
+# - 사용: python daily_pipeline.py [--force] [--only=prices,performance] [--full-rebuild] [--list]
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import sheets_client
+import sheet_columns # 입력 지문 계산 시 필요한 열만 읽기
+
+# --- 텔레그램 유틸리티 임포트 ---
+try:
+    import telegram_utils
+except ModuleNotFoundError:
+    print("⚠️ telegram_utils.py 모듈을 찾을 수 없습니다. 텔레그램 알림이 비활성화됩니다.")
+    class MockTelegramUtils:
+        def send_telegram_message(self, message):
+            print("INFO: telegram_utils 모듈 없음 - 텔레그램 메시지 발송 건너뜀:", message[:100])
+    telegram_utils = MockTelegramUtils()
+# --- ---
+
+# --- 로컬 시트 미러 임포트 (없으면 각 단계가 시트 직접 읽기) ---
+try:
+    import sheet_mirror
+except ImportError:
+    sheet_mirror = None
+# --- ---
+
+# --- 설정 ---
+GOOGLE_SHEET_NAME = 'KYI_자산배분'
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_STATE_PATH = os.path.join(CURRENT_DIR, 'pipeline_state.json') # {단계: {fingerprint, status, finished_at}}
+MAX_PIPELINE_WORKERS = 3 # 동시에 실행할 단계 수
+BLOCKING_STATUSES = ('failed', 'blocked') # 이 상태의 선행 단계가 있으면 후속 단계 실행 안 함
+STATUS_ICONS = {'success': '✅', 'warning': '⚠️', 'unchanged': 'ℹ️', 'failed': '❌', 'blocked': '⛔'}
+SCRIPT_NAME = os.path.basename(__file__)
+# --- ---
+
+_state_lock = threading.Lock()
+
+# --- 상태 파일 ---
+def load_pipeline_state():
+    """마지막 실행 상태(JSON)를 읽습니다. 없거나 손상된 경우 빈 딕셔너리."""
+    if not os.path.exists(PIPELINE_STATE_PATH): return {}
+    try:
+        with open(PIPELINE_STATE_PATH, 'r', encoding='utf-8') as f: state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except Exception as e: print(f"⚠️ 파이프라인 상태 로드 실패 ({e}). 모든 단계를 실행합니다."); return {}
+
+def save_pipeline_state(state):
+    try:
+        with open(PIPELINE_STATE_PATH, 'w', encoding='utf-8') as f: json.dump(state, f, ensure_ascii=False, indent=4)
+        return True
+    except Exception as e: print(f"❌ 파이프라인 상태 저장 실패: {e}"); return False
+# --- ---
+
+# --- 단계 실행 함수 (반환: (메시지, 경고 여부). 예외 발생 시 실패) ---
+def run_trades(context):
+    import Workspace_kiwoom_trades
+    message, has_failures = Workspace_kiwoom_trades.main() # 조회 실패/미완료 날짜는 경고 (체크포인트 기준으로 재실행 시 다시 조회)
+    return message, has_failures
+
+def run_prices(context):
+    import sheet_updater
+    message, has_failures = sheet_updater.main() # 휴장일 등 일부 작업 실패는 경고로 처리 (후속 단계 진행)
+    return message, has_failures
+
+def run_balances(context):
+    import daily_batch
+    return daily_batch.main(), False
+
+def run_performance(context):
+    import portfolio_performance
+    success = portfolio_performance.main(full_rebuild=context['full_rebuild'])
+    if success: return f"✅ `portfolio_performance.py` 실행 완료", False
+    return "⚠️ `portfolio_performance.py` 계산, 저장 또는 그래프 생성 중 오류 발생 (로그 확인)", True
+
+def run_git_sync(context):
+    import git_sync
+    git_sync.main()
+    return "✅ `git_sync.py` 실행 완료", False
+# --- ---
+
+# --- 입력 지문 (None: 항상 실행) ---
+def fingerprint_today(context):
+    """오늘 날짜 (하루 1회 실행 단계)"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+def fingerprint_balance_target(context):
+    """잔고/비중 기록 대상 영업일"""
+    import daily_batch
+    return daily_batch.get_target_date().strftime('%Y-%m-%d')
+
+def fingerprint_performance_inputs(context):
+    """수익률 시트(날짜/입금/출금/평가액)와 배당일지 열 내용 해시. 결과 파일이 없거나 전체 재계산 요청 시 None"""
+    if context['full_rebuild'] or context['spreadsheet'] is None: return None
+    import portfolio_performance as perf
+    if not all(os.path.exists(path) for path in (perf.TWR_CSV_PATH, perf.GAIN_LOSS_JSON_PATH)): return None
+    return_cols = [sheet_columns.column_letter(idx) for idx in (perf.DATE_COL_IDX, perf.DEPOSIT_COL_IDX, perf.WITHDRAWAL_COL_IDX, perf.VALUE_COL_IDX)]
+    dividend_cols = [sheet_columns.column_letter(idx) for idx in (perf.DIV_DATE_IDX, perf.DIV_AMOUNT_IDX, perf.DIV_ACCOUNT_IDX)]
+    specs = [(sheet_name, return_cols) for sheet_name in perf.ACCOUNT_SHEETS.values()] + [(perf.DIVIDEND_SHEET_NAME, dividend_cols)]
+    frames = sheet_columns.read_columns(context['spreadsheet'], specs, typed=True, use_mirror=False) # 지문은 항상 시트에서 직접 읽음 (필요한 열만 1회 요청, 미러 상태와 무관)
+    if any(frame.attrs.get('missing') for frame in frames.values()): return None
+    digest = hashlib.sha256()
+    for tab, _ in specs: digest.update(json.dumps([tab, frames[tab].values.tolist()], ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def fingerprint_result_files(context):
+    """결과 파일(twr_results.csv, gain_loss.json) 내용 해시. 파일이 없으면 None"""
+    import git_sync
+    digest = hashlib.sha256()
+    for file_name in git_sync.files_to_add:
+        path = os.path.join(git_sync.repo_path, file_name)
+        if not os.path.exists(path): return None
+        with open(path, 'rb') as f: digest.update(file_name.encode('utf-8')); digest.update(f.read())
+    return digest.hexdigest()
+# --- ---
+
+# --- 단계 정의 (의존성 그래프) ---
+# deps: 선행 단계, writes_sheet: 구글 시트에 쓰는 단계 (끝나면 미러 재동기화 표시)
+STEPS = {
+    'trades': {'desc': '키움 매매 내역 → 매매일지_Raw', 'deps': [], 'run': run_trades, 'fingerprint': fingerprint_today, 'writes_sheet': True},
+    'prices': {'desc': '수익률 시트 날짜 추가 / 금현물·IRP 가격 입력', 'deps': [], 'run': run_prices, 'fingerprint': fingerprint_today, 'writes_sheet': True},
+    'balances': {'desc': '계좌별 잔고 / 종목 비중 기록', 'deps': ['prices'], 'run': run_balances, 'fingerprint': fingerprint_balance_target, 'writes_sheet': True},
+    'performance': {'desc': 'TWR / 단순 손익 계산 및 결과 파일 저장', 'deps': ['trades', 'prices', 'balances'], 'run': run_performance, 'fingerprint': fingerprint_performance_inputs, 'writes_sheet': False},
+    'git_sync': {'desc': '결과 파일 커밋 / 푸시', 'deps': ['performance'], 'run': run_git_sync, 'fingerprint': fingerprint_result_files, 'writes_sheet': False},
+}
+# --- ---
+
+def resolve_steps(selected=None):
+    """실행할 단계를 의존성 순서(위상 정렬)로 반환. selected에 없는 선행 단계는 이미 끝난 것으로 간주"""
+    selected = list(STEPS) if not selected else selected
+    unknown = [name for name in selected if name not in STEPS]
+    if unknown: raise ValueError(f"알 수 없는 단계: {unknown} (가능: {list(STEPS)})")
+    order = []; visiting = set()
+    def visit(name):
+        if name in order: return
+        if name in visiting: raise ValueError(f"단계 의존성 순환: {name}")
+        visiting.add(name)
+        for dep in STEPS[name]['deps']:
+            if dep in selected: visit(dep)
+        visiting.discard(name); order.append(name)
+    for name in STEPS:
+        if name in selected: visit(name)
+    return order
+
+def run_step(name, context, state, force=False):
+    """단계 1개 실행 (입력 지문이 마지막 성공(경고 없음) 실행과 같으면 건너뜀). 반환: (상태, 메시지, 소요 시간)"""
+    step = STEPS[name]; start_time = time.time(); fingerprint = None
+    try: fingerprint = step['fingerprint'](context)
+    except Exception as e: print(f"⚠️ [{name}] 입력 지문 계산 실패 (실행 진행): {e}")
+    with _state_lock: previous = dict(state.get(name, {}))
+    if not force and fingerprint is not None and previous.get('fingerprint') == fingerprint:
+        print(f"ℹ️ [{name}] 입력 변경 없음 → 건너뜀 (마지막 실행: {previous.get('finished_at')})")
+        return 'unchanged', f"입력 변경 없음 (마지막 실행: {previous.get('finished_at')})", 0.0
+
+    print(f"\n▶️ [{name}] 시작: {step['desc']}")
+    try: message, has_warning = step['run'](context); status = 'warning' if has_warning else 'success'
+    except Exception as e:
+        print(f"🔥 [{name}] 실패: {e}"); traceback.print_exc()
+        return 'failed', f"{type(e).__name__}: {e}", time.time() - start_time
+    finally:
+        if step['writes_sheet'] and sheet_mirror is not None: sheet_mirror.invalidate() # 다음 읽기 때 미러 재동기화 (쓴 내용 반영)
+    elapsed = time.time() - start_time
+    with _state_lock: # 경고(일부 실패) 실행은 입력 지문을 저장하지 않음 → 같은 입력으로 다시 실행하면 재시도
+        state[name] = {'fingerprint': fingerprint if status == 'success' else None, 'status': status, 'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        save_pipeline_state(state)
+    print(f"{STATUS_ICONS[status]} [{name}] 완료 ({elapsed:.2f}초)")
+    return status, message or '', elapsed
+
+def run_pipeline(selected=None, force=False, full_rebuild=False):
+    """
+    단계들을 의존성 순서대로 실행합니다. 선행 단계가 모두 끝난 단계는 즉시 병렬로 시작하고,
+    선행 단계가 실패(failed/blocked)하면 후속 단계는 실행하지 않습니다 (blocked).
+    반환: {단계: (상태, 메시지, 소요 시간)}
+    """
+    order = resolve_steps(selected)
+    print(f"🚀 일일 파이프라인 시작 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, 단계: {order}{', 강제 실행' if force else ''})")
+    context = {'spreadsheet': None, 'full_rebuild': full_rebuild}
+    try: context['spreadsheet'] = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME) # 인증/스프레드시트 핸들 1회 (모든 단계 공유)
+    except Exception as e: print(f"⚠️ 구글 시트 사전 연결 실패 (각 단계에서 재시도): {e}")
+    state = load_pipeline_state(); results = {}
+
+    pending = list(order); running = {}
+    with ThreadPoolExecutor(max_workers=MAX_PIPELINE_WORKERS) as executor:
+        while pending or running:
+            for name in list(pending): # pending은 위상 순서이므로 1회 순회로 연쇄 차단 처리
+                deps = [dep for dep in STEPS[name]['deps'] if dep in order]
+                blocked_by = [dep for dep in deps if dep in results and results[dep][0] in BLOCKING_STATUSES]
+                if blocked_by:
+                    pending.remove(name); results[name] = ('blocked', f"선행 단계 실패: {blocked_by}", 0.0)
+                    print(f"⛔ [{name}] 선행 단계 실패({blocked_by})로 실행 안 함"); continue
+                if all(dep in results for dep in deps):
+                    pending.remove(name); running[executor.submit(run_step, name, context, state, force)] = name
+            if not running: break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try: results[name] = future.result()
+                except Exception as e: results[name] = ('failed', f"{type(e).__name__}: {e}", 0.0)
+    return {name: results[name] for name in order if name in results}
+
+def format_summary(results, elapsed_time):
+    """단계별 결과 → 텔레그램 요약 메시지"""
+    failed = any(status in BLOCKING_STATUSES for status, _, _ in results.values())
+    warned = any(status == 'warning' for status, _, _ in results.values())
+    title = f"🔥 `{SCRIPT_NAME}` 실행 실패" if failed else (f"⚠️ `{SCRIPT_NAME}` 실행 완료 (일부 경고)" if warned else f"✅ `{SCRIPT_NAME}` 실행 완료")
+    lines = [f"{title} (소요 시간: {elapsed_time:.2f}초)"]
+    for name, (status, message, step_elapsed) in results.items():
+        lines.append(f"{STATUS_ICONS[status]} {name} ({step_elapsed:.1f}초): {message.splitlines()[0][:200] if message else status}")
+    return "\n".join(lines), failed
+
+# --- 스크립트 실행 및 텔레그램 알림 ---
+if __name__ == '__main__':
+    if '--list' in sys.argv:
+        for step_name, step_info in STEPS.items(): print(f"{step_name}: {step_info['desc']} (선행: {step_info['deps'] or '없음'})")
+        sys.exit(0)
+    start_run_time = time.time(); final_message = ""
+    only_arg = next((arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--only=')), '')
+    try:
+        step_results = run_pipeline([name.strip() for name in only_arg.split(',') if name.strip()] or None, force='--force' in sys.argv, full_rebuild='--full-rebuild' in sys.argv)
+        final_message, _ = format_summary(step_results, time.time() - start_run_time)
+    except Exception as e:
+        print(f"🔥 파이프라인 실행 오류: {e}")
+        final_message = f"🔥 `{SCRIPT_NAME}` 실행 실패 (소요 시간: {time.time() - start_run_time:.2f}초)\n```\n{traceback.format_exc()[-1000:]}\n```"
+    finally:
+        print(f"\n🏁 {final_message}")
+        telegram_utils.send_telegram_message(final_message)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# http_session.py: 증권사 REST API 공용 HTTP 세션 (증권사별 keep-alive Session)
+# - 증권사별 requests.Session 1개를 프로세스 전체에서 공유 (연결 풀 재사용 → 매 호출 TLS 핸드셰이크 생략)
+# - 연결/응답 타임아웃 통일
+# - 5xx / 429(호출 제한) 응답과 연결 오류는 지수 백오프(+지터)로 재시도
+
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# --- 설정 ---
+DEFAULT_TIMEOUT = (5, 15) # (연결, 응답) 타임아웃 (초)
+RETRY_TOTAL = 3 # 최대 재시도 횟수
+RETRY_BACKOFF_FACTOR = 0.5 # 재시도 대기: 0.5, 1, 2초 ... (+지터)
+RETRY_BACKOFF_JITTER = 0.3 # 재시도 대기에 더할 무작위 지터 최대값 (초)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504) # KIS는 초당 호출 제한 초과 시 500(EGW00201) 응답
+POOL_CONNECTIONS = 2; POOL_MAXSIZE = 8
+# --- ---
+
+_lock = threading.Lock()
+_sessions = {} # {증권사 이름: Session}
+
+class _JitterRetry(Retry):
+    """지수 백오프에 무작위 지터를 더하는 Retry (urllib3 1.x/2.x 공통)"""
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, RETRY_BACKOFF_JITTER) if backoff > 0 else backoff
+
+def create_session(allowed_methods=('GET',)):
+    """연결 풀과 재시도 정책이 설정된 새 Session 생성"""
+    retry = _JitterRetry(total=RETRY_TOTAL, connect=RETRY_TOTAL, read=RETRY_TOTAL, status=RETRY_TOTAL,
+                         backoff_factor=RETRY_BACKOFF_FACTOR, status_forcelist=RETRY_STATUS_CODES,
+                         allowed_methods=frozenset(m.upper() for m in allowed_methods),
+                         respect_retry_after_header=True,
+                         raise_on_status=False) # 재시도 소진 시 마지막 응답을 그대로 반환 (호출 측 기존 상태코드 처리 유지)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter); session.mount('http://', adapter)
+    return session
+
+def get_session(broker, allowed_methods=('GET',)):
+    """증권사별 공용 Session 반환 (최초 호출 시 생성). allowed_methods: 재시도 허용 HTTP 메소드 (조회용 POST 포함 가능)"""
+    with _lock:
+        if broker not in _sessions: _sessions[broker] = create_session(allowed_methods)
+        return _sessions[broker]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# kis_client.py: 한국투자증권(KIS) REST API 계좌별 클라이언트
+# - KISClient 1개 = (앱키, 계좌번호, 상품코드) 1개. 계좌 정보 / HTTP 세션을 인스턴스에 보관하여 모듈 전역 상태(_TRENV) 없이 여러 계좌를 스레드에서 동시에 조회
+# - 토큰과 호출 한도는 앱키(+서버) 단위로 공유: 같은 앱키를 쓰는 계좌끼리는 토큰 1개(token_manager)와 속도 제한 버킷 1개(rate_limiter)를 함께 사용
+# - 계좌 추가: KIS_ACCOUNTS에 항목 1개 추가 (설정 파일 / 계좌번호 키 / 상품코드 / 토큰 파일). 인증 모듈 파일을 복사할 필요 없음
+# - kis_auth_pension.py / kis_auth_irp.py, kis_domstk_pension.py / kis_domstk_irp.py는 이 클라이언트를 쓰는 기존 함수 이름의 래퍼
+
+import os
+import json
+import hashlib
+import threading
+import traceback
+from collections import namedtuple
+from datetime import datetime
+import yaml
+import requests
+import pandas as pd
+import http_session # keep-alive 세션 (연결 풀/타임아웃/재시도)
+import token_manager # 토큰 메모리 캐시 / 프로세스 간 공유 / 만료 전 갱신
+import rate_limiter # 앱키별 토큰 버킷 (초당 호출 한도)
+from kis_pagination import iter_kis_pages
+
+# --- 설정 ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+KIS_ACCOUNTS = { # {계좌 이름: 설정 파일 / 계좌번호 키 / 기본 상품코드 / 토큰 파일 / 로그 태그}
+    'pension': {'config': 'kis_devlp.yaml', 'account_key': 'my_acct_pension', 'product': '22', 'token_file': 'access_token.txt', 'tag': 'KIS Pension'},
+    'irp': {'config': 'kis_devlp_irp.yaml', 'account_key': 'my_acct_irp', 'product': '29', 'token_file': 'access_token_irp.txt', 'tag': 'KIS IRP'},
+}
+TOKEN_DATE_FORMAT = "%Y-%m-%d %H:%M:%S" # 토큰 파일 / 발급 응답의 만료 시각 형식
+# --- ---
+
+KISEnv = namedtuple('KISEnv', ['my_app', 'my_sec', 'my_acct', 'my_prod', 'my_token', 'my_url'])
+
+_app_keys_lock = threading.Lock()
+_app_keys = {} # {(앱키, 서버 URL): {'token_name', 'token_path'}} (토큰 / 호출 한도 공유)
+
+# --- 설정 파일 ---
+def load_config(config_path, tag='KIS'):
+    """YAML 설정 파일 → dict. 실패 시 None"""
+    try:
+        with open(config_path, encoding='UTF-8') as f: return yaml.load(f, Loader=yaml.FullLoader)
+    except FileNotFoundError: print(f"❌ [{tag}] 설정 파일({config_path})을 찾을 수 없습니다."); return None
+    except yaml.YAMLError as e: print(f"❌ [{tag}] 설정 파일({config_path}) 형식 오류: {e}"); return None
+    except Exception as e: print(f"❌ [{tag}] 설정 파일 로드 중 예상치 못한 오류 발생: {e}"); traceback.print_exc(); return None
+# --- ---
+
+# --- 토큰 파일 / 발급 (앱키(+서버) 단위) ---
+def read_token_file(path):
+    """토큰 파일 → (토큰, 만료 시각 datetime). 없거나 형식 오류 시 (None, None)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f: lines = f.readlines()
+        if len(lines) < 2: return None, None
+        return lines[0].strip().split(': ')[1], datetime.strptime(lines[1].strip().split(': ')[1], TOKEN_DATE_FORMAT)
+    except FileNotFoundError: return None, None
+    except (IndexError, ValueError): print(f"⚠️ [KIS] 토큰 파일({path}) 형식이 올바르지 않습니다."); return None, None
+    except IOError as e: print(f"❌ [KIS] 토큰 파일 읽기 오류: {e}"); return None, None
+
+def write_token_file(path, token, expires_at):
+    """토큰 파일 쓰기 (임시 파일 → 교체)"""
+    token_manager.atomic_write(path, f"token: {token}\nvalid-date: {expires_at.strftime(TOKEN_DATE_FORMAT)}\n")
+
+def issue_token(app_key, app_secret, base_url, tag='KIS'):
+    """KIS 토큰 발급 요청. 성공 시 (토큰, 만료 시각), 실패 시 (None, None)"""
+    print(f"🔄 [{tag}] 새 토큰 발급 시도...")
+    try:
+        headers = {"content-type": "application/json", "appkey": app_key, "appsecret": app_secret}
+        payload = {"grant_type": "client_credentials", "appkey": app_key, "appsecret": app_secret}
+        res = requests.post(f"{base_url}/oauth2/tokenP", headers=headers, data=json.dumps(payload), timeout=10)
+        res.raise_for_status() # HTTP 오류 발생 시 예외 발생 (4xx, 5xx)
+        data = res.json()
+        if 'access_token' not in data or 'access_token_token_expired' not in data:
+            print(f"❌ [{tag}] 토큰 발급 응답 오류: 필요한 키('access_token', 'access_token_token_expired') 없음.\n   응답 내용: {data}"); return None, None
+        return data['access_token'], datetime.strptime(data['access_token_token_expired'], TOKEN_DATE_FORMAT)
+    except requests.exceptions.RequestException as e: print(f"❌ [{tag}] 토큰 발급 요청 중 네트워크 오류 발생: {e}"); return None, None
+    except ValueError as e: print(f"❌ [{tag}] 토큰 발급 응답 파싱 오류: {e}"); return None, None
+    except Exception as e: print(f"❌ [{tag}] 토큰 발급 중 예상치 못한 예외 발생: {e}"); traceback.print_exc(); return None, None
+
+def _app_key_state(app_key, app_secret, base_url, token_path, tag):
+    """앱키(+서버)별 공유 상태 (최초 1회 token_manager 등록). 토큰 파일은 그 앱키를 처음 쓴 계좌의 파일 사용"""
+    key = (app_key, base_url) # 실전 / 모의 서버 토큰은 별개
+    with _app_keys_lock:
+        if key not in _app_keys:
+            token_name = f"KIS_{hashlib.sha1(f'{app_key}@{base_url}'.encode('utf-8')).hexdigest()[:8]}" # 로그에 앱키를 남기지 않도록 해시 사용
+            if any(state['token_path'] == token_path for state in _app_keys.values()): token_path = f"{token_path}.{token_name}" # 같은 토큰 파일을 다른 서버 토큰이 쓰지 않도록
+            token_manager.register(token_name, token_path,
+                                   issue=lambda: issue_token(app_key, app_secret, base_url, tag),
+                                   load=lambda: read_token_file(token_path),
+                                   save=lambda token, expires_at: write_token_file(token_path, token, expires_at))
+            _app_keys[key] = {'token_name': token_name, 'token_path': token_path}
+        return _app_keys[key]
+# --- ---
+
+# --- API 응답 ---
+class APIResp:
+    """KIS API 응답을 래핑하는 클래스"""
+    def __init__(self, resp: requests.Response):
+        self._resp = resp # 원본 requests.Response 객체
+        self._header = None
+        self._body = None
+        self._is_json = False
+        if resp is not None:
+            self._header = resp.headers
+            try: self._body = resp.json(); self._is_json = True
+            except json.JSONDecodeError: self._body = resp.text; self._is_json = False # JSON 파싱 실패 시 텍스트로 저장
+
+    def getHeader(self):
+        """응답 헤더를 반환합니다."""
+        return self._header
+
+    def getBody(self):
+        """응답 본문을 반환합니다. JSON 파싱 성공 시 딕셔너리, 실패 시 텍스트를 반환합니다."""
+        return self._body
+
+    def getResponse(self):
+        """원본 requests.Response 객체를 반환합니다."""
+        return self._resp
+
+    def isOK(self):
+        """API 응답 성공 여부 (rt_cd == '0'). JSON 응답이 아니거나 rt_cd 키가 없으면 False"""
+        if self._is_json and isinstance(self._body, dict): return self._body.get("rt_cd", "1") == "0"
+        return False
+
+    def getErrorCode(self):
+        """API 오류 코드(msg_cd). 없으면 빈 문자열"""
+        if self._is_json and isinstance(self._body, dict): return self._body.get("msg_cd", "")
+        return ""
+
+    def getErrorMessage(self):
+        """API 오류 메시지(msg1). 없으면 빈 문자열"""
+        if self._is_json and isinstance(self._body, dict): return self._body.get("msg1", "")
+        return ""
+# --- ---
+
+class KISClient:
+    """
+    KIS 계좌 1개 (앱키, 계좌번호, 상품코드) 단위 클라이언트.
+    인스턴스 속성은 생성 후 바뀌지 않고, 토큰은 token_manager / 호출 한도는 rate_limiter(앱키별 버킷)가 관리하므로 여러 스레드에서 함께 사용할 수 있습니다.
+    """
+    def __init__(self, app_key, app_secret, account, product, base_url, token_path, tag='KIS', svr='prod'):
+        self.app_key = app_key; self.app_secret = app_secret
+        self.account = account; self.product = product
+        self.base_url = base_url; self.svr = svr; self.tag = tag
+        self.session = http_session.create_session() # 계좌별 keep-alive 세션
+        self._shared = _app_key_state(app_key, app_secret, base_url, token_path, tag)
+        self.token_name = self._shared['token_name']
+
+    @classmethod
+    def from_config(cls, name, svr='prod', product=None, cfg=None):
+        """KIS_ACCOUNTS[name] 설정으로 클라이언트 생성 (cfg: 이미 읽은 설정 dict). 설정 / 필요한 키가 없으면 None"""
+        account = KIS_ACCOUNTS[name]; tag = account['tag']
+        cfg = cfg or load_config(os.path.join(CURRENT_DIR, account['config']), tag)
+        if not cfg: print(f"❌ [{tag}] 클라이언트 생성 실패: 설정 정보가 없습니다."); return None
+        values = {'my_app': cfg.get('my_app'), 'my_sec': cfg.get('my_sec'), account['account_key']: cfg.get(account['account_key']), svr: cfg.get(svr)}
+        missing = [k for k, v in values.items() if not v]
+        if missing: print(f"❌ [{tag}] 클라이언트 생성 실패: 설정 파일에 필요한 키 없음 - {missing}"); return None
+        return cls(cfg['my_app'], cfg['my_sec'], cfg[account['account_key']], product or account['product'], cfg[svr],
+                   os.path.join(CURRENT_DIR, account['token_file']), tag=tag, svr=svr)
+
+    # --- 인증 ---
+    def auth(self, force_new=False):
+        """유효한 토큰 확보 (메모리 → 토큰 파일 → 새 발급 순). 성공 시 True"""
+        if token_manager.get_token(self.token_name, force_new=force_new): return True
+        print(f"🔥 [{self.tag}] 인증 실패: 유효한 토큰을 가져올 수 없습니다."); return False
+
+    def token_expiry(self):
+        """현재 토큰 만료 시각 (없으면 None)"""
+        return token_manager.get_expiry(self.token_name)
+
+    def env(self):
+        """기존 getTREnv() 형식의 계좌 환경 정보 (토큰 없으면 my_token 빈 문자열)"""
+        token = token_manager.get_token(self.token_name)
+        return KISEnv(self.app_key, self.app_secret, self.account, self.product, f"Bearer {token}" if token else "", self.base_url)
+
+    # --- API 호출 ---
+    def fetch(self, api_url, tr_id, tr_cont="", params=None):
+        """KIS API GET 요청. APIResp 반환 (토큰 없음 / 네트워크 오류 시 None)"""
+        token = token_manager.get_token(self.token_name) # 메모리 캐시 (만료 임박 시 자동 재발급된 토큰)
+        if not token: print(f"❌ [{self.tag}] API 호출 실패 ({api_url}): 인증 토큰 없음. auth()를 먼저 호출하세요."); return None
+        url = f"{self.base_url}{api_url}"
+        headers = {
+            "authorization": f"Bearer {token}",
+            "appkey": self.app_key,
+            "appsecret": self.app_secret,
+            "tr_id": tr_id,
+            "custtype": "P", # 개인 고객 유형
+            "tr_cont": tr_cont or "", # 연속 조회 헤더
+            "Content-Type": "application/json; charset=utf-8"
+        }
+        rate_limiter.acquire('KIS', self.token_name) # 같은 앱키 호출끼리 초당 한도 공유 (한도 안이면 대기 없음)
+        try:
+            res = self.session.get(url, headers=headers, params=params or {}, timeout=http_session.DEFAULT_TIMEOUT) # 5xx/429 재시도
+            res.raise_for_status()
+            return APIResp(res)
+        except requests.exceptions.Timeout: print(f"❌ [{self.tag}] API 요청 시간 초과: GET {url}"); return None
+        except requests.exceptions.RequestException as e: print(f"❌ [{self.tag}] API 요청 중 네트워크 오류 발생: {e}"); return None
+        except Exception as e: print(f"❌ [{self.tag}] API 요청 처리 중 예상치 못한 예외 발생: {e}"); traceback.print_exc(); return None
+
+    def _account_params(self, **extra):
+        return dict({"CANO": self.account, "ACNT_PRDT_CD": self.product}, **extra)
+
+    def _output_frame(self, res, label):
+        """응답 → output1 DataFrame (호출 실패 / API 오류 / 데이터 없음 시 빈 DataFrame)"""
+        if res is None or res.getResponse().status_code != 200:
+            print(f"❌ [{self.tag}] {label} API 호출 실패! HTTP Status: {res.getResponse().status_code if res else 'N/A'}"); return pd.DataFrame()
+        body = res.getBody()
+        if not res.isOK():
+            print(f"❌ [{self.tag}] {label} API 오류! (rt_cd: {body.get('rt_cd') if isinstance(body, dict) else 'N/A'}, msg_cd: {res.getErrorCode()}) msg: {res.getErrorMessage()}"); return pd.DataFrame()
+        output1 = body.get("output1")
+        if output1 is None or not isinstance(output1, list): print(f"❗ [{self.tag}] {label}: output1이 존재하지 않거나 리스트가 아님"); return pd.DataFrame()
+        return pd.DataFrame(output1)
+
+    # --- 조회 ---
+    def inquire_balance(self):
+        """주식잔고조회 (TTTC8434R). 응답 바디 dict 반환 (호출 실패 시 None)"""
+        params = self._account_params(AFHR_FLPR_YN="N", OFL_YN="", INQR_DVSN="00", UNPR_DVSN="01", FUND_STTL_ICLD_YN="N",
+                                      FNCG_AMT_AUTO_RDPT_YN="N", PRCS_DVSN="00", CTX_AREA_FK100="", CTX_AREA_NK100="")
+        res = self.fetch("/uapi/domestic-stock/v1/trading/inquire-balance", "TTTC8434R", "", params)
+        return res.getBody() if res is not None else None
+
+    def inquire_pension_balance(self):
+        """퇴직연금 잔고조회 (TTTC2208R) → output1 DataFrame"""
+        params = self._account_params(ACCA_DVSN_CD="00", INQR_DVSN="00", CTX_AREA_FK100="", CTX_AREA_NK100="")
+        return self._output_frame(self.fetch("/uapi/domestic-stock/v1/trading/pension/inquire-balance", "TTTC2208R", "", params), "퇴직연금 잔고")
+
+    def inquire_present_balance(self):
+        """퇴직연금 체결기준잔고 (TTTC2202R) → output1 DataFrame"""
+        params = self._account_params(USER_DVSN_CD="00", CTX_AREA_FK100="", CTX_AREA_NK100="")
+        return self._output_frame(self.fetch("/uapi/domestic-stock/v1/trading/pension/inquire-present-balance", "TTTC2202R", "", params), "체결기준잔고")
+
+    def iter_daily_ccld_pages(self, inqr_strt_dt, inqr_end_dt, tr_id="TTTC8001R", inqr_dvsn="01", tr_cont="", FK100="", NK100="", max_pages=None):
+        """주식일별주문체결 페이지 제너레이터 (kis_pagination.iter_kis_pages). 저장된 tr_cont/FK100/NK100으로 이어서 조회 가능"""
+        params = self._account_params(INQR_STRT_DT=inqr_strt_dt, INQR_END_DT=inqr_end_dt, SLL_BUY_DVSN_CD="00", INQR_DVSN=inqr_dvsn, PDNO="",
+                                      CCLD_DVSN="00", ORD_GNO_BRNO="", ODNO="", INQR_DVSN_3="00", INQR_DVSN_1="")
+        return iter_kis_pages(self.fetch, '/uapi/domestic-stock/v1/trading/inquire-daily-ccld', tr_id, params, tr_cont, FK100, NK100,
+                              max_pages=max_pages, log_prefix=f"[{self.tag}]")
+
+    def inquire_daily_ccld(self, inqr_strt_dt, inqr_end_dt, columns, tr_id="TTTC8001R", inqr_dvsn="01", tr_cont="", FK100="", NK100="", max_pages=None):
+        """주식일별주문체결 전체 페이지 → DataFrame (columns 중 응답에 있는 컬럼만, 없으면 빈 DataFrame)"""
+        records = []
+        for page in self.iter_daily_ccld_pages(inqr_strt_dt, inqr_end_dt, tr_id, inqr_dvsn, tr_cont, FK100, NK100, max_pages):
+            print(f"📥 [{self.tag}] {page['page']}페이지: {len(page['records'])}건{' (다음 페이지 있음)' if page['has_next'] else ''}")
+            records.extend(page['records'])
+        if not records: return pd.DataFrame()
+        df = pd.DataFrame(records) # 모든 페이지 수신 후 1회 생성
+        available_cols = [col for col in columns if col in df.columns]
+        if len(available_cols) < len(columns): print(f"⚠️ [{self.tag}] 필요한 컬럼 중 일부가 누락되었습니다. 사용 가능한 컬럼: {available_cols}")
+        return df[available_cols] if available_cols else pd.DataFrame()
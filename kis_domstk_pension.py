@@ -4,13 +4,18 @@
 """
 
 import pandas as pd
-import time
 from datetime import datetime
 import kis_auth_pension as kis
 
-# 공통 fetch 함수
+# 공통 fetch 함수 (조회 함수들은 계좌 클라이언트 kis_client.KISClient의 메소드 사용)
 _url_fetch = kis._url_fetch
 
+def _client():
+    """연금 계좌 KISClient (설정 오류 시 None)"""
+    client = kis.get_client()
+    if client is None: print("❌ [KIS Pension] 계좌 클라이언트를 만들 수 없습니다. 설정 파일을 확인하세요.")
+    return client
+
 
 ##################################################
 # ✅ [STEP 2] 잔고 조회
@@ -18,24 +23,8 @@ _url_fetch = kis._url_fetch
 
 # [1] 주식잔고조회 (요약 Object)
 def get_inquire_balance_obj():
-    url = "/uapi/domestic-stock/v1/trading/inquire-balance"
-    tr_id = "TTTC8434R"
-    params = {
-        "CANO": kis.getTREnv().my_acct,
-        "ACNT_PRDT_CD": kis.getTREnv().my_prod,
-        "AFHR_FLPR_YN": "N",
-        "OFL_YN": "",
-        "INQR_DVSN": "00",
-        "UNPR_DVSN": "01",
-        "FUND_STTL_ICLD_YN": "N",
-        "FNCG_AMT_AUTO_RDPT_YN": "N",
-        "PRCS_DVSN": "00",
-        "CTX_AREA_FK100": "",
-        "CTX_AREA_NK100": ""
-    }
-
-    res = _url_fetch(url, tr_id, "", params)
-    body = res.getBody()
+    client = _client()
+    body = client.inquire_balance() if client else None # TTTC8434R
 
     # 요약 출력
     try:
@@ -74,8 +63,8 @@ def get_inquire_balance_lst():
 ##################################################
 
 # [3] 주식일별주문체결 (페이징 지원)
-def get_inquire_daily_ccld_lst(dv="01", inqr_strt_dt="", inqr_end_dt="", tr_cont="", FK100="", NK100="", dataframe=None):
-    url = '/uapi/domestic-stock/v1/trading/inquire-daily-ccld'
+def iter_inquire_daily_ccld_pages(dv="01", inqr_strt_dt="", inqr_end_dt="", tr_cont="", FK100="", NK100="", max_pages=None):
+    """주식일별주문체결 페이지 제너레이터 (kis_pagination.iter_kis_pages). 저장된 tr_cont/FK100/NK100으로 이어서 조회 가능"""
     tr_id = "TTTC8001R" if dv == "01" else "CTSC9115R"
 
     if inqr_strt_dt == "":
@@ -83,54 +72,22 @@ def get_inquire_daily_ccld_lst(dv="01", inqr_strt_dt="", inqr_end_dt="", tr_cont
     if inqr_end_dt == "":
         inqr_end_dt = datetime.today().strftime("%Y%m%d")
 
-    params = {
-        "CANO": kis.getTREnv().my_acct,
-        "ACNT_PRDT_CD": kis.getTREnv().my_prod,
-        "INQR_STRT_DT": inqr_strt_dt,
-        "INQR_END_DT": inqr_end_dt,
-        "SLL_BUY_DVSN_CD": "00",
-        "INQR_DVSN": "01",
-        "PDNO": "",
-        "CCLD_DVSN": "00",
-        "ORD_GNO_BRNO": "",
-        "ODNO": "",
-        "INQR_DVSN_3": "00",
-        "INQR_DVSN_1": "",
-        "CTX_AREA_FK100": FK100,
-        "CTX_AREA_NK100": NK100
-    }
-
-    print("\n📤 [요청 파라미터 확인]")
-    for k, v in params.items():
-        print(f"  {k}: {v}")
-
-    res = _url_fetch(url, tr_id, tr_cont, params)
-    header = res.getHeader()
-    body = res.getBody()
-
-    print("\n📥 [응답 헤더]")
-    for k, v in header.items():
-        print(f"  {k}: {v}")
-
-    print("\n📥 [응답 바디]")
-
-    output1 = body.get("output1", None)
-    if not output1 or not isinstance(output1, list):
-        print("❗ output1이 존재하지 않거나 리스트가 아님")
-        return pd.DataFrame()
+    print(f"\n📤 [요청 파라미터 확인] TR_ID: {tr_id}, 기간: {inqr_strt_dt}~{inqr_end_dt}")
+    client = _client()
+    return client.iter_daily_ccld_pages(inqr_strt_dt, inqr_end_dt, tr_id, "01", tr_cont, FK100, NK100, max_pages) if client else iter(())
 
-    df = pd.DataFrame(output1)
-    df = df[["ord_dt", "prdt_name", "sll_buy_dvsn_cd_name", "ord_qty", "ord_unpr", "tot_ccld_amt"]]
 
-    dataframe = pd.concat([dataframe, df], ignore_index=True) if dataframe is not None else df
+def get_inquire_daily_ccld_lst(dv="01", inqr_strt_dt="", inqr_end_dt="", tr_cont="", FK100="", NK100="", dataframe=None, max_pages=None):
+    records = []
+    for page in iter_inquire_daily_ccld_pages(dv, inqr_strt_dt, inqr_end_dt, tr_cont, FK100, NK100, max_pages):
+        print(f"📥 {page['page']}페이지: {len(page['records'])}건{' (다음 페이지 있음)' if page['has_next'] else ''}")
+        records.extend(page['records'])
 
-    tr_cont = header.get("tr_cont", "")
-    FK100 = body.get("ctx_area_fk100", "")
-    NK100 = body.get("ctx_area_nk100", "")
+    if not records:
+        print("❗ output1이 존재하지 않거나 리스트가 아님")
+        return dataframe if dataframe is not None else pd.DataFrame()
 
-    if tr_cont in ["F", "M"]:
-        print("📥 다음 페이지 요청 중...")
-        time.sleep(0.2)
-        return get_inquire_daily_ccld_lst(dv, inqr_strt_dt, inqr_end_dt, "N", FK100, NK100, dataframe)
+    df = pd.DataFrame(records) # 모든 페이지 수신 후 1회 생성
+    df = df[["ord_dt", "prdt_name", "sll_buy_dvsn_cd_name", "ord_qty", "ord_unpr", "tot_ccld_amt"]]
 
-    return dataframe
+    return pd.concat([dataframe, df], ignore_index=True) if dataframe is not None else df
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# kis_pagination.py: KIS 연속 조회(페이징) 공용 제너레이터
+# - 응답 헤더 tr_cont(F/M: 다음 페이지 있음)와 바디 ctx_area_fk100 / ctx_area_nk100 키를 따라 반복 조회
+# - 재귀 + 페이지마다 DataFrame concat 대신 페이지 단위 레코드(list of dict)를 yield (스택 고정, 선형 시간)
+# - 페이지 수 제한(max_pages) 및 저장된 연속 키로 이어서 조회(resume) 지원
+# - 페이지 간 호출 간격은 url_fetch(KISClient.fetch)의 rate_limiter가 관리 (고정 대기 없음)
+
+MORE_PAGES_TR_CONT = ("F", "M") # 응답 헤더 tr_cont 값: 다음 페이지 존재
+NEXT_PAGE_TR_CONT = "N" # 다음 페이지 요청 시 요청 헤더 tr_cont 값
+
+def iter_kis_pages(url_fetch, api_url, tr_id, params, tr_cont="", FK100="", NK100="", max_pages=None, output_key="output1", log_prefix="[KIS]"):
+    """
+    KIS 연속 조회 API를 페이지 단위로 순회하는 제너레이터.
+    매 페이지마다 dict를 yield 합니다:
+        {'page': 페이지 번호(1부터), 'records': output 레코드 리스트,
+         'tr_cont': 다음 요청용 tr_cont, 'FK100': 연속키, 'NK100': 연속키, 'has_next': 다음 페이지 존재 여부}
+    마지막으로 yield 된 페이지의 tr_cont/FK100/NK100을 저장해 두면 같은 인자로 이어서 조회할 수 있습니다.
+    API 오류 시 경고를 출력하고 순회를 종료합니다.
+    """
+    page_no = 0
+    while max_pages is None or page_no < max_pages:
+        page_params = dict(params, CTX_AREA_FK100=FK100, CTX_AREA_NK100=NK100)
+        res = url_fetch(api_url, tr_id, tr_cont, page_params)
+        if res is None or res.getResponse().status_code != 200:
+            print(f"❌ {log_prefix} API 호출 실패! HTTP Status: {res.getResponse().status_code if res else 'N/A'} (페이지 {page_no + 1})")
+            return
+        header = res.getHeader(); body = res.getBody()
+        rt_cd = body.get("rt_cd", "1")
+        if rt_cd != "0":
+            print(f"❌ {log_prefix} API 오류 발생! (rt_cd: {rt_cd}, msg_cd: {body.get('msg_cd')}, 페이지 {page_no + 1})")
+            print(f"   오류 메시지(msg1): {body.get('msg1')}")
+            return
+        page_no += 1
+        records = body.get(output_key) or []
+        if not isinstance(records, list): records = []
+        has_next = header.get("tr_cont", "") in MORE_PAGES_TR_CONT
+        FK100 = body.get("ctx_area_fk100", ""); NK100 = body.get("ctx_area_nk100", ""); tr_cont = NEXT_PAGE_TR_CONT
+        yield {'page': page_no, 'records': records, 'tr_cont': tr_cont, 'FK100': FK100, 'NK100': NK100, 'has_next': has_next}
+        if not has_next: return
+    print(f"ℹ️ {log_prefix} 페이지 제한({max_pages})에 도달하여 조회를 멈춥니다. 이어서 조회: tr_cont='{tr_cont}', FK100='{FK100}', NK100='{NK100}'")
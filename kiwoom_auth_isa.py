@@ -8,6 +8,7 @@ import os # os 모듈 임포트 확인
 from datetime import datetime, timedelta
 import traceback # 오류 상세 출력을 위해 추가
 import sys # 시스템 기능 위해 추가
+import token_manager # 토큰 메모리 캐시 / 프로세스 간 공유 / 만료 전 갱신
 
 # --- 경로 설정 ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +20,7 @@ ACCESS_TOKEN_PATH = os.path.join(CURRENT_DIR, 'access_kiwoom_token.txt') # 키
 # --- 전역 변수 ---
 _config = {} # YAML 설정 저장
 _access_token_info = {} # 토큰 정보 저장 (토큰 값, 만료 시간 등)
+TOKEN_NAME = 'KIWOOM_ISA' # token_manager 등록 이름
 # --- ---
 
 # --- 설정 파일 로드 ---
@@ -46,50 +48,22 @@ def load_config():
 # --- ---
 
 # --- 토큰 파일 처리 ---
-def save_token_to_file(token_data):
+def save_token_to_file(token, expires_at, token_type='Bearer'):
     """
-    발급받은 키움 토큰 정보를 파일에 저장 (키움 응답 형식에 맞게 처리)
+    키움 토큰 정보를 파일에 JSON으로 저장 (expires_at: 만료 1분 전으로 버퍼를 둔 datetime)
     파일 경로는 스크립트 위치 기준으로 설정된 ACCESS_TOKEN_PATH를 사용합니다.
     """
     global _access_token_info
     try:
-        # 키움 응답의 'token' 키 사용 (실제 토큰 값)
-        access_token = token_data.get('token')
-        if not access_token:
-            print("❌ [Kiwoom] 토큰 저장 실패: 응답에 'token' 키가 없습니다.")
-            return # 저장 불가
-
-        # 키움 응답의 'expires_dt' 파싱 (YYYYMMDDHHMMSS 형식)
-        expires_dt_str = token_data.get('expires_dt')
-        expire_time = None
-        if expires_dt_str:
-            try:
-                # 문자열을 datetime 객체로 변환
-                expire_time = datetime.strptime(expires_dt_str, "%Y%m%d%H%M%S")
-            except ValueError:
-                print(f"❌ [Kiwoom] 토큰 저장 오류: 날짜 형식 오류 ('expires_dt': {expires_dt_str}).")
-                # 형식 오류 시 유효 시간 추정 불가, 저장은 하되 만료 시간은 None 처리 또는 기본값 사용
-                expire_time = None # 또는 기본값 설정 (예: datetime.now() + timedelta(hours=24))
-        else:
-            print("⚠️ [Kiwoom] 토큰 저장 경고: 응답에 'expires_dt' 키가 없습니다. 만료 시간 확인 불가.")
-            # 만료 시간 없으면 저장은 하되 유효성 검사 어려움
-
-        # 만료 1분 전으로 버퍼 설정 (선택적)
-        expire_time_buffered_str = None
-        if expire_time:
-            expire_time_buffered = expire_time - timedelta(seconds=60)
-            expire_time_buffered_str = expire_time_buffered.strftime("%Y-%m-%d %H:%M:%S") # 저장할 형식
-
+        expire_time_buffered_str = expires_at.strftime("%Y-%m-%d %H:%M:%S") if expires_at else None # 저장할 형식
         # 저장할 토큰 정보 딕셔너리 생성
         _access_token_info = {
-            'access_token': access_token, # 실제 토큰 값
-            'token_type': token_data.get('token_type', 'Bearer'), # 기본값 Bearer
-            'expires_at': expire_time_buffered_str # 계산된 만료 시각 문자열 (None일 수 있음)
+            'access_token': token, # 실제 토큰 값
+            'token_type': token_type or 'Bearer', # 기본값 Bearer
+            'expires_at': expire_time_buffered_str # 계산된 만료 시각 문자열
         }
-
-        # 파일에 JSON 형태로 저장 (ACCESS_TOKEN_PATH 사용)
-        with open(ACCESS_TOKEN_PATH, 'w', encoding='utf-8') as f:
-            json.dump(_access_token_info, f, indent=4)
+        # 파일에 JSON 형태로 저장 (임시 파일 → 교체: 다른 프로세스가 반쯤 쓰인 파일을 읽지 않음)
+        token_manager.atomic_write(ACCESS_TOKEN_PATH, json.dumps(_access_token_info, indent=4))
         print(f"✅ [Kiwoom] 토큰 저장 완료: {ACCESS_TOKEN_PATH} (만료 예정: {expire_time_buffered_str or '확인 불가'})")
 
     except IOError as e:
@@ -165,18 +139,23 @@ def is_token_valid():
         return False
 # --- ---
 
+def get_token_expiry():
+    """현재 토큰의 만료 시각(datetime) 반환. 토큰이 없으면 None"""
+    return token_manager.get_expiry(TOKEN_NAME)
+# --- ---
+
 # --- 토큰 발급 요청 ---
 def issue_token():
     """
-    키움 API 서버에 접근 토큰 발급을 요청하고, 성공 시 파일에 저장합니다.
-    성공 시 True, 실패 시 False를 반환합니다.
+    키움 API 서버에 접근 토큰 발급을 요청합니다. (파일 저장은 token_manager가 잠금 안에서 수행)
+    성공 시 (토큰, 만료 1분 전 datetime), 실패 시 (None, None)을 반환합니다.
     """
     global _access_token_info # 전역 변수 수정 명시
 
     # 설정 로드 확인
     if not _config:
         print("❌ [Kiwoom] 토큰 발급 실패: 설정 정보(_config)가 없습니다. load_config()를 먼저 호출하세요.")
-        return False
+        return None, None
 
     try:
         # 필요한 설정값 확인
@@ -187,7 +166,7 @@ def issue_token():
         if not all([host, app_key, secret_key]):
             missing = [k for k, v in {'base_url': host, 'appkey': app_key, 'secretkey': secret_key}.items() if not v]
             print(f"❌ [Kiwoom] 토큰 발급 실패: 설정 파일에 필요한 키 없음 - {missing}")
-            return False
+            return None, None
 
         # API 요청 준비
         endpoint = '/oauth2/token'
@@ -212,19 +191,28 @@ def issue_token():
 
         # 키움 API 성공 코드(0) 확인
         if token_data.get("return_code") == 0:
-             save_token_to_file(token_data) # 성공 시 파일에 저장 (내부에서 _access_token_info 업데이트)
-             return True # 성공
+             access_token = token_data.get('token') # 키움 응답의 'token' 키 사용 (실제 토큰 값)
+             if not access_token:
+                 print("❌ [Kiwoom] 토큰 발급 실패: 응답에 'token' 키가 없습니다.")
+                 return None, None
+             # 키움 응답의 'expires_dt' 파싱 (YYYYMMDDHHMMSS 형식), 만료 1분 전으로 버퍼 설정
+             try: expire_time = datetime.strptime(token_data.get('expires_dt') or '', "%Y%m%d%H%M%S")
+             except ValueError:
+                 print(f"⚠️ [Kiwoom] 응답의 'expires_dt' 확인 불가 ({token_data.get('expires_dt')}). 24시간 유효로 간주합니다.")
+                 expire_time = datetime.now() + timedelta(hours=24)
+             _access_token_info = {'access_token': access_token, 'token_type': token_data.get('token_type', 'Bearer')} # 저장 시 토큰 타입 유지
+             return access_token, expire_time - timedelta(seconds=60) # 성공
         else:
              # API 레벨 오류 (ex: 키 오류 등)
              print(f"❌ [Kiwoom] API 오류 응답 (return_code: {token_data.get('return_code')})")
              print(f"   메시지: {token_data.get('return_msg')}")
              _access_token_info = {} # 오류 시 토큰 정보 초기화
-             return False # 실패
+             return None, None # 실패
 
     except requests.exceptions.Timeout:
         print(f"❌ [Kiwoom] 토큰 발급 요청 시간 초과: {url}")
         _access_token_info = {} # 오류 시 토큰 정보 초기화
-        return False # 실패
+        return None, None # 실패
     except requests.exceptions.RequestException as e:
         # 네트워크 관련 오류 또는 HTTP 오류 (raise_for_status)
         print(f"❌ [Kiwoom] 토큰 발급 요청 중 오류 발생: {e}")
@@ -235,48 +223,50 @@ def issue_token():
              except json.JSONDecodeError:
                   print(f"   - 응답 내용 (텍스트): {e.response.text}")
         _access_token_info = {} # 오류 시 토큰 정보 초기화
-        return False # 실패
+        return None, None # 실패
     except json.JSONDecodeError as e:
         # 응답 본문 JSON 파싱 오류
          print(f"❌ [Kiwoom] 토큰 발급 응답 JSON 파싱 오류: {e}")
          print(f"   원본 응답 내용: {response.text if 'response' in locals() else 'N/A'}")
          _access_token_info = {} # 오류 시 토큰 정보 초기화
-         return False # 실패
+         return None, None # 실패
     except Exception as e:
          # 기타 예상치 못한 오류
          print(f"❌ [Kiwoom] 토큰 발급 중 예외 발생: {e}")
          traceback.print_exc()
          _access_token_info = {} # 오류 시 토큰 정보 초기화
-         return False # 실패
+         return None, None # 실패
+
+def _load_token():
+    """토큰 파일 → (토큰, 만료 시각 datetime). 없거나 형식 오류 시 (None, None)"""
+    if not read_token_from_file(): return None, None
+    try: return _access_token_info.get('access_token'), datetime.strptime(_access_token_info.get('expires_at') or '', "%Y-%m-%d %H:%M:%S")
+    except ValueError: return None, None
+
+def _save_token(token, expires_at):
+    token_type = _access_token_info.get('token_type') if _access_token_info.get('access_token') in (None, token) else None
+    save_token_to_file(token, expires_at, token_type)
+
+token_manager.register(TOKEN_NAME, ACCESS_TOKEN_PATH, issue=issue_token, load=_load_token, save=_save_token)
 # --- ---
 
 # --- 메인 인증 함수 ---
-def authenticate():
+def authenticate(force_new=False):
     """
     키움증권 REST API 인증을 수행합니다.
-    설정 로드 -> 토큰 로드 -> 유효성 검사 -> (필요시) 토큰 발급 순서로 진행합니다.
+    설정 로드(최초 1회) -> token_manager에서 토큰 확인 (메모리 → 토큰 파일 → 새 발급 순, 다른 프로세스와 토큰 파일 공유).
+    force_new=True 이면 기존 토큰이 유효해도 새로 발급합니다 (만료 전 미리 갱신).
     최종 인증 성공 시 True, 실패 시 False를 반환합니다.
     """
-    print("\n🔐 [Kiwoom] REST API 인증 시작...")
-
-    # 1. 설정 로드
-    if not load_config():
+    # 1. 설정 로드 (이미 로드되어 있으면 생략)
+    if not _config and not load_config():
         print("🔥 [Kiwoom] 인증 실패: 설정 파일 로드 실패.")
         return False # 설정 없으면 진행 불가
 
-    # 2. 토큰 로드 및 유효성 검사
-    if read_token_from_file() and is_token_valid():
-        print("✅ [Kiwoom] 유효한 기존 토큰 사용.")
-        return True # 유효하면 바로 성공 처리
-
-    # 3. 기존 토큰 없거나 만료 시 새로 발급 시도
-    print("🔄 [Kiwoom] 새 토큰 발급 시도...")
-    if issue_token():
-        # issue_token 내부에서 성공 시 _access_token_info 업데이트 및 파일 저장 함
-        return True # 발급 성공
-    else:
-        print("🔥 [Kiwoom] 인증 실패: 새 토큰 발급 실패.")
-        return False # 발급 실패
+    # 2. 토큰 확인 / (필요시) 발급
+    if token_manager.get_token(TOKEN_NAME, force_new=force_new): return True
+    print("🔥 [Kiwoom] 인증 실패: 유효한 토큰을 가져올 수 없습니다.")
+    return False
 # --- ---
 
 # --- 외부 사용 함수 ---
@@ -289,16 +279,13 @@ def get_config():
     return _config
 
 def get_access_token():
-    """유효한 접근 토큰 값 반환 (토큰 자체만)"""
-    # 토큰 반환 전 유효성 다시 한번 체크 (선택적이지만 안전함)
-    if not is_token_valid():
-        # print("⚠️ [Kiwoom] 현재 토큰이 유효하지 않습니다. authenticate()를 호출하여 갱신하세요.")
-        return None
-    return _access_token_info.get('access_token')
+    """유효한 접근 토큰 값 반환 (토큰 자체만, 메모리 캐시 / 만료 임박 시 자동 재발급된 토큰)"""
+    if not _config: return None # authenticate() 호출 전
+    return token_manager.get_token(TOKEN_NAME)
 
 def get_token_header():
     """API 요청 시 사용할 Authorization 헤더 문자열 반환 (타입 포함)"""
-    token = get_access_token() # 내부적으로 유효성 검사 포함 가능
+    token = get_access_token() # 유효한 토큰 (token_manager)
     if not token:
         return None # 유효한 토큰 없으면 None 반환
 
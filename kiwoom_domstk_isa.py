@@ -3,12 +3,14 @@
 
 import requests
 import json
-import time
 from datetime import datetime, date # date 추가
 import traceback # 오류 상세 출력을 위해 추가
 import pandas as pd # Pandas 추가
 # 인증 모듈 임포트 (파일명 확인: kiwoom_auth_isa.py 사용)
 import kiwoom_auth_isa as auth
+import http_session # 증권사별 keep-alive 세션 (연결 풀/타임아웃/재시도)
+import rate_limiter # 증권사별 토큰 버킷 (초당 호출 한도)
+from sheet_decode import clean_num_str, to_numeric_series # API 값 숫자 변환 공용 규칙
 
 # --- 기본 API 요청 함수 (api-id, cont-yn, next-key 지원, 자동 재인증) ---
 def _kiwoom_fetch(path: str, method: str = "GET", api_id: str = None, params: dict = None, body: dict = None, cont_yn: str = 'N', next_key: str = ''):
@@ -53,10 +55,12 @@ def _kiwoom_fetch(path: str, method: str = "GET", api_id: str = None, params: di
     if body: print(f"   - 바디(JSON): {json.dumps(body, ensure_ascii=False)}")
 
     try:
+        session = http_session.get_session('KIWOOM', allowed_methods=('GET', 'POST')) # 키움 조회 API는 POST (재시도 안전)
+        rate_limiter.acquire('KIWOOM') # 초당 호출 한도 (한도 안이면 대기 없음, 스레드 간 공유)
         if method.upper() == "GET":
-            response = requests.get(url, headers=headers, params=params)
+            response = session.get(url, headers=headers, params=params, timeout=http_session.DEFAULT_TIMEOUT)
         elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=body)
+            response = session.post(url, headers=headers, json=body, timeout=http_session.DEFAULT_TIMEOUT)
         else:
             print(f"❌ 지원하지 않는 HTTP 메소드: {method}")
             return None
@@ -102,43 +106,73 @@ def _kiwoom_fetch(path: str, method: str = "GET", api_id: str = None, params: di
         traceback.print_exc()
         return None
 
-# --- 데이터 클리닝 함수 ---
-def clean_num_str(num_str, type_func=int):
-    """문자열 형태의 숫자를 실제 숫자 타입으로 변환 (부호 및 0 처리)"""
-    if not num_str: return type_func(0)
-    try:
-        cleaned = num_str.lstrip('-').lstrip('0')
-        if not cleaned: return type_func(0)
-        value = type_func(cleaned)
-        return -value if num_str.startswith('-') else value
-    except (ValueError, TypeError):
-        return type_func(0)
+# --- 연속 조회 (cont-yn / next-key) ---
+MAX_PAGES = 50 # 연속 조회 최대 페이지 수 (응답 이상으로 무한 반복 방지)
+ACCOUNT_API_PATH = "/api/dostk/acnt" # 계좌 조회 API 경로 (kt00018 / kt00016 / ka10170)
+
+def iter_kiwoom_pages(api_id: str, body: dict, list_key: str = None, path: str = ACCOUNT_API_PATH, method: str = "POST", cont_yn: str = 'N', next_key: str = '', max_pages: int = MAX_PAGES):
+    """
+    키움 연속 조회 페이지 제너레이터. 응답 헤더 cont-yn='Y' 이면 next-key로 다음 페이지를 요청합니다 (같은 keep-alive 세션 사용).
+    매 페이지마다 dict를 yield 합니다:
+        {'page': 페이지 번호(1부터), 'success': return_code == 0, 'body': 응답 바디, 'records': body[list_key] 리스트,
+         'cont_yn': 응답 cont-yn, 'next_key': 응답 next-key, 'has_next': 다음 페이지 존재 여부}
+    오류 응답 페이지는 success=False로 yield 후 종료, 네트워크 오류 시 yield 없이 종료합니다 (마지막으로 받은 페이지의 has_next가 True로 남음).
+    마지막 성공 페이지의 cont_yn/next_key를 저장해 두면 같은 인자로 이어서 조회할 수 있습니다.
+    """
+    page_no = 0
+    while max_pages is None or page_no < max_pages:
+        response_package = _kiwoom_fetch(path=path, method=method, api_id=api_id, body=body, cont_yn=cont_yn, next_key=next_key)
+        if not response_package or 'body' not in response_package:
+            if page_no > 0: print(f"⚠️ [{api_id}] {page_no + 1}페이지 요청 실패 → 연속 조회 중단.")
+            return
+        page_no += 1
+        page_body = response_package['body']; success = page_body.get('return_code') == 0
+        records = page_body.get(list_key) if list_key else None
+        cont_yn = response_package['headers'].get('cont-yn', 'N'); next_key = response_package['headers'].get('next-key', '')
+        has_next = success and cont_yn == 'Y' and bool(next_key)
+        yield {'page': page_no, 'success': success, 'body': page_body, 'records': records if isinstance(records, list) else [],
+               'cont_yn': cont_yn, 'next_key': next_key, 'has_next': has_next}
+        if not has_next: return
+    print(f"⚠️ [{api_id}] 페이지 제한({max_pages})에 도달하여 조회를 멈춥니다. 이어서 조회: cont_yn='{cont_yn}', next_key='{next_key}'")
+
+def _fetch_all_pages(api_id: str, body: dict, list_key: str, cont_yn: str = 'N', next_key: str = '', max_pages: int = MAX_PAGES):
+    """
+    연속 조회 전체 결과를 기존 결과 형식 {'success', 'data', 'next_key', 'cont_yn', 'pages', 'complete'}으로 반환합니다.
+    data는 첫 페이지 바디이고, 다음 페이지들의 list_key 레코드를 data[list_key]에 이어 붙입니다.
+    next_key/cont_yn은 마지막 성공 페이지 값 (페이지 제한에 걸렸으면 cont_yn='Y' → 이어서 조회 가능).
+    complete: 마지막 페이지까지 받았는지 여부. success=True여도 페이지 제한 / 다음 페이지 오류·요청 실패로 중간에 멈췄으면 False
+    """
+    result = {'success': False, 'data': None, 'next_key': None, 'cont_yn': 'N', 'pages': 0, 'complete': False}
+    records = []
+    if not list_key: max_pages = 1 # 합칠 목록이 없는 요약 응답은 첫 페이지만 (cont_yn/next_key는 그대로 반환)
+    for page in iter_kiwoom_pages(api_id, body, list_key, cont_yn=cont_yn, next_key=next_key, max_pages=max_pages):
+        if page['page'] == 1: result['data'] = page['body']; result['success'] = page['success']
+        if not page['success']:
+            if page['page'] > 1: print(f"⚠️ [{api_id}] {page['page']}페이지 오류 응답 ({page['body'].get('return_msg')}) → {page['page'] - 1}페이지까지의 결과만 사용합니다.")
+            break
+        records.extend(page['records']); result['pages'] = page['page']
+        result['next_key'] = page['next_key']; result['cont_yn'] = page['cont_yn']
+        if page['has_next']: print(f"📥 [{api_id}] {page['page']}페이지: {len(page['records'])}건 (다음 페이지 있음)")
+    if list_key and result['success'] and result['pages'] > 1: result['data'][list_key] = records # 모든 페이지 수신 후 1회 반영
+    result['complete'] = result['success'] and result['cont_yn'] != 'Y' # 마지막으로 받은 페이지에 다음 페이지가 없어야 완료
+    if result['success'] and not result['complete']:
+        print(f"⚠️ [{api_id}] 연속 조회 미완료: {result['pages']}페이지까지만 수신 (이어서 조회: cont_yn='{result['cont_yn']}', next_key='{result['next_key']}')")
+    return result
+# --- ---
 
 # --- API 호출 함수들 ---
 
 # 계좌평가잔고내역요청 (kt00018)
-def get_account_evaluation_balance(query_type: str = '1', exchange_type: str = 'KRX', cont_yn: str = 'N', next_key: str = ''):
-    """계좌평가잔고내역요청 (kt00018) API 호출"""
+def get_account_evaluation_balance(query_type: str = '1', exchange_type: str = 'KRX', cont_yn: str = 'N', next_key: str = '', max_pages: int = MAX_PAGES):
+    """계좌평가잔고내역요청 (kt00018) API 호출. 보유 종목(acnt_evlt_remn_indv_tot)은 연속 조회로 모든 페이지를 합쳐 반환"""
     print(f"\n📊 계좌 평가 잔고 내역 요청 (qry_tp: {query_type}, dmst_stex_tp: {exchange_type})")
-    api_path = "/api/dostk/acnt"
-    http_method = "POST"
-    api_identifier = "kt00018"
     request_body = {'qry_tp': query_type, 'dmst_stex_tp': exchange_type}
 
-    response_package = _kiwoom_fetch(
-        path=api_path, method=http_method, api_id=api_identifier,
-        body=request_body, cont_yn=cont_yn, next_key=next_key
-    )
-
-    # 결과 포맷팅
-    result = {'success': False, 'data': None, 'next_key': None, 'cont_yn': 'N'}
-    if response_package and 'body' in response_package:
-        result['data'] = response_package['body']
-        result['next_key'] = response_package['headers'].get('next-key')
-        result['cont_yn'] = response_package['headers'].get('cont-yn', 'N')
-        if response_package['body'].get('return_code') == 0:
-            result['success'] = True
-            print("📊 잔고 조회 응답 수신 (성공)")
+    # 결과 포맷팅 (연속 페이지 포함)
+    result = _fetch_all_pages("kt00018", request_body, 'acnt_evlt_remn_indv_tot', cont_yn, next_key, max_pages)
+    if result['data'] is not None:
+        if result['success']:
+            print(f"📊 잔고 조회 응답 수신 (성공, {result['pages']}페이지)")
         else:
             print("📊 잔고 조회 응답 수신 (API 오류)")
             # 오류 시 body 내용 출력은 _kiwoom_fetch에서 하므로 여기선 생략
@@ -148,30 +182,18 @@ def get_account_evaluation_balance(query_type: str = '1', exchange_type: str = '
     return result
 
 # 일별계좌수익률상세현황요청 (kt00016)
-def get_daily_account_profit_loss(start_date: str, end_date: str, cont_yn: str = 'N', next_key: str = ''):
-    """일별계좌수익률상세현황요청 (kt00016) API 호출"""
+def get_daily_account_profit_loss(start_date: str, end_date: str, cont_yn: str = 'N', next_key: str = '', max_pages: int = MAX_PAGES):
+    """일별계좌수익률상세현황요청 (kt00016) API 호출 (요약 응답: 연속 페이지가 오면 목록 필드 없이 첫 페이지 요약만 사용)"""
     print(f"\n📊 일별 계좌 수익률 상세 현황 요청 (기간: {start_date} ~ {end_date})")
-    api_path = "/api/dostk/acnt"
-    http_method = "POST"
-    api_identifier = "kt00016"
     request_body = {
         'fr_dt': start_date.replace("-", ""), #<y_bin_46>MMDD
         'to_dt': end_date.replace("-", ""),   #<y_bin_46>MMDD
     }
 
-    response_package = _kiwoom_fetch(
-        path=api_path, method=http_method, api_id=api_identifier,
-        body=request_body, cont_yn=cont_yn, next_key=next_key
-    )
-
     # 결과 포맷팅
-    result = {'success': False, 'data': None, 'next_key': None, 'cont_yn': 'N'}
-    if response_package and 'body' in response_package:
-        result['data'] = response_package['body']
-        result['next_key'] = response_package['headers'].get('next-key')
-        result['cont_yn'] = response_package['headers'].get('cont-yn', 'N')
-        if response_package['body'].get('return_code') == 0:
-            result['success'] = True
+    result = _fetch_all_pages("kt00016", request_body, None, cont_yn, next_key, max_pages)
+    if result['data'] is not None:
+        if result['success']:
             print("📊 일별 수익률 조회 응답 수신 (성공)")
         else:
             print("📊 일별 수익률 조회 응답 수신 (API 오류)")
@@ -181,15 +203,10 @@ def get_daily_account_profit_loss(start_date: str, end_date: str, cont_yn: str =
     return result
 
 # *** 추가된 함수: 당일매매일지요청 (ka10170) ***
-def get_daily_trading_log(base_date: str, ottks_type: str = '1', cash_credit_type: str = '0', cont_yn: str = 'N', next_key: str = ''):
-    """당일매매일지요청 (ka10170) API 호출"""
+def get_daily_trading_log(base_date: str, ottks_type: str = '1', cash_credit_type: str = '0', cont_yn: str = 'N', next_key: str = '', max_pages: int = MAX_PAGES):
+    """당일매매일지요청 (ka10170) API 호출. 매매 내역(tdy_trde_diary)은 연속 조회로 모든 페이지를 합쳐 반환"""
     print(f"\n📊 {base_date} 매매일지 요청 (ottks_tp: {ottks_type}, ch_crd_tp: {cash_credit_type})")
 
-    # --- ka10170 예제 기반 정보 ---
-    api_path = "/api/dostk/acnt" # 이전과 동일 경로 사용
-    http_method = "POST"
-    api_identifier = "ka10170"   # api-id 변경
-
     # 요청 Body (JSON) 구성
     request_body = {
         'base_dt': base_date.replace("-", ""), #<y_bin_46>MMDD 형식
@@ -198,25 +215,11 @@ def get_daily_trading_log(base_date: str, ottks_type: str = '1', cash_credit_typ
     }
     # -----------------------------
 
-    # API 호출
-    response_package = _kiwoom_fetch(
-        path=api_path,
-        method=http_method,
-        api_id=api_identifier, # api-id 전달
-        body=request_body,
-        cont_yn=cont_yn,       # cont-yn 헤더 전달
-        next_key=next_key      # next-key 헤더 전달
-    )
-
-    # 결과 포맷팅
-    result = {'success': False, 'data': None, 'next_key': None, 'cont_yn': 'N'}
-    if response_package and 'body' in response_package:
-        result['data'] = response_package['body']
-        result['next_key'] = response_package['headers'].get('next-key')
-        result['cont_yn'] = response_package['headers'].get('cont-yn', 'N')
-        if response_package['body'].get('return_code') == 0:
-            result['success'] = True
-            print(f"📊 {base_date} 매매일지 조회 응답 수신 (성공)")
+    # API 호출 + 결과 포맷팅 (연속 페이지 포함, cont-yn / next-key 헤더로 이어서 요청)
+    result = _fetch_all_pages("ka10170", request_body, 'tdy_trde_diary', cont_yn, next_key, max_pages)
+    if result['data'] is not None:
+        if result['success']:
+            print(f"📊 {base_date} 매매일지 조회 응답 수신 (성공, {result['pages']}페이지)")
         else:
             print(f"📊 {base_date} 매매일지 조회 응답 수신 (API 오류)")
     else:
@@ -231,17 +234,6 @@ if __name__ == '__main__':
     import pandas as pd
     from datetime import date
 
-    # --- 데이터 클리닝 함수 (이전과 동일) ---
-    def clean_num_str(num_str, type_func=int):
-        if not num_str: return type_func(0)
-        try:
-            cleaned = num_str.lstrip('-').lstrip('0')
-            if not cleaned: return type_func(0)
-            value = type_func(cleaned)
-            return -value if num_str.startswith('-') else value
-        except (ValueError, TypeError):
-            return type_func(0)
-
     # 1. 인증 수행
     if not auth.authenticate():
         print("🔥 인증 실패! API 테스트를 진행할 수 없습니다.")
@@ -282,7 +274,7 @@ if __name__ == '__main__':
                     df_display.rename(columns={'stk_nm': '종목명', 'stk_cd': '종목코드', 'rmnd_qty': '보유수량','pur_pric': '매입단가', 'cur_prc': '현재가', 'evlt_amt': '평가금액','evltv_prft': '평가손익', 'prft_rt': '수익률(%)', 'poss_rt': '보유비중(%)'}, inplace=True)
                     numeric_cols_int = ['보유수량', '매입단가', '현재가', '평가금액', '평가손익']
                     numeric_cols_float = ['수익률(%)', '보유비중(%)']
-                    for col in numeric_cols_int: df_display[col] = df_display[col].apply(lambda x: clean_num_str(x, int))
+                    for col in numeric_cols_int: df_display[col] = to_numeric_series(df_display[col], int)
                     for col in numeric_cols_float:
                          try: df_display[col] = pd.to_numeric(df_display[col], errors='coerce').fillna(0.0)
                          except Exception: df_display[col] = 0.0
@@ -294,8 +286,8 @@ if __name__ == '__main__':
             else: print("  ℹ️ 보유 중인 종목이 없습니다.")
             next_key_bal = balance_result.get('next_key')
             cont_yn_bal = balance_result.get('cont_yn')
-            if cont_yn_bal == 'Y' and next_key_bal: print(f"\n🔄 잔고 연속 조회가 필요합니다. (next-key: {next_key_bal})")
-            else: print("\nℹ️ 잔고 연속 조회 필요 없음.")
+            if not balance_result.get('complete'): print(f"\n🔄 잔고 연속 조회가 중간에 멈췄습니다 ({balance_result.get('pages')}페이지까지). 이어서 조회: get_account_evaluation_balance(cont_yn='{cont_yn_bal}', next_key='{next_key_bal}')")
+            else: print(f"\nℹ️ 잔고 전체 조회 완료 ({balance_result.get('pages')}페이지, 보유 종목 {len(stock_list)}건).")
         else:
             print("\n❌ 잔고 조회 테스트 실패.")
             if balance_result and 'data' in balance_result: print("--- 실패 응답 데이터 (잔고) ---"); print(json.dumps(balance_result.get('data'), indent=4, ensure_ascii=False))
@@ -407,7 +399,7 @@ if __name__ == '__main__':
 
                         for col in numeric_trade_cols_int:
                             if col in df_display_trades.columns:
-                                df_display_trades[col] = df_display_trades[col].apply(lambda x: clean_num_str(x, int))
+                                df_display_trades[col] = to_numeric_series(df_display_trades[col], int)
                         for col in numeric_trade_cols_float:
                             if col in df_display_trades.columns:
                                  try:
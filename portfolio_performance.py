@@ -1,10 +1,13 @@
 # portfolio_performance.py (최종 버전: 배당반영 TWR, 단순손익, 그래프 팝업, 결과 파일 저장, 단순 알림)
 # (Version 5.1: Total TWR 그래프 3일 이동평균선 제거, 평가액>0 마지막 날짜 기준 유지)
+# (Version 5.2: TWR 행렬 일괄 계산, twr_state.json 체크포인트 기반 증분 계산 / --full-rebuild 옵션)
 
 import pandas as pd
 import numpy as np
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_client
+import sheet_columns # 여러 탭의 필요한 열만 1회 요청으로 읽기
+from sheet_decode import to_numeric_series, to_date_series # 시트 값 숫자·날짜 변환 공용 규칙 (벡터화)
 import os
 from datetime import datetime, timedelta
 import traceback
@@ -12,9 +15,12 @@ import warnings
 import sys
 import time
 import json
+import hashlib
 
 # --- 시각화 라이브러리 임포트 및 폰트 설정 ---
 try:
+    import matplotlib
+    matplotlib.use('Agg') # 그래프는 화면 표시 없이 생성만 함 → GUI 백엔드(TkAgg) 대신 Agg 사용 (파이프라인/데몬의 작업 스레드에서도 안전)
     import matplotlib.pyplot as plt
     import matplotlib.dates as mdates
     if os.name == 'nt': plt.rcParams['font.family'] = 'Malgun Gothic'
@@ -38,6 +44,14 @@ except ModuleNotFoundError:
     telegram_utils = MockTelegramUtils()
 # --- ---
 
+# --- 로컬 시트 미러 임포트 (없으면 시트 직접 읽기) ---
+try:
+    import sheet_mirror
+except ImportError:
+    print("⚠️ sheet_mirror.py 모듈을 찾을 수 없습니다. 구글 시트를 직접 읽습니다.")
+    sheet_mirror = None
+# --- ---
+
 # --- 상수 정의 ---
 GOOGLE_SHEET_NAME = 'KYI_자산배분'
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -54,82 +68,79 @@ DIV_DATE_IDX = 0; DIV_AMOUNT_IDX = 5; DIV_ACCOUNT_IDX = 6
 SCRIPT_NAME = os.path.basename(__file__)
 TWR_CSV_PATH = os.path.join(CURRENT_DIR, 'twr_results.csv')
 GAIN_LOSS_JSON_PATH = os.path.join(CURRENT_DIR, 'gain_loss.json')
+TWR_STATE_JSON_PATH = os.path.join(CURRENT_DIR, 'twr_state.json') # 증분 TWR 계산용 체크포인트
+USE_SHEET_MIRROR = True # True: 로컬 미러(sheet_mirror.py) 동기화 후 읽기, False: 시트 직접 읽기
 # --- ---
 
 # --- 유틸리티 함수 ---
 def connect_google_sheets():
-    """구글 시트에 연결하고 인증된 클라이언트 객체를 반환합니다."""
+    """구글 시트에 연결하고 인증된 클라이언트 객체를 반환합니다. (공용 클라이언트 sheets_client 사용)"""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        if not os.path.exists(JSON_KEYFILE_PATH):
-             raise FileNotFoundError(f"서비스 계정 키 파일을 찾을 수 없습니다: {JSON_KEYFILE_PATH}")
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials)
-        print("✅ Google Sheets API 인증 성공.")
-        return gc
+        return sheets_client.get_client()
     except FileNotFoundError as e: print(f"❌ 오류: {e}"); return None
     except Exception as e: print(f"❌ 구글 시트 연결 오류: {e}"); traceback.print_exc(); return None
 
+def read_sheet_values(spreadsheet, sheet_name, typed=False):
+    """시트 전체 값 읽기 (미러 사용 가능 시 미러에서, 아니면 get_all_values). typed=True: 원시 값(숫자/날짜 일련번호)"""
+    if USE_SHEET_MIRROR and sheet_mirror is not None:
+        values = sheet_mirror.get_values(spreadsheet, sheet_name, typed=typed)
+        if values is not None: return values
+    worksheet = sheets_client.get_worksheet(sheet_name, spreadsheet.title)
+    return sheets_client.get_typed_values(worksheet) if typed else worksheet.get_all_values()
+
 def clean_numeric_column(series, default=0.0):
-    """쉼표 제거 등 숫자 컬럼을 정리하고 float 타입으로 변환합니다."""
-    if pd.api.types.is_numeric_dtype(series):
-        return series.astype(float).fillna(default)
-    series_str = series.astype(str).str.replace(',', '', regex=False).str.strip()
-    series_str.replace('', '0', inplace=True)
-    series_num = pd.to_numeric(series_str, errors='coerce')
-    return series_num.fillna(default).astype(float)
+    """숫자 컬럼을 float 타입으로 변환합니다. 원시 값 숫자는 그대로, 문자열은 쉼표 제거 등 정리 후 변환 (sheet_decode 공용 규칙)"""
+    return to_numeric_series(series, float, default)
 # --- ---
 
 # --- 데이터 로딩 함수 (수익률 시트) ---
-def read_and_aggregate_data(gc, sheet_names, date_col_idx, deposit_col_idx, withdrawal_col_idx, value_col_idx, start_date=None, end_date=None):
+def parse_return_sheet_values(sheet_name, frame, date_col, deposit_col, withdrawal_col, value_col):
+    """수익률 시트의 열 읽기 결과(열 문자 컬럼, 원시 값)를 날짜 인덱스의 Value/Deposit/Withdrawal DataFrame으로 변환합니다."""
+    empty_df = pd.DataFrame(columns=['Value', 'Deposit', 'Withdrawal'], dtype=float)
+    if frame is None or frame.empty: print(f"    - 정보: '{sheet_name}' 데이터 없음."); return empty_df
+
+    df = pd.DataFrame({'Date': to_date_series(frame[date_col])}); df = df.dropna(subset=['Date'])
+    if df.empty: print(f"    - 정보: '{sheet_name}' 유효 날짜 데이터 없음."); return empty_df
+
+    df['Deposit'] = clean_numeric_column(frame.loc[df.index, deposit_col], default=0.0)
+    df['Withdrawal'] = clean_numeric_column(frame.loc[df.index, withdrawal_col], default=0.0)
+    df['Value'] = clean_numeric_column(frame.loc[df.index, value_col], default=0.0)
+    df = df.drop_duplicates(subset=['Date'], keep='last')
+    df = df.set_index('Date')[['Value', 'Deposit', 'Withdrawal']]
+    return df.sort_index()
+
+def load_account_data(spreadsheet, account_sheets, date_col_idx, deposit_col_idx, withdrawal_col_idx, value_col_idx):
     """
-    지정된 수익률 시트들에서 데이터를 읽어 집계하되,
-    최종 결과는 모든 시트의 '평가액 > 0' 데이터가 존재하는 마지막 날짜까지만 포함하여 반환합니다.
-    또한 계산된 최종 공통 마감일도 반환합니다.
+    모든 계좌의 수익률 시트에서 필요한 열(날짜/입금/출금/평가액)만 values_batch_get 1회로 읽어 계좌별 DataFrame 딕셔너리로 반환합니다.
+    전체(Total) 및 계좌별 TWR / 단순 손익 계산은 모두 이 메모리 데이터를 재사용합니다.
+    읽기에 실패한 시트는 빈 DataFrame으로 채워집니다.
     """
-    if not gc: print("❌ 데이터 로딩 오류: 구글 시트 클라이언트(gc)가 없습니다."); return None, None
-    try: spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-    except Exception as e: print(f"❌ 스프레드시트 '{GOOGLE_SHEET_NAME}' 열기 오류: {e}"); return None, None
-
-    sheet_dfs = {}
-    all_data_list = []
-    print(f"\n--- 데이터 로딩 시작 (시트: {sheet_names}) ---")
-    for sheet_name in sheet_names:
+    account_dfs = {}
+    cols = [sheet_columns.column_letter(idx) for idx in (date_col_idx, deposit_col_idx, withdrawal_col_idx, value_col_idx)]
+    print(f"\n--- 데이터 로딩 시작 (시트: {list(account_sheets.values())}, 열: {cols}) ---")
+    try: frames = sheet_columns.read_columns(spreadsheet, [(sheet_name, cols) for sheet_name in account_sheets.values()], typed=True, use_mirror=USE_SHEET_MIRROR) # 원시 값: 금액 숫자, 날짜 일련번호
+    except gspread.exceptions.APIError as e_api: print(f"    - ❌ API 오류 (수익률 시트 읽기 중): {e_api}"); frames = {}
+    except Exception as e: print(f"    - ❌ 오류: 수익률 시트 읽기 중: {e}"); traceback.print_exc(); frames = {}
+    for acc_name, sheet_name in account_sheets.items():
         try:
-            print(f"  ▶️ 시트 '{sheet_name}' 읽는 중...")
-            worksheet = spreadsheet.worksheet(sheet_name); data = worksheet.get_all_values()
-            if len(data) < 2: print(f"    - 정보: '{sheet_name}' 데이터 없음."); sheet_dfs[sheet_name] = pd.DataFrame(); continue
-            header = data[0]; data_rows = data[1:]
-            required_indices = [date_col_idx, deposit_col_idx, withdrawal_col_idx, value_col_idx]; max_idx = max(required_indices)
-            if max_idx >= len(header): print(f"    - ❌ 오류: '{sheet_name}' 컬럼 수 부족."); sheet_dfs[sheet_name] = pd.DataFrame(); continue
-
-            extracted_data = []
-            for row in data_rows:
-                if len(row) > max_idx:
-                     extracted_data.append([row[date_col_idx], row[deposit_col_idx], row[withdrawal_col_idx], row[value_col_idx]])
-            if not extracted_data: print(f"    - 정보: '{sheet_name}' 유효 데이터 행 없음."); sheet_dfs[sheet_name] = pd.DataFrame(); continue
-
-            df = pd.DataFrame(extracted_data, columns=['Date_Str', 'Deposit_Str', 'Withdrawal_Str', 'Value_Str'])
-            df['Date'] = pd.to_datetime(df['Date_Str'], errors='coerce'); df = df.dropna(subset=['Date'])
-            if df.empty: print(f"    - 정보: '{sheet_name}' 유효 날짜 데이터 없음."); sheet_dfs[sheet_name] = pd.DataFrame(); continue
-
-            df['Deposit'] = clean_numeric_column(df['Deposit_Str'], default=0.0)
-            df['Withdrawal'] = clean_numeric_column(df['Withdrawal_Str'], default=0.0)
-            df['Value'] = clean_numeric_column(df['Value_Str'], default=0.0)
-            df = df.drop_duplicates(subset=['Date'], keep='last')
-            df = df.set_index('Date')[['Value', 'Deposit', 'Withdrawal']]
-            df = df.sort_index()
-
-            sheet_dfs[sheet_name] = df
-            all_data_list.append(df)
-            print(f"    - '{sheet_name}' 처리 완료 ({len(df)} 행, 마지막 날짜: {df.index.max().strftime('%Y-%m-%d') if not df.empty else 'N/A'}).")
-        except gspread.exceptions.WorksheetNotFound: print(f"    - ⚠️ 경고: 시트 '{sheet_name}' 없음."); sheet_dfs[sheet_name] = pd.DataFrame()
-        except gspread.exceptions.APIError as e_api: print(f"    - ❌ API 오류 ('{sheet_name}' 읽기 중): {e_api}"); sheet_dfs[sheet_name] = pd.DataFrame()
-        except Exception as e: print(f"    - ❌ 오류: '{sheet_name}' 처리 중: {e}"); traceback.print_exc(); sheet_dfs[sheet_name] = pd.DataFrame()
-
+            frame = frames.get(sheet_name)
+            if frame is None or frame.attrs.get('missing'): print(f"    - ⚠️ 경고: 시트 '{sheet_name}' 읽기 실패 또는 없음."); account_dfs[acc_name] = pd.DataFrame(columns=['Value', 'Deposit', 'Withdrawal'], dtype=float); continue
+            df = parse_return_sheet_values(sheet_name, frame, *cols)
+            if not df.empty: print(f"    - '{sheet_name}' 처리 완료 ({len(df)} 행, 마지막 날짜: {df.index.max().strftime('%Y-%m-%d')}).")
+            account_dfs[acc_name] = df
+        except Exception as e: print(f"    - ❌ 오류: '{sheet_name}' 처리 중: {e}"); traceback.print_exc(); account_dfs[acc_name] = pd.DataFrame(columns=['Value', 'Deposit', 'Withdrawal'], dtype=float)
+    return account_dfs
+
+def aggregate_account_data(account_dfs, start_date=None, end_date=None):
+    """
+    메모리에 로드된 계좌별 DataFrame들을 날짜 기준으로 합산하되,
+    최종 결과는 모든 계좌의 '평가액 > 0' 데이터가 존재하는 마지막 날짜까지만 포함하여 반환합니다.
+    또한 계산된 최종 공통 마감일도 반환합니다. (계좌 1개만 넘기면 해당 계좌 단독 집계)
+    """
+    all_data_list = [df for df in account_dfs.values() if not df.empty]
     if not all_data_list: print("❌ 최종 오류: 유효 데이터 시트 없음."); return None, None
 
-    print("\n--- 데이터 집계 (concat + groupby) ---")
+    print(f"\n--- 데이터 집계 (concat + groupby, 대상: {list(account_dfs.keys())}) ---")
     combined_df = pd.concat(all_data_list)
     aggregated_df = combined_df.groupby(combined_df.index)[['Value', 'Deposit', 'Withdrawal']].sum(numeric_only=True)
     aggregated_df['NetCashFlow'] = aggregated_df['Deposit'] - aggregated_df['Withdrawal']
@@ -137,75 +148,169 @@ def read_and_aggregate_data(gc, sheet_names, date_col_idx, deposit_col_idx, with
     print(f"  - 집계 완료 (총 {len(aggregated_df)}일 데이터, 날짜 범위: {aggregated_df.index.min().strftime('%Y-%m-%d')} ~ {aggregated_df.index.max().strftime('%Y-%m-%d')})")
 
     last_common_date = None
-    expected_sheet_count = len(ACCOUNT_SHEETS) if sheet_names == list(ACCOUNT_SHEETS.values()) else len(sheet_names)
-
-    if len(sheet_dfs) == expected_sheet_count:
-        max_value_dates = []
-        for name, df in sheet_dfs.items():
-            df_filtered = df[df['Value'] > 1e-9]
-            if not df_filtered.empty:
-                last_valid_date = df_filtered.index.max()
-                max_value_dates.append(last_valid_date)
-                print(f"    - '{name}' 평가액>0 마지막 날짜: {last_valid_date.strftime('%Y-%m-%d')}")
-            else:
-                print(f"    - '{name}' 평가액>0 데이터 없음 (마감일 계산 제외)")
-
-        if len(max_value_dates) == expected_sheet_count:
-            last_common_date = min(max_value_dates)
-            print(f"  - 최종 공통 마감일 결정 (평가액>0 기준): {last_common_date.strftime('%Y-%m-%d')}")
-            original_agg_rows = len(aggregated_df)
-            aggregated_df = aggregated_df[aggregated_df.index <= last_common_date]
-            filtered_agg_rows = len(aggregated_df)
-            if original_agg_rows != filtered_agg_rows: print(f"  - 최종 공통 마감일 기준으로 데이터 필터링 완료 ({filtered_agg_rows}/{original_agg_rows} 행).")
-            elif filtered_agg_rows > 0 : print(f"  - 최종 공통 마감일({last_common_date.strftime('%Y-%m-%d')})이 이미 마지막 날짜임. 필터링 불필요.")
-        elif not max_value_dates: print("⚠️ 경고: 모든 시트에 평가액>0 데이터가 없어 마감일 제한 불가.")
-        else: print(f"⚠️ 경고: 일부 시트({len(max_value_dates)}/{expected_sheet_count})에만 평가액>0 데이터가 있어 마감일 제한 불가.")
-    else: print(f"⚠️ 경고: 모든 대상 시트({expected_sheet_count}개)를 읽지 못해({len(sheet_dfs)}개) 마감일 제한 적용 안 함.")
+    expected_sheet_count = len(account_dfs)
+    max_value_dates = []
+    for name, df in account_dfs.items():
+        df_filtered = df[df['Value'] > 1e-9]
+        if not df_filtered.empty:
+            last_valid_date = df_filtered.index.max()
+            max_value_dates.append(last_valid_date)
+            print(f"    - '{name}' 평가액>0 마지막 날짜: {last_valid_date.strftime('%Y-%m-%d')}")
+        else:
+            print(f"    - '{name}' 평가액>0 데이터 없음 (마감일 계산 제외)")
+
+    if len(max_value_dates) == expected_sheet_count:
+        last_common_date = min(max_value_dates)
+        print(f"  - 최종 공통 마감일 결정 (평가액>0 기준): {last_common_date.strftime('%Y-%m-%d')}")
+        original_agg_rows = len(aggregated_df)
+        aggregated_df = aggregated_df[aggregated_df.index <= last_common_date]
+        filtered_agg_rows = len(aggregated_df)
+        if original_agg_rows != filtered_agg_rows: print(f"  - 최종 공통 마감일 기준으로 데이터 필터링 완료 ({filtered_agg_rows}/{original_agg_rows} 행).")
+        elif filtered_agg_rows > 0 : print(f"  - 최종 공통 마감일({last_common_date.strftime('%Y-%m-%d')})이 이미 마지막 날짜임. 필터링 불필요.")
+    elif not max_value_dates: print("⚠️ 경고: 모든 시트에 평가액>0 데이터가 없어 마감일 제한 불가.")
+    else: print(f"⚠️ 경고: 일부 시트({len(max_value_dates)}/{expected_sheet_count})에만 평가액>0 데이터가 있어 마감일 제한 불가.")
 
     if start_date: aggregated_df = aggregated_df[aggregated_df.index >= pd.to_datetime(start_date)]
     if end_date: aggregated_df = aggregated_df[aggregated_df.index <= pd.to_datetime(end_date)]
 
-    print(f"--- 데이터 로딩 및 집계 완료 (총 {len(aggregated_df)}일 데이터 사용) ---")
+    print(f"--- 데이터 집계 완료 (총 {len(aggregated_df)}일 데이터 사용) ---")
     if aggregated_df.empty: print("⚠️ 경고: 최종 데이터 없음."); return None, None
 
     return aggregated_df[['Value', 'NetCashFlow']], last_common_date
 # --- ---
 
 # --- TWR 계산 함수 ---
+def calculate_twr_matrix(twr_inputs, initial_state=None):
+    """
+    계좌별 Value/NetCashFlow DataFrame(배당 조정 완료)을 날짜 × 계좌 NumPy 행렬로 쌓아
+    일별 수익 계수, 시작점 0 처리, 누적곱을 모든 계좌에 대해 한 번에 계산합니다.
+    각 계좌는 자신의 데이터가 있는 날짜만 사용하며 첫 날은 기준일로 제외됩니다.
+    initial_state({계좌: {'last_value', 'cumulative_factor'}})가 주어지면 해당 계좌는
+    체크포인트 이후 구간으로 보고 직전 평가액/누적 계수에서 이어서 계산합니다 (첫 날 제외 없음).
+    반환: 날짜 × 계좌 TWR(%) DataFrame (데이터 없는 칸은 NaN)
+    """
+    names = [name for name, df in twr_inputs.items() if isinstance(df, pd.DataFrame) and not df.empty]
+    if not names: print("❌ TWR 계산 오류: 유효 입력 아님."); return None
+    print(f"\n--- TWR(시간가중수익률) 행렬 계산 시작 (대상: {names}) ---")
+    value_df = pd.concat({name: pd.to_numeric(twr_inputs[name]['Value'], errors='coerce').fillna(0.0) for name in names}, axis=1).sort_index()
+    flow_df = pd.concat({name: pd.to_numeric(twr_inputs[name]['NetCashFlow'], errors='coerce').fillna(0.0) for name in names}, axis=1).reindex(value_df.index)
+    values = value_df.to_numpy(dtype='float64'); flows = np.nan_to_num(flow_df.to_numpy(dtype='float64'))
+
+    # 체크포인트가 있는 계좌는 맨 앞에 '직전 평가액' 가상 행을 붙여 이어서 계산 (계산 후 제거)
+    initial_state = initial_state or {}
+    seed_values = np.array([[initial_state[name]['last_value'] if name in initial_state else np.nan for name in names]], dtype='float64')
+    seed_factors = np.array([[initial_state[name]['cumulative_factor'] if name in initial_state else 1.0 for name in names]], dtype='float64')
+    values = np.vstack([seed_values, values]); flows = np.vstack([np.zeros_like(seed_values), flows])
+    valid = ~np.isnan(values)
+
+    # 계좌별 직전 유효 행 (해당 계좌에 데이터가 없는 날짜는 건너뜀)
+    row_numbers = np.where(valid, np.arange(values.shape[0])[:, None], -1)
+    last_valid_row = np.maximum.accumulate(row_numbers, axis=0)
+    prev_row = np.vstack([np.full((1, values.shape[1]), -1), last_valid_row[:-1]])
+    has_prev = valid & (prev_row >= 0)
+    start_values = np.take_along_axis(np.nan_to_num(values), np.clip(prev_row, 0, None), axis=0)
+
+    denominator = start_values + flows
+    mask_start_zero_flow_positive = has_prev & (np.abs(start_values) < 1e-9) & (flows > 1e-9)
+    mask_start_positive_denom_valid = has_prev & (start_values > 1e-9) & (np.abs(denominator) > 1e-9)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily_factor = np.where(mask_start_zero_flow_positive, values / flows, 1.0)
+        daily_factor = np.where(mask_start_positive_denom_valid, values / denominator, daily_factor)
+    daily_factor = np.where(np.isfinite(daily_factor) & has_prev, daily_factor, 1.0)
+    daily_factor = np.clip(daily_factor, 0.1, 10.0)
+
+    cumulative_factor = np.cumprod(daily_factor, axis=0) * seed_factors
+    twr = np.where(has_prev, (cumulative_factor - 1) * 100, np.nan)[1:]
+    print("--- TWR 행렬 계산 완료 ---")
+    return pd.DataFrame(twr, index=value_df.index, columns=names)
+
 def calculate_twr(aggregated_data_adj):
-    """TWR(%) 계산 (입력은 배당 조정된 데이터, 시작점 0 처리 포함)"""
+    """TWR(%) 계산 (입력은 배당 조정된 데이터, 시작점 0 처리 포함) - 단일 계좌용, 내부적으로 행렬 엔진 사용"""
     required_cols = ['Value', 'NetCashFlow']
     if aggregated_data_adj is None or not isinstance(aggregated_data_adj, pd.DataFrame) or aggregated_data_adj.empty \
        or not all(col in aggregated_data_adj.columns for col in required_cols): print(f"❌ TWR 계산 오류: 유효 입력 아님."); return None
     if len(aggregated_data_adj) < 2: print("❌ TWR 계산 오류: 데이터 부족 (최소 2일)."); return None
-    print("\n--- TWR(시간가중수익률) 계산 시작 ---")
-    df = aggregated_data_adj.copy().sort_index(); df['Value'] = pd.to_numeric(df['Value'], errors='coerce').fillna(0.0).astype('float64'); df['NetCashFlow'] = pd.to_numeric(df['NetCashFlow'], errors='coerce').fillna(0.0).astype('float64')
-    df['StartValue'] = df['Value'].shift(1); df = df.iloc[1:].copy()
-    if df.empty: print("❌ TWR 계산 오류: 첫 날 제외 후 데이터 없음."); return None
-    denominator = df['StartValue'] + df['NetCashFlow']; df['DailyFactor'] = 1.0
-    mask_start_zero_flow_positive = (df['StartValue'].abs() < 1e-9) & (df['NetCashFlow'] > 1e-9)
-    mask_start_positive_denom_valid = (df['StartValue'] > 1e-9) & (denominator.abs() > 1e-9)
-    df.loc[mask_start_zero_flow_positive, 'DailyFactor'] = df.loc[mask_start_zero_flow_positive, 'Value'] / df.loc[mask_start_zero_flow_positive, 'NetCashFlow']
-    df.loc[mask_start_positive_denom_valid, 'DailyFactor'] = df.loc[mask_start_positive_denom_valid, 'Value'] / denominator.loc[mask_start_positive_denom_valid]
-    df['DailyFactor'] = df['DailyFactor'].replace([np.inf, -np.inf], np.nan).fillna(1.0); df['DailyFactor'] = df['DailyFactor'].clip(lower=0.1, upper=10.0)
-    df['CumulativeFactor'] = df['DailyFactor'].cumprod()
-    df['TWR'] = (df['CumulativeFactor'] - 1) * 100; print("--- TWR 계산 완료 ---"); return df[['TWR']]
+    twr_matrix = calculate_twr_matrix({'TWR': aggregated_data_adj[required_cols]})
+    if twr_matrix is None: return None
+    return twr_matrix[['TWR']].dropna()
+
+# --- TWR 체크포인트 (증분 계산) 함수 ---
+def compute_twr_input_hash(df):
+    """TWR 입력(Value/NetCashFlow) DataFrame 내용 해시 (과거 행 수정 감지용)"""
+    csv_text = df[['Value', 'NetCashFlow']].round(4).to_csv(date_format='%Y-%m-%d')
+    return hashlib.sha256(csv_text.encode('utf-8')).hexdigest()
+
+def load_twr_state():
+    """저장된 TWR 체크포인트(JSON)를 읽습니다. 없거나 손상된 경우 None."""
+    if not os.path.exists(TWR_STATE_JSON_PATH): return None
+    try:
+        with open(TWR_STATE_JSON_PATH, 'r', encoding='utf-8') as f: state = json.load(f)
+        if not isinstance(state, dict) or 'accounts' not in state or 'csv_last_date' not in state: print("⚠️ TWR 체크포인트 형식 오류. 전체 재계산합니다."); return None
+        return state
+    except Exception as e: print(f"⚠️ TWR 체크포인트 로드 실패 ({e}). 전체 재계산합니다."); return None
+
+def save_twr_state(state):
+    """TWR 체크포인트를 JSON 파일로 저장합니다."""
+    try:
+        with open(TWR_STATE_JSON_PATH, 'w', encoding='utf-8') as f: json.dump(state, f, ensure_ascii=False, indent=4)
+        print(f"✅ TWR 체크포인트 저장 완료: {TWR_STATE_JSON_PATH}"); return True
+    except Exception as e: print(f"❌ TWR 체크포인트 저장 실패: {e}"); return False
+
+def can_resume_from_state(state, twr_inputs, csv_last_date):
+    """체크포인트 기준 증분 계산 가능 여부 확인 (계좌 구성 동일 + 마감일 역행 없음 + 체크포인트 이전 구간 해시 일치)"""
+    if state is None or csv_last_date is None: return False
+    if not os.path.exists(TWR_CSV_PATH): print("  - TWR 결과 파일 없음 → 전체 재계산"); return False
+    if set(state['accounts'].keys()) != set(twr_inputs.keys()): print("  - 계좌 구성 변경 감지 → 전체 재계산"); return False
+    if csv_last_date < pd.to_datetime(state['csv_last_date']): print("  - 공통 마감일이 체크포인트보다 이전으로 변경됨 → 전체 재계산"); return False
+    for name, df in twr_inputs.items():
+        acc_state = state['accounts'][name]
+        checked_df = df[df.index <= pd.to_datetime(acc_state['last_date'])]
+        if compute_twr_input_hash(checked_df) != acc_state['content_hash']:
+            print(f"  - '{name}' 과거 데이터 변경 감지 (해시 불일치) → 전체 재계산"); return False
+    return True
+
+def build_twr_state(twr_inputs, twr_matrix, csv_last_date, previous_state=None):
+    """
+    csv_last_date(결과 파일 마지막 날짜)까지의 계좌별 마지막 날짜/평가액/누적 계수와 내용 해시로 체크포인트 생성.
+    twr_matrix는 전체 또는 이번 증분 구간의 TWR 행렬입니다.
+    """
+    state = {'csv_last_date': csv_last_date.strftime('%Y-%m-%d'), 'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'accounts': {}}
+    previous_accounts = previous_state['accounts'] if previous_state else {}
+    for name, df in twr_inputs.items():
+        checked_df = df[df.index <= csv_last_date]
+        if checked_df.empty: print(f"  - '{name}' 체크포인트 대상 데이터 없음 (다음 실행 시 전체 재계산)"); continue
+        last_date = checked_df.index.max(); last_date_str = last_date.strftime('%Y-%m-%d')
+        twr_value = twr_matrix.at[last_date, name] if (twr_matrix is not None and name in twr_matrix.columns and last_date in twr_matrix.index) else np.nan
+        if pd.notna(twr_value): cumulative_factor = 1 + twr_value / 100
+        elif previous_accounts.get(name, {}).get('last_date') == last_date_str: cumulative_factor = previous_accounts[name]['cumulative_factor']
+        else: cumulative_factor = 1.0 # 첫 날(기준일)만 있는 경우
+        state['accounts'][name] = {
+            'last_date': last_date_str, 'last_value': float(checked_df['Value'].iloc[-1]),
+            'cumulative_factor': float(cumulative_factor), 'content_hash': compute_twr_input_hash(checked_df)
+        }
+    return state
+
+def twr_matrix_to_csv_rows(twr_matrix, last_date=None):
+    """날짜 × 계좌 TWR 행렬을 결과 파일 형식(Date, TWR, Account; 계좌 순서대로)으로 변환합니다."""
+    output_matrix = twr_matrix if last_date is None else twr_matrix[twr_matrix.index <= last_date]
+    rows_df = output_matrix.rename_axis('Date').reset_index().melt(id_vars='Date', var_name='Account', value_name='TWR').dropna(subset=['TWR'])
+    return rows_df[['Date', 'TWR', 'Account']]
+
+def load_twr_matrix_from_csv():
+    """저장된 twr_results.csv를 날짜 × 계좌 TWR 행렬로 읽습니다 (증분 실행 시 출력/그래프용)."""
+    saved_df = pd.read_csv(TWR_CSV_PATH, parse_dates=['Date'])
+    return saved_df.pivot_table(index='Date', columns='Account', values='TWR', aggfunc='last')
 
 # --- 배당 데이터 로드 및 처리 함수 --- (이전과 동일)
-def load_and_process_dividends(gc):
+def load_and_process_dividends(spreadsheet):
     print(f"\n--- 배당 데이터 로딩 시작 ({DIVIDEND_SHEET_NAME}) ---")
     try:
-        spreadsheet = gc.open(GOOGLE_SHEET_NAME); dividend_ws = spreadsheet.worksheet(DIVIDEND_SHEET_NAME)
-        dividend_values = dividend_ws.get_all_values()
-        if not dividend_values or len(dividend_values) < 2: print(f"ℹ️ '{DIVIDEND_SHEET_NAME}' 데이터 없음."); return None
-        header = dividend_values[0]; data_rows = dividend_values[1:]
-        if DIV_DATE_IDX >= len(header) or DIV_AMOUNT_IDX >= len(header) or DIV_ACCOUNT_IDX >= len(header): print(f"❌ 배당 시트 컬럼 부족"); return None
-        max_needed_idx = max(DIV_DATE_IDX, DIV_AMOUNT_IDX, DIV_ACCOUNT_IDX)
-        processed_data = []
-        for row in data_rows:
-             if len(row) > max_needed_idx: processed_data.append({'Date_Str': row[DIV_DATE_IDX], 'DividendAmount_Str': row[DIV_AMOUNT_IDX], 'AccountName_Raw': row[DIV_ACCOUNT_IDX]})
-        if not processed_data: print(f"ℹ️ '{DIVIDEND_SHEET_NAME}' 유효 데이터 행 없음."); return None
-        df_dividends = pd.DataFrame(processed_data); df_dividends['Date'] = pd.to_datetime(df_dividends['Date_Str'], errors='coerce'); df_dividends['DividendAmount'] = clean_numeric_column(df_dividends['DividendAmount_Str']); df_dividends['AccountName'] = df_dividends['AccountName_Raw'].astype(str).str.strip()
+        # 날짜 / 배당금 / 계좌명 열만 읽기 (원시 값: 배당금 숫자, 날짜 일련번호)
+        date_col, amount_col, account_col = (sheet_columns.column_letter(idx) for idx in (DIV_DATE_IDX, DIV_AMOUNT_IDX, DIV_ACCOUNT_IDX))
+        frame = sheet_columns.read_columns(spreadsheet, [(DIVIDEND_SHEET_NAME, [date_col, amount_col, account_col])], typed=True, use_mirror=USE_SHEET_MIRROR)[DIVIDEND_SHEET_NAME]
+        if frame.attrs.get('missing'): print(f"⚠️ 경고: 배당 시트 '{DIVIDEND_SHEET_NAME}' 읽기 실패 또는 없음."); return None
+        if frame.empty: print(f"ℹ️ '{DIVIDEND_SHEET_NAME}' 데이터 없음."); return None
+        df_dividends = pd.DataFrame({'Date_Str': frame[date_col], 'DividendAmount_Str': frame[amount_col], 'AccountName_Raw': frame[account_col]}); df_dividends['Date'] = to_date_series(df_dividends['Date_Str']); df_dividends['DividendAmount'] = clean_numeric_column(df_dividends['DividendAmount_Str']); df_dividends['AccountName'] = df_dividends['AccountName_Raw'].astype(str).str.strip()
         df_dividends = df_dividends.dropna(subset=['Date', 'AccountName', 'DividendAmount']); df_dividends = df_dividends[df_dividends['DividendAmount'] != 0]
         if df_dividends.empty: print(f"ℹ️ '{DIVIDEND_SHEET_NAME}' 처리 후 유효 배당 데이터 없음."); return None
         dividends_grouped = df_dividends.groupby(['Date', 'AccountName'])['DividendAmount'].sum().reset_index()
@@ -215,10 +320,10 @@ def load_and_process_dividends(gc):
     except Exception as e: print(f"❌ 오류: 배당 데이터 처리 중: {e}"); traceback.print_exc(); return None
 
 # --- 메인 실행 함수 ---
-def main():
+def main(full_rebuild=False):
     print("--- 전체 및 개별 계좌 TWR / 단순 손익 계산 (배당 반영) 및 시각화 시작 ---")
     test_start_date = None; test_end_date = None
-    twr_results = {}; gain_loss_results = {}
+    twr_results = {}; gain_loss_results = {}; twr_inputs = {}
     calculation_success = True
     graph_displayed = False
     data_saved = False
@@ -226,15 +331,16 @@ def main():
 
     gc = connect_google_sheets()
     if not gc: raise ConnectionError("🔥 구글 시트 연결 실패! 종료합니다.")
-    all_dividends_grouped = load_and_process_dividends(gc)
+    try: spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME)
+    except Exception as e: raise ConnectionError(f"🔥 스프레드시트 '{GOOGLE_SHEET_NAME}' 열기 실패: {e}")
+    all_dividends_grouped = load_and_process_dividends(spreadsheet)
+
+    # --- 0. 수익률 시트 1회 로딩 (전체/계좌별 계산에서 공통 사용) ---
+    account_dfs = load_account_data(spreadsheet, ACCOUNT_SHEETS, DATE_COL_IDX, DEPOSIT_COL_IDX, WITHDRAWAL_COL_IDX, VALUE_COL_IDX)
 
-    # --- 1. 전체 포트폴리오 계산 ---
+    # --- 1. 전체 포트폴리오 데이터 준비 ---
     print("\n>>> 전체 포트폴리오 계산 시작 <<<")
-    all_sheet_names = list(ACCOUNT_SHEETS.values())
-    total_aggregated_data_unadj, last_common_date_used = read_and_aggregate_data(
-        gc, all_sheet_names, DATE_COL_IDX, DEPOSIT_COL_IDX, WITHDRAWAL_COL_IDX, VALUE_COL_IDX,
-        test_start_date, test_end_date
-    )
+    total_aggregated_data_unadj, last_common_date_used = aggregate_account_data(account_dfs, test_start_date, test_end_date)
     if isinstance(total_aggregated_data_unadj, pd.DataFrame):
         total_aggregated_data = total_aggregated_data_unadj.copy()
         # 배당 조정
@@ -250,11 +356,8 @@ def main():
         # 계산에 사용할 데이터 (평가액 > 0 필터 제거됨)
         total_aggregated_data_for_calc = total_aggregated_data
 
-        if not total_aggregated_data_for_calc.empty:
-            total_twr_df = calculate_twr(total_aggregated_data_for_calc[['Value', 'NetCashFlow']])
-            twr_results['Total'] = total_twr_df
-            if total_twr_df is None: calculation_success = False
-        else: print("❌ 전체 유효 데이터 없음(TWR 계산 불가)."); twr_results['Total'] = None; calculation_success = False
+        if not total_aggregated_data_for_calc.empty: twr_inputs['Total'] = total_aggregated_data_for_calc[['Value', 'NetCashFlow']]
+        else: print("❌ 전체 유효 데이터 없음(TWR 계산 불가).")
 
         if not total_aggregated_data_for_calc.empty:
              try:
@@ -266,21 +369,12 @@ def main():
              except IndexError: print("❌ 전체 단순 손익 계산 오류: 데이터 기간 부족"); gain_loss_results['Total'] = None; calculation_success = False
              except Exception as e_gl: print(f"❌ 전체 단순 손익 계산 오류: {e_gl}"); gain_loss_results['Total'] = None; calculation_success = False
         else: gain_loss_results['Total'] = None
+    else: print("❌ 전체 데이터 로딩/집계 실패."); gain_loss_results['Total'] = None
 
-        if 'Total' in twr_results and twr_results['Total'] is not None:
-             final_total_twr = twr_results['Total']['TWR'].dropna().iloc[-1] if not twr_results['Total']['TWR'].dropna().empty else 'N/A'
-             if isinstance(final_total_twr, (float, np.number)): print(f"📈 전체 최종 TWR: {final_total_twr:.2f}%")
-             else: print(f"📈 전체 최종 TWR: {final_total_twr}")
-        else: print("  (전체 TWR 계산 실패)")
-    else: print("❌ 전체 데이터 로딩/집계 실패."); twr_results['Total'] = None; gain_loss_results['Total'] = None; calculation_success = False
-
-    # --- 2. 개별 계좌 계산 ---
+    # --- 2. 개별 계좌 데이터 준비 ---
     for acc_name, sheet_name in ACCOUNT_SHEETS.items():
         print(f"\n>>> {acc_name} ({sheet_name}) 계산 시작 <<<")
-        aggregated_data_unadj, _ = read_and_aggregate_data(
-            gc, [sheet_name], DATE_COL_IDX, DEPOSIT_COL_IDX, WITHDRAWAL_COL_IDX, VALUE_COL_IDX,
-            test_start_date, test_end_date
-        )
+        aggregated_data_unadj, _ = aggregate_account_data({acc_name: account_dfs[acc_name]}, test_start_date, test_end_date)
         if isinstance(aggregated_data_unadj, pd.DataFrame):
             aggregated_data = aggregated_data_unadj.copy()
             # 배당 조정
@@ -298,11 +392,8 @@ def main():
             # 계산용 데이터 (평가액 > 0 필터 제거됨)
             aggregated_data_for_calc = aggregated_data
 
-            if not aggregated_data_for_calc.empty:
-                twr_df = calculate_twr(aggregated_data_for_calc[['Value', 'NetCashFlow']])
-                twr_results[acc_name] = twr_df
-                if twr_df is None: calculation_success = False
-            else: print(f"❌ {acc_name} 유효 데이터 없음(TWR 계산 불가)."); twr_results[acc_name] = None; calculation_success = False
+            if not aggregated_data_for_calc.empty: twr_inputs[acc_name] = aggregated_data_for_calc[['Value', 'NetCashFlow']]
+            else: print(f"❌ {acc_name} 유효 데이터 없음(TWR 계산 불가).")
 
             if not aggregated_data_for_calc.empty:
                  try:
@@ -323,29 +414,56 @@ def main():
                  except IndexError: print(f"❌ {acc_name} 단순 손익 계산 오류: 데이터 기간 부족"); gain_loss_results[acc_name] = None; calculation_success = False
                  except Exception as e_gl: print(f"❌ {acc_name} 단순 손익 계산 오류: {e_gl}"); gain_loss_results[acc_name] = None; calculation_success = False
             else: gain_loss_results[acc_name] = None
-
-            if acc_name in twr_results and twr_results[acc_name] is not None:
-                 final_twr = twr_results[acc_name]['TWR'].dropna().iloc[-1] if not twr_results[acc_name]['TWR'].dropna().empty else 'N/A'
-                 if isinstance(final_twr, (float, np.number)): print(f"📈 {acc_name} 최종 TWR: {final_twr:.2f}%")
-                 else: print(f"📈 {acc_name} 최종 TWR: {final_twr}")
-            else: print(f"  ({acc_name} TWR 계산 실패)")
-        else: print(f"❌ {acc_name} 데이터 로딩/집계 실패."); twr_results[acc_name] = None; gain_loss_results[acc_name] = None; calculation_success = False
-
-    # --- 3. 계산 결과 파일 저장 ---
-    if calculation_success and twr_results:
+        else: print(f"❌ {acc_name} 데이터 로딩/집계 실패."); gain_loss_results[acc_name] = None
+
+    # --- 2-1. 전체 + 계좌별 TWR 행렬 계산 (체크포인트 이후 증분 또는 전체 재계산) ---
+    csv_last_date = last_common_date_used
+    if csv_last_date is None and twr_inputs: csv_last_date = max(df.index.max() for df in twr_inputs.values())
+    previous_state = None if full_rebuild else load_twr_state()
+    incremental = can_resume_from_state(previous_state, twr_inputs, csv_last_date)
+    if incremental:
+        print(f"\n--- 증분 TWR 계산 (체크포인트: {previous_state['csv_last_date']}) ---")
+        new_inputs = {name: df[df.index > pd.to_datetime(previous_state['accounts'][name]['last_date'])] for name, df in twr_inputs.items()}
+        if any(not df.empty for df in new_inputs.values()): new_twr_matrix = calculate_twr_matrix(new_inputs, previous_state['accounts'])
+        else: print("  - 체크포인트 이후 신규 날짜 없음."); new_twr_matrix = None
+        try: history_matrix = load_twr_matrix_from_csv()
+        except Exception as e_hist: print(f"⚠️ 기존 TWR 결과 로드 실패 ({e_hist}) → 전체 재계산"); incremental = False
+        if incremental:
+            twr_matrix = history_matrix if new_twr_matrix is None else pd.concat([history_matrix, new_twr_matrix[new_twr_matrix.index > history_matrix.index.max()]])
+            twr_matrix = twr_matrix.reindex(columns=list(twr_inputs.keys()))
+    if not incremental:
+        if not full_rebuild and previous_state is None: print("\n--- TWR 체크포인트 없음 → 전체 계산 ---")
+        new_twr_matrix = twr_matrix = calculate_twr_matrix(twr_inputs)
+    # 계좌별 결과는 두 방식 모두 결과 파일과 같은 구간(공통 마감일까지)으로 맞춤 (증분 실행은 파일에서 읽은 과거 구간 + 신규 구간)
+    result_matrix = twr_matrix[twr_matrix.index <= csv_last_date] if twr_matrix is not None and csv_last_date is not None else twr_matrix
+    for acc_name in ['Total'] + list(ACCOUNT_SHEETS.keys()):
+        title_name = "전체" if acc_name == "Total" else acc_name
+        twr_series = result_matrix[acc_name].dropna() if result_matrix is not None and acc_name in result_matrix.columns else pd.Series(dtype=float)
+        if twr_series.empty:
+            print(f"  ({title_name} TWR 계산 실패: 데이터 부족 또는 로딩 실패)"); twr_results[acc_name] = None; calculation_success = False; continue
+        twr_results[acc_name] = twr_series.to_frame('TWR')
+        print(f"📈 {title_name} 최종 TWR: {twr_series.iloc[-1]:.2f}%")
+
+    # --- 3. 계산 결과 파일 저장 (증분 실행 시 신규 행만 추가) ---
+    if calculation_success and twr_matrix is not None:
         print("\n--- 계산 결과 파일 저장 중 ---")
         try:
-            all_twr_dfs = []
-            for acc_name, twr_df in twr_results.items():
-                if twr_df is not None and not twr_df.empty: temp_df = twr_df.copy(); temp_df['Account'] = acc_name; all_twr_dfs.append(temp_df.reset_index())
-            if all_twr_dfs:
-                combined_twr_df = pd.concat(all_twr_dfs, ignore_index=True)
-                if last_common_date_used:
-                    combined_twr_df['Date'] = pd.to_datetime(combined_twr_df['Date'])
-                    combined_twr_df = combined_twr_df[combined_twr_df['Date'] <= last_common_date_used]
-                    print(f"  - TWR 결과 파일 저장 시 최종 공통 마감일({last_common_date_used.strftime('%Y-%m-%d')}) 이전 데이터만 포함합니다.")
-                combined_twr_df.to_csv(TWR_CSV_PATH, index=False, encoding='utf-8-sig'); print(f"✅ TWR 결과 저장 완료: {TWR_CSV_PATH}"); data_saved = True
-            else: print("⚠️ 저장할 유효 TWR 결과 없음.")
+            if last_common_date_used: print(f"  - TWR 결과 파일 저장 시 최종 공통 마감일({last_common_date_used.strftime('%Y-%m-%d')}) 이전 데이터만 포함합니다.")
+            twr_saved = False
+            if incremental:
+                append_df = twr_matrix_to_csv_rows(new_twr_matrix, csv_last_date) if new_twr_matrix is not None else pd.DataFrame()
+                append_df = append_df[append_df['Date'] > pd.to_datetime(previous_state['csv_last_date'])] if not append_df.empty else append_df
+                if not append_df.empty: append_df.to_csv(TWR_CSV_PATH, mode='a', header=False, index=False, encoding='utf-8'); print(f"✅ TWR 결과 {len(append_df)}행 추가 완료: {TWR_CSV_PATH}")
+                else: print("ℹ️ 추가할 신규 TWR 결과 없음.")
+                twr_saved = True
+            else:
+                combined_twr_df = twr_matrix_to_csv_rows(twr_matrix, csv_last_date)
+                if not combined_twr_df.empty:
+                    combined_twr_df.to_csv(TWR_CSV_PATH, index=False, encoding='utf-8-sig'); print(f"✅ TWR 결과 저장 완료: {TWR_CSV_PATH}"); twr_saved = True
+                else: print("⚠️ 저장할 유효 TWR 결과 없음.")
+            if twr_saved:
+                data_saved = True
+                save_twr_state(build_twr_state(twr_inputs, new_twr_matrix, csv_last_date, previous_state if incremental else None))
             serializable_gain_loss = {k: (None if pd.isna(v) else v) for k, v in gain_loss_results.items()}
             with open(GAIN_LOSS_JSON_PATH, 'w', encoding='utf-8') as f: json.dump(serializable_gain_loss, f, ensure_ascii=False, indent=4)
             print(f"✅ 단순 손익 결과 저장 완료: {GAIN_LOSS_JSON_PATH}"); data_saved = True
@@ -407,7 +525,7 @@ if __name__ == '__main__':
     start_run_time = time.time()
     final_message = ""; error_occurred = False; error_details_str = ""; main_success = False
     try:
-        main_success = main()
+        main_success = main(full_rebuild='--full-rebuild' in sys.argv)
         if not main_success: error_occurred = True; error_details_str = "계산, 저장 또는 그래프 생성 중 오류 발생 (로그 확인)"
     except ConnectionError as e: error_occurred = True; print(f"🔥 연결 오류: {e}"); error_details_str = traceback.format_exc()
     except Exception as e: error_occurred = True; print(f"🔥 예상치 못한 오류: {e}"); error_details_str = traceback.format_exc()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# price_cache.py: Yahoo Finance 일봉 로컬 가격 저장소 (SQLite, 증분 갱신)
+# - 티커별 일봉(OHLCV, 수정 주가)과 이미 받아 둔 날짜 구간(coverage)을 기록
+# - 요청 구간 중 저장되지 않은 앞/뒤 구간만 다운로드 (최근 며칠은 겹쳐 받아 확정 종가 반영)
+# - 겹친 구간의 종가가 달라졌으면(배당/분할로 수정 주가 재계산) 해당 티커 전체를 다시 받음
+# - 티커의 거래소(한국/미국) 현지 시각 기준으로 장 마감 후에만 오늘 봉을 coverage에 포함
+#   (장중에만 오늘 봉을 다시 받고, 장 시작 전/주말/휴장일에는 다시 받지 않음)
+# - 여러 티커를 한 번에 요청하면 부족한 구간을 합쳐 yf.download 1회(티커별 스레드)로 받음
+
+import os
+import sqlite3
+import threading
+import traceback
+from datetime import date, datetime, time, timedelta
+import pandas as pd
+
+try:
+    import yfinance as yf
+except ImportError:
+    print("오류: 'yfinance' 라이브러리가 설치되지 않았습니다. (pip install yfinance)")
+    print("-> 로컬 가격 저장소에 이미 있는 데이터만 사용합니다.")
+    yf = None
+
+try:
+    import holidays
+except ImportError:
+    print("오류: 'holidays' 라이브러리가 설치되지 않았습니다. (pip install holidays)")
+    print("-> 가격 저장소는 공휴일 제외 없이 주말만 휴장일로 봅니다.")
+    holidays = None
+
+# --- 설정 ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PRICE_DB_PATH = os.path.join(CURRENT_DIR, 'price_cache.sqlite3')
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+REFRESH_OVERLAP_DAYS = 5 # 뒤쪽 구간 갱신 시 이미 저장된 마지막 날짜 이전부터 겹쳐 받을 일수
+ADJUSTMENT_TOLERANCE = 1e-4 # 겹친 구간 종가의 상대 오차가 이보다 크면 수정 주가 변경으로 판단
+# 거래소별 (시간대, 장 시작, 종가 확정 시각, holidays 달력 이름). 종가 확정 시각은 정규장 마감 후 여유를 둠
+MARKET_SESSIONS = {
+    'KRX': ('Asia/Seoul', time(9, 0), time(16, 0), 'XKRX'),
+    'US': ('America/New_York', time(9, 30), time(16, 30), 'NYSE'),
+}
+# --- ---
+
+_db_lock = threading.Lock()
+
+# --- DB 유틸리티 ---
+def _connect_db():
+    conn = sqlite3.connect(PRICE_DB_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS prices (ticker TEXT, date TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL, PRIMARY KEY (ticker, date))")
+    conn.execute("CREATE TABLE IF NOT EXISTS coverage (ticker TEXT PRIMARY KEY, start_date TEXT, end_date TEXT, fetched_at TEXT)")
+    return conn
+
+def _to_date(value):
+    """str / datetime / Timestamp / date → date"""
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date): return value
+    return pd.to_datetime(value).date()
+
+def _get_coverage(conn, ticker):
+    row = conn.execute("SELECT start_date, end_date FROM coverage WHERE ticker=?", (ticker,)).fetchone()
+    return (_to_date(row[0]), _to_date(row[1])) if row else None
+
+def _set_coverage(conn, ticker, start, end):
+    conn.execute("INSERT OR REPLACE INTO coverage (ticker, start_date, end_date, fetched_at) VALUES (?, ?, ?, ?)",
+                 (ticker, start.isoformat(), end.isoformat(), datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+def _read_prices(conn, ticker, start, end):
+    rows = conn.execute("SELECT date, open, high, low, close, volume FROM prices WHERE ticker=? AND date>=? AND date<=? ORDER BY date",
+                        (ticker, start.isoformat(), end.isoformat())).fetchall()
+    df = pd.DataFrame(rows, columns=['Date'] + PRICE_COLUMNS)
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.set_index('Date')
+
+def _write_prices(conn, ticker, df):
+    if df.empty: return
+    records = df.reindex(columns=PRICE_COLUMNS).astype('float64')
+    conn.executemany("INSERT OR REPLACE INTO prices (ticker, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [(ticker, d.strftime('%Y-%m-%d'), *[None if pd.isna(v) else float(v) for v in row])
+                      for d, row in zip(records.index, records.itertuples(index=False, name=None))])
+# --- ---
+
+# --- 거래일 / 확정일 ---
+def _market_of(ticker):
+    """티커 → 거래소 구분 (.KS/.KQ, ^KS/^KQ는 한국, 나머지는 미국)"""
+    upper = ticker.upper()
+    return 'KRX' if upper.endswith(('.KS', '.KQ')) or upper.startswith(('^KS', '^KQ')) else 'US'
+
+def _is_trading_day(market, day):
+    """거래소 현지 날짜 기준 개장일 여부 (주말/공휴일 제외, holidays 미설치 시 주말만 제외)"""
+    if day.weekday() >= 5: return False
+    if holidays:
+        try:
+            calendar = getattr(holidays, MARKET_SESSIONS[market][3], None) or holidays.KR
+            if day in calendar(years=day.year): return False
+        except Exception as e: print(f"⚠️ [가격 저장소] 휴장일 확인 중 오류: {e}")
+    return True
+
+def _market_limits(market, now=None):
+    """
+    거래소 현지 시각 기준 (확정일, 조회 가능일)을 반환합니다.
+    - 확정일: 이 날짜까지의 봉은 더 바뀌지 않으므로 coverage에 포함 가능
+    - 조회 가능일: 봉이 있을 수 있는 마지막 날짜 (장중이면 오늘, 장 시작 전이면 전날)
+    """
+    tz, open_time, final_time, _ = MARKET_SESSIONS[market]
+    local_now = pd.Timestamp.now(tz=tz) if now is None else pd.Timestamp(now).tz_convert(tz)
+    today = local_now.date(); clock = local_now.time()
+    if not _is_trading_day(market, today) or clock >= final_time: return today, today # 휴장일 / 종가 확정 후
+    yesterday = today - timedelta(days=1)
+    return (yesterday, today) if clock >= open_time else (yesterday, yesterday) # 장중 / 장 시작 전
+# --- ---
+
+# --- 다운로드 ---
+def _split_download(data, tickers):
+    """yf.download 결과를 {티커: PRICE_COLUMNS DataFrame}으로 분리 (단일/다중 티커, (Price, Ticker) 컬럼 모두 처리)"""
+    frames = {}
+    if data is None or data.empty: return frames
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(1): continue
+            df = data.xs(ticker, axis=1, level=1)
+        elif len(tickers) == 1: df = data
+        else: continue
+        df = df.loc[:, ~df.columns.duplicated()].reindex(columns=PRICE_COLUMNS)
+        df.index = pd.to_datetime(df.index)
+        if df.index.tz is not None: df.index = df.index.tz_localize(None)
+        df.index = df.index.normalize()
+        frames[ticker] = df.dropna(subset=['Close'])
+    return frames
+
+def _download_many(tickers, start, end):
+    """여러 티커의 start~end(포함) 일봉을 yf.download 1회(threads=True)로 받아 {티커: DataFrame} 반환"""
+    if yf is None or not tickers or start > end: return {}
+    print(f"  📥 [가격 저장소] {', '.join(tickers)} 다운로드: {start} ~ {end}")
+    data = yf.download(list(tickers), start=start, end=end + timedelta(days=1), progress=False, auto_adjust=True, threads=True)
+    return _split_download(data, list(tickers))
+
+def _slice(df, start, end):
+    if df is None or df.empty: return pd.DataFrame(columns=PRICE_COLUMNS)
+    return df[(df.index.date >= start) & (df.index.date <= end)]
+
+def _adjustment_changed(stored, fetched):
+    """겹친 날짜의 저장 종가와 새 종가 비교 → 수정 주가가 바뀌었는지 여부"""
+    common = stored.index.intersection(fetched.index)
+    if common.empty: return False
+    old = stored.loc[common, 'Close'].astype('float64'); new = fetched.loc[common, 'Close'].astype('float64')
+    rel_diff = ((new - old).abs() / old.abs().where(old.abs() > 0)).dropna()
+    return bool((rel_diff > ADJUSTMENT_TOLERANCE).any())
+# --- ---
+
+# --- 갱신 계획 / 반영 ---
+def _plan_refresh(conn, ticker, start, end):
+    """저장된 coverage 기준으로 받아야 할 구간 계산 (coverage는 항상 하나의 연속 구간으로 유지)"""
+    coverage = _get_coverage(conn, ticker)
+    fetches = [] # [(시작, 끝)]
+    if start > end: pass # 요청 구간에 아직 봉이 생길 수 없는 날짜만 있음
+    elif coverage is None: fetches.append((start, end))
+    else:
+        cov_start, cov_end = coverage
+        if start < cov_start: fetches.append((start, cov_start - timedelta(days=1)))
+        if end > cov_end: fetches.append((min(cov_end - timedelta(days=REFRESH_OVERLAP_DAYS), end), end))
+    stored_tail = _read_prices(conn, ticker, coverage[1] - timedelta(days=REFRESH_OVERLAP_DAYS), coverage[1]) if coverage and fetches else None
+    return {'coverage': coverage, 'fetches': fetches, 'stored_tail': stored_tail,
+            'new_start': start if coverage is None else min(start, coverage[0]),
+            'new_end': end if coverage is None else max(end, coverage[1])}
+
+def _resolve_refresh(ticker, plan, downloaded):
+    """받은 데이터를 계획된 구간별로 나누어 저장할 프레임/coverage 결정. 수정 주가 변경 시 전체 구간 재다운로드"""
+    coverage = plan['coverage']; new_start = plan['new_start']; new_end = plan['new_end']
+    reset = False; fetched_frames = []
+    for fetch_start, fetch_end in plan['fetches']:
+        fetched = _slice(downloaded, fetch_start, fetch_end)
+        if fetched.empty:
+            if yf is not None: print(f"  ⚠️ [가격 저장소] {ticker} {fetch_start} ~ {fetch_end} 데이터 없음.")
+            # 받지 못한 구간은 coverage에 넣지 않음 (다음 조회 때 다시 시도)
+            if coverage is None: new_start = new_end = None
+            elif fetch_end < coverage[0]: new_start = coverage[0]
+            else: new_end = coverage[1]
+            continue
+        if coverage is not None and fetch_end > coverage[1] and plan['stored_tail'] is not None and _adjustment_changed(plan['stored_tail'], fetched):
+            print(f"  ℹ️ [가격 저장소] {ticker} 수정 주가 변경 감지 → 전체 구간 다시 받기 ({new_start} ~ {new_end})")
+            fetched = _slice(_download_many([ticker], new_start, new_end).get(ticker), new_start, new_end)
+            if fetched.empty: fetched_frames = []; new_start, new_end = coverage; break
+            reset = True; fetched_frames = [fetched]; break
+        fetched_frames.append(fetched)
+    return {'reset': reset, 'frames': fetched_frames, 'new_start': new_start, 'new_end': new_end}
+# --- ---
+
+def get_price_histories(tickers, start_date, end_date):
+    """
+    여러 티커의 start_date~end_date(포함) 일봉(수정 주가)을 반환합니다.
+    로컬 저장소에 없는 구간만 모아 Yahoo Finance에 1회(티커별 스레드) 요청하고 저장합니다.
+    반환: {티커: DatetimeIndex('Date') × ['Open', 'High', 'Low', 'Close', 'Volume'] DataFrame} (없으면 빈 DataFrame)
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t)) # 중복/빈 값 제거 (순서 유지)
+    start = _to_date(start_date); end = _to_date(end_date)
+    empty = lambda: pd.DataFrame(columns=PRICE_COLUMNS)
+    if not tickers or start > end: return {t: empty() for t in tickers}
+    try:
+        # 거래소별 확정일/조회 가능일: 조회 가능일 이후는 받지 않고, 확정일 이후는 coverage에 넣지 않음 (다음 조회 때 다시 받음)
+        limits = {market: _market_limits(market) for market in {_market_of(t) for t in tickers}}
+        with _db_lock:
+            conn = _connect_db()
+            try: plans = {t: _plan_refresh(conn, t, start, min(end, limits[_market_of(t)][1])) for t in tickers}
+            finally: conn.close()
+
+        # 부족한 구간이 있는 티커만 모아 합친 구간으로 1회 다운로드 → 티커별 계획 구간으로 잘라 사용
+        stale = [t for t in tickers if plans[t]['fetches']]
+        if stale:
+            fetch_start = min(f[0] for t in stale for f in plans[t]['fetches'])
+            fetch_end = max(f[1] for t in stale for f in plans[t]['fetches'])
+            downloaded = _download_many(stale, fetch_start, fetch_end)
+            updates = {t: _resolve_refresh(t, plans[t], downloaded.get(t)) for t in stale}
+            with _db_lock:
+                conn = _connect_db()
+                try:
+                    with conn:
+                        for ticker, update in updates.items():
+                            if not update['frames'] and not update['reset']: continue
+                            if update['reset']: conn.execute("DELETE FROM prices WHERE ticker=?", (ticker,))
+                            for fetched in update['frames']: _write_prices(conn, ticker, fetched)
+                            market = _market_of(ticker); last_final_day = limits[market][0]
+                            covered_end = min(update['new_end'], last_final_day) if update['new_end'] is not None else None
+                            # 마감 직후 Yahoo에 확정일 봉이 아직 없으면 그 날은 coverage에서 빼고 다음 조회 때 다시 받음
+                            if covered_end == last_final_day and _is_trading_day(market, last_final_day) \
+                                    and not any((f.index.date == last_final_day).any() for f in update['frames']):
+                                covered_end = last_final_day - timedelta(days=1)
+                            if update['new_start'] is not None and covered_end is not None and covered_end >= update['new_start']:
+                                _set_coverage(conn, ticker, update['new_start'], covered_end)
+                finally: conn.close()
+
+        with _db_lock:
+            conn = _connect_db()
+            try: return {t: _read_prices(conn, t, start, end) for t in tickers}
+            finally: conn.close()
+    except Exception as e:
+        print(f"  ❌ [가격 저장소] {', '.join(tickers)} 조회 중 오류: {e}"); traceback.print_exc()
+        return {t: empty() for t in tickers}
+
+def get_price_history(ticker, start_date, end_date):
+    """단일 티커 일봉 (get_price_histories 참고)"""
+    if not ticker: return pd.DataFrame(columns=PRICE_COLUMNS)
+    return get_price_histories([ticker], start_date, end_date)[ticker]
+
+def get_close_frame(tickers, start_date, end_date):
+    """여러 티커의 종가를 날짜 × 티커 DataFrame으로 정렬하여 반환 (거래일이 다른 날은 NaN)"""
+    histories = get_price_histories(tickers, start_date, end_date)
+    frame = pd.DataFrame({t: df['Close'].astype('float64') for t, df in histories.items()})
+    frame = frame.reindex(columns=list(histories)); frame.index = pd.to_datetime(frame.index)
+    frame = frame.sort_index(); frame.index.name = 'Date'
+    return frame
+
+def last_valid_closes(close_frame, target_date=None):
+    """날짜 × 티커 종가 프레임에서 티커별 target_date 이전(포함) 마지막 유효 종가. 반환: {티커: (종가, 날짜) 또는 (None, None)}"""
+    frame = close_frame if target_date is None else close_frame[close_frame.index.date <= _to_date(target_date)]
+    result = {}
+    for ticker in close_frame.columns:
+        last_date = frame[ticker].last_valid_index()
+        result[ticker] = (None, None) if last_date is None else (float(frame.at[last_date, ticker]), last_date.date())
+    return result
+
+def get_last_closes(tickers, target_date, lookback_days=3):
+    """여러 티커의 target_date 이전(포함) lookback_days 이내 마지막 유효 종가 (1회 요청). 반환: {티커: (종가, 날짜) 또는 (None, None)}"""
+    target = _to_date(target_date)
+    return last_valid_closes(get_close_frame(tickers, target - timedelta(days=lookback_days), target), target)
+
+def get_last_close(ticker, target_date, lookback_days=3):
+    """target_date 이전(포함) lookback_days 이내의 마지막 유효 종가. 반환: (종가, 날짜) 또는 (None, None)"""
+    return get_last_closes([ticker], target_date, lookback_days).get(ticker, (None, None))
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# rate_limiter.py: 증권사 API 호출 공용 속도 제한기 (토큰 버킷)
+# - 고정 sleep 대신 증권사(앱키)별 버킷 1개를 프로세스 전체 스레드가 공유: 한도 아래에서는 바로 호출, 한도를 넘을 때만 대기
+# - 버킷: 초당 rate개씩 채워지고 최대 burst개까지 쌓임 → 임의의 1초 동안 호출 수 ≤ burst + rate
+# - 대기 시간은 잠금 안에서 예약(토큰을 미리 차감)하고 잠금 밖에서 sleep → 대기 중에도 다른 스레드가 순서대로 예약
+# - 사용: kis_client.KISClient.fetch (KIS, 앱키별), kiwoom_domstk_isa._kiwoom_fetch (키움)
+# - 프로세스 간 공유는 하지 않음 (여러 스크립트가 동시에 호출하면 http_session의 429/5xx 재시도가 보완)
+
+import time
+import threading
+
+# --- 설정 ---
+BROKER_LIMITS = { # {증권사: (초당 호출 수 rate, 연속 호출 허용 수 burst)}
+    'KIS': (15.0, 5), # KIS 실전 앱키 초당 20건 제한 (burst + rate ≤ 20)
+    'KIWOOM': (4.5, 1), # 키움 REST 초당 5건 내외 (기존 0.21초 간격과 같은 평균 속도, 쉬고 있었으면 바로 호출)
+}
+DEFAULT_LIMIT = (4.5, 1) # BROKER_LIMITS에 없는 증권사
+# --- ---
+
+class TokenBucket:
+    """스레드 안전 토큰 버킷. acquire()는 토큰이 생길 때까지 대기 후 반환 (대기한 초 반환)"""
+    def __init__(self, rate, burst):
+        self.rate = float(rate); self.burst = max(1, int(burst))
+        self._tokens = float(self.burst); self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens=1):
+        """토큰 예약 후 대기해야 할 시간(초) 반환. 부족하면 음수 잔량으로 미리 차감 (뒤따르는 호출은 그만큼 더 기다림)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate); self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self, tokens=1):
+        wait = self._reserve(tokens)
+        if wait > 0: time.sleep(wait)
+        return wait
+
+_buckets_lock = threading.Lock()
+_buckets = {} # {(증권사, 키): TokenBucket}
+
+def get_limiter(broker, key=None):
+    """증권사(+앱키 등 키)별 공용 버킷 (최초 호출 시 BROKER_LIMITS 기준으로 생성)"""
+    with _buckets_lock:
+        if (broker, key) not in _buckets: _buckets[(broker, key)] = TokenBucket(*BROKER_LIMITS.get(broker, DEFAULT_LIMIT))
+        return _buckets[(broker, key)]
+
+def acquire(broker, key=None):
+    """호출 전 1회 호출. 한도 안이면 바로 반환, 넘으면 필요한 만큼만 대기"""
+    return get_limiter(broker, key).acquire()
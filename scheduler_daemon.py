@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+# scheduler_daemon.py: 일일 파이프라인(daily_pipeline.py)을 상주 프로세스에서 예약 실행하는 스케줄러 데몬
+# - 한 번 띄워 두면 pandas / matplotlib / yfinance 임포트, 설정 파일 로드, 구글 인증, 증권사 토큰이 프로세스에 유지됨 (작업마다 새 프로세스 시작 비용 없음)
+# - KRX 영업일(주말, 공휴일, 근로자의 날, 연말 휴장일 제외)에만 예약 작업 실행
+# - 증권사 토큰은 만료 전에 미리 갱신, 로컬 시트 미러는 주기적으로 동기화하여 작업 시 바로 읽기
+# - 수동 실행 요청: 로컬 HTTP(127.0.0.1) /run, /status (텔레그램 봇 /run, /status 명령 또는 --trigger 옵션에서 사용)
+# - 모든 작업(파이프라인, 토큰 갱신, 미러 동기화)은 작업 스레드 1개에서 순서대로 실행 (동시 실행 없음)
+# - 사용: python scheduler_daemon.py (데몬 실행) / --trigger [--only=prices,performance] [--force] [--full-rebuild] / --status
+
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import token_manager
+
+# 공휴일 처리
+try:
+    import holidays
+except ImportError:
+    print("⚠️ 'holidays' 라이브러리가 설치되지 않았습니다. 주말만 휴장일로 처리합니다.")
+    holidays = None
+
+# --- 설정 ---
+DAILY_JOBS = [ # 예약 작업 (time: 실행 시각 HH:MM, steps: None이면 전체 단계)
+    {'name': '일일 업데이트', 'time': '18:10', 'steps': None, 'business_days_only': True},
+]
+POLL_INTERVAL_SECONDS = 30 # 예약 시각 확인 간격
+TOKEN_CHECK_INTERVAL_SECONDS = 600 # 증권사 토큰 만료 확인 간격
+TOKEN_REFRESH_AHEAD = token_manager.REFRESH_AHEAD # 만료까지 이 시간보다 적게 남으면 미리 재발급 (token_manager 백그라운드 갱신과 같은 기준)
+MIRROR_SYNC_INTERVAL_SECONDS = 1800 # 로컬 시트 미러 동기화 간격 (변경 없으면 수정 시각 확인 1회)
+TRIGGER_HOST = '127.0.0.1'; TRIGGER_PORT = 8765 # 수동 실행 요청 수신 주소 (로컬 전용)
+TRIGGER_URL = f"http://{TRIGGER_HOST}:{TRIGGER_PORT}"
+RECENT_RUNS_KEPT = 10 # /status에 보여줄 최근 실행 기록 수
+SCRIPT_NAME = os.path.basename(__file__)
+# --- ---
+
+_jobs = queue.Queue()
+_stop_event = threading.Event()
+_status_lock = threading.Lock()
+_status = {'started_at': None, 'running': None, 'recent_runs': [], 'token_expiry': {}}
+_krx_calendars = {} # {연도: 휴장일 달력}
+
+# --- KRX 영업일 ---
+def _krx_calendar(year):
+    if year not in _krx_calendars:
+        if holidays is None: _krx_calendars[year] = {}
+        elif hasattr(holidays, 'XKRX'): _krx_calendars[year] = holidays.XKRX(years=year) # 거래소 휴장일 (근로자의 날, 연말 휴장일 포함)
+        else: _krx_calendars[year] = holidays.KR(years=year, observed=True)
+    return _krx_calendars[year]
+
+def is_krx_business_day(day):
+    """KRX 영업일 여부 (주말 / 거래소 휴장일 제외)"""
+    return day.weekday() < 5 and day not in _krx_calendar(day.year)
+# --- ---
+
+# --- 상태 ---
+def _set_running(description):
+    with _status_lock: _status['running'] = description
+
+def _record_run(kind, source, status, message, started_at):
+    with _status_lock:
+        _status['recent_runs'].append({'kind': kind, 'source': source, 'status': status, 'message': message, 'started_at': started_at, 'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        del _status['recent_runs'][:-RECENT_RUNS_KEPT]
+
+def get_status():
+    with _status_lock:
+        status = json.loads(json.dumps(_status, default=str))
+    status['queued'] = _jobs.qsize()
+    return status
+# --- ---
+
+# --- 작업 ---
+def refresh_broker_tokens(ahead=TOKEN_REFRESH_AHEAD):
+    """
+    증권사 토큰 준비 + 만료 임박 토큰 갱신. 계좌별 만료 시각 반환.
+    계좌별 인증(메모리 토큰이 유효하면 바로 반환, 없으면 파일 읽기/발급)으로 토큰을 메모리에 올린 뒤,
+    갱신 기준은 token_manager.refresh_due 하나만 사용 (백그라운드 갱신 스레드와 같은 기준, 별도 강제 재발급 없음)
+    """
+    import daily_batch
+    for acc_name, acc_info in daily_batch.ACCOUNTS.items():
+        auth_module = acc_info['auth']
+        if auth_module is None: continue
+        try:
+            auth_func = auth_module.auth if acc_info['type'].startswith('KIS') else auth_module.authenticate
+            if not auth_func(): print(f"❌ [데몬] {acc_name} 인증 실패")
+        except Exception as e: print(f"❌ [데몬] {acc_name} 인증 중 오류: {e}"); traceback.print_exc()
+    token_manager.refresh_due(ahead) # 메모리의 토큰 중 만료까지 ahead 이하로 남은 토큰 갱신 (다른 프로세스가 갱신했으면 파일에서 읽음)
+    expiries = {}
+    for acc_name, acc_info in daily_batch.ACCOUNTS.items():
+        if acc_info['auth'] is None: continue
+        try: expiry = acc_info['auth'].get_token_expiry()
+        except Exception as e: print(f"❌ [데몬] {acc_name} 토큰 만료 시각 확인 중 오류: {e}"); expiry = None
+        expiries[acc_name] = expiry.strftime('%Y-%m-%d %H:%M:%S') if expiry else None
+    with _status_lock: _status['token_expiry'] = expiries
+    return expiries
+
+def sync_sheet_mirror():
+    """로컬 시트 미러 동기화 (작업 실행 시 미러를 바로 읽도록 유지)"""
+    import sheets_client
+    try: import sheet_mirror
+    except ImportError: return None
+    return sheet_mirror.sync_mirror(sheets_client.get_spreadsheet())
+
+def run_pipeline_job(job):
+    """파이프라인 실행 후 결과를 텔레그램으로 알림. 반환: (상태, 요약 메시지)"""
+    import daily_pipeline
+    start_time = time.time()
+    results = daily_pipeline.run_pipeline(job.get('steps'), force=job.get('force', False), full_rebuild=job.get('full_rebuild', False))
+    summary, failed = daily_pipeline.format_summary(results, time.time() - start_time)
+    summary = f"{summary}\n(요청: {job['source']})"
+    daily_pipeline.telegram_utils.send_telegram_message(summary)
+    return ('failed' if failed else 'success'), summary
+
+def warm_up():
+    """무거운 모듈 임포트, 구글 인증 / 스프레드시트 핸들, 증권사 토큰, 시트 미러를 미리 준비"""
+    print("🔥 [데몬] 준비 시작 (모듈 임포트, 인증, 미러 동기화)...")
+    for module_name in ('daily_pipeline', 'Workspace_kiwoom_trades', 'sheet_updater', 'daily_batch', 'portfolio_performance', 'git_sync', 'price_cache'):
+        try: __import__(module_name)
+        except Exception as e: print(f"⚠️ [데몬] '{module_name}' 임포트 실패 (해당 단계 실행 시 오류): {e}")
+    try:
+        import sheets_client
+        sheets_client.get_spreadsheet(); print("✅ [데몬] 구글 시트 연결 완료.")
+    except Exception as e: print(f"⚠️ [데몬] 구글 시트 연결 실패 (작업 실행 시 재시도): {e}")
+    try: refresh_broker_tokens()
+    except Exception as e: print(f"⚠️ [데몬] 증권사 토큰 준비 실패: {e}")
+    try: sync_sheet_mirror()
+    except Exception as e: print(f"⚠️ [데몬] 시트 미러 동기화 실패: {e}")
+
+def enqueue(kind, source, **params):
+    """작업 예약. 반환: 대기열 길이"""
+    _jobs.put(dict(params, kind=kind, source=source))
+    return _jobs.qsize()
+
+def _worker():
+    """대기열의 작업을 하나씩 실행 (파이프라인 / 토큰 갱신 / 미러 동기화)"""
+    handlers = {'pipeline': run_pipeline_job, 'tokens': lambda job: ('success', json.dumps(refresh_broker_tokens(), ensure_ascii=False)), 'mirror': lambda job: ('success' if sync_sheet_mirror() is not None else 'failed', '')}
+    while not _stop_event.is_set():
+        try: job = _jobs.get(timeout=1)
+        except queue.Empty: continue
+        started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S'); _set_running(f"{job['kind']} ({job['source']}, {started_at}~)")
+        try: status, message = handlers[job['kind']](job)
+        except Exception as e: print(f"🔥 [데몬] 작업 '{job['kind']}' 실행 오류: {e}"); traceback.print_exc(); status, message = 'failed', f"{type(e).__name__}: {e}"
+        finally: _set_running(None); _jobs.task_done()
+        if job['kind'] == 'pipeline': _record_run(job['kind'], job['source'], status, message, started_at)
+# --- ---
+
+# --- 수동 실행 요청 (로컬 HTTP) ---
+class _TriggerHandler(BaseHTTPRequestHandler):
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code); self.send_header('Content-Type', 'application/json; charset=utf-8'); self.send_header('Content-Length', str(len(body))); self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status': self._reply(200, get_status())
+        else: self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/run': self._reply(404, {'error': 'not found'}); return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length).decode('utf-8') or '{}') if length else {}
+            steps = request.get('steps') or None
+            import daily_pipeline
+            daily_pipeline.resolve_steps(steps) # 단계 이름 검증 (잘못된 이름이면 ValueError)
+        except (ValueError, TypeError) as e: self._reply(400, {'error': str(e)}); return
+        position = enqueue('pipeline', request.get('source') or 'trigger', steps=steps, force=bool(request.get('force')), full_rebuild=bool(request.get('full_rebuild')))
+        print(f"📥 [데몬] 수동 실행 요청 접수 (단계: {steps or '전체'}, 대기열: {position})")
+        self._reply(202, {'queued': True, 'position': position, 'running': get_status()['running']})
+
+    def log_message(self, format, *args): pass # 요청 로그는 위에서 직접 출력
+
+def start_trigger_server(host=TRIGGER_HOST, port=TRIGGER_PORT):
+    server = ThreadingHTTPServer((host, port), _TriggerHandler)
+    threading.Thread(target=server.serve_forever, name='trigger-server', daemon=True).start()
+    print(f"✅ [데몬] 수동 실행 요청 수신 대기: http://{host}:{port} (/run, /status)")
+    return server
+
+def request_run(steps=None, force=False, full_rebuild=False, source='trigger', timeout=5):
+    """실행 중인 데몬에 파이프라인 실행 요청. 반환: (성공 여부, 메시지)"""
+    try: response = requests.post(f"{TRIGGER_URL}/run", json={'steps': steps, 'force': force, 'full_rebuild': full_rebuild, 'source': source}, timeout=timeout)
+    except requests.exceptions.RequestException as e: return False, f"데몬에 연결할 수 없습니다 ({TRIGGER_URL}): {e}"
+    try: data = response.json()
+    except ValueError: return False, f"데몬 응답 오류 (HTTP {response.status_code})"
+    if response.status_code != 202: return False, f"요청 거부: {data.get('error', response.status_code)}"
+    running = f", 실행 중: {data['running']}" if data.get('running') else ''
+    return True, f"실행 요청 접수 (단계: {', '.join(steps) if steps else '전체'}, 대기열 {data.get('position')}번째{running})"
+
+def request_status(timeout=5):
+    """실행 중인 데몬 상태 조회. 반환: 상태 딕셔너리 (연결 실패 시 None)"""
+    try: return requests.get(f"{TRIGGER_URL}/status", timeout=timeout).json()
+    except (requests.exceptions.RequestException, ValueError) as e: print(f"❌ 데몬 상태 조회 실패: {e}"); return None
+# --- ---
+
+# --- 데몬 실행 ---
+def _job_due(job, now, last_run_dates):
+    if last_run_dates.get(job['name']) == now.date(): return False
+    if job.get('business_days_only', True) and not is_krx_business_day(now.date()): return False
+    return now.strftime('%H:%M') >= job['time']
+
+def run_daemon():
+    with _status_lock: _status['started_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"🚀 스케줄러 데몬 시작 ({_status['started_at']}, 예약: {[(job['name'], job['time']) for job in DAILY_JOBS]})")
+    warm_up()
+    server = start_trigger_server()
+    worker = threading.Thread(target=_worker, name='job-worker', daemon=True); worker.start()
+    import telegram_utils
+    telegram_utils.send_telegram_message(f"✅ `{SCRIPT_NAME}` 시작됨 ({_status['started_at']})")
+    last_run_dates = {} # {작업 이름: 마지막 예약 실행 날짜}
+    next_token_check = time.time() + TOKEN_CHECK_INTERVAL_SECONDS; next_mirror_sync = time.time() + MIRROR_SYNC_INTERVAL_SECONDS
+    try:
+        while not _stop_event.is_set():
+            now = datetime.now()
+            for job in DAILY_JOBS:
+                if _job_due(job, now, last_run_dates):
+                    last_run_dates[job['name']] = now.date()
+                    enqueue('pipeline', f"예약: {job['name']}", steps=job.get('steps')); print(f"⏰ [데몬] 예약 작업 '{job['name']}' 시작 ({now.strftime('%Y-%m-%d %H:%M')})")
+            if time.time() >= next_token_check: enqueue('tokens', '주기 확인'); next_token_check = time.time() + TOKEN_CHECK_INTERVAL_SECONDS
+            if time.time() >= next_mirror_sync: enqueue('mirror', '주기 동기화'); next_mirror_sync = time.time() + MIRROR_SYNC_INTERVAL_SECONDS
+            _stop_event.wait(POLL_INTERVAL_SECONDS)
+    except KeyboardInterrupt: print("\nℹ️ [데몬] 종료 요청 (Ctrl+C)")
+    finally:
+        _stop_event.set(); server.shutdown()
+        telegram_utils.send_telegram_message(f"ℹ️ `{SCRIPT_NAME}` 종료됨 ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+
+if __name__ == '__main__':
+    if '--status' in sys.argv:
+        print(json.dumps(request_status(), ensure_ascii=False, indent=4)); sys.exit(0)
+    if '--trigger' in sys.argv:
+        only_arg = next((arg.split('=', 1)[1] for arg in sys.argv if arg.startswith('--only=')), '')
+        ok, message = request_run([name.strip() for name in only_arg.split(',') if name.strip()] or None, force='--force' in sys.argv, full_rebuild='--full-rebuild' in sys.argv, source='명령줄')
+        print(f"{'✅' if ok else '❌'} {message}"); sys.exit(0 if ok else 1)
+    run_daemon()
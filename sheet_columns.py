@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# sheet_columns.py: 여러 탭의 필요한 열만 골라 한 번에 읽는 공용 리더
+# - [(탭, ['A', 'B:C', 'E']), ...] 형태로 탭별 열 범위를 받아 values_batch_get 1회로 요청 (넓은 수익률 시트의 안 쓰는 열 전송 생략)
+# - 탭별 DataFrame 반환: 컬럼 이름은 열 문자('A', 'B', ...), 1행(헤더)은 df.attrs['header'] = {열 문자: 헤더 이름}
+# - 로컬 미러(sheet_mirror.py) 사용 시 미러 값에서 같은 열만 잘라 반환 (미러에 없는 탭만 시트에서 읽음)
+# - typed=True: 원시 값(UNFORMATTED_VALUE + 날짜 일련번호)으로 읽기
+
+import traceback
+import pandas as pd
+import gspread
+from gspread.utils import absolute_range_name, column_letter_to_index, rowcol_to_a1
+import sheets_client
+
+try:
+    import sheet_mirror
+except ModuleNotFoundError:
+    sheet_mirror = None
+
+# --- 열 문자 유틸리티 ---
+def column_letter(col_idx):
+    """0부터 시작하는 열 인덱스 → 열 문자 (0 → 'A', 26 → 'AA')"""
+    return rowcol_to_a1(1, col_idx + 1)[:-1]
+
+def expand_columns(col_specs):
+    """['A', 'B:C', 'E'] → ['A', 'B', 'C', 'E'] (범위 펼치기, 순서 유지)"""
+    letters = []
+    for spec in col_specs:
+        first, _, last = str(spec).upper().partition(':')
+        start = column_letter_to_index(first); end = column_letter_to_index(last or first)
+        letters.extend(column_letter(i - 1) for i in range(start, end + 1))
+    return list(dict.fromkeys(letters))
+
+def _blocks(col_specs):
+    """열 범위 목록 → [(시작 열 문자, 끝 열 문자, 열 수)]"""
+    blocks = []
+    for spec in col_specs:
+        first, _, last = str(spec).upper().partition(':'); last = last or first
+        blocks.append((first, last, column_letter_to_index(last) - column_letter_to_index(first) + 1))
+    return blocks
+# --- ---
+
+# --- 프레임 생성 ---
+def _frame_from_columns(columns, letters, header=True):
+    """열별 값 리스트 {열 문자: [값, ...]} → DataFrame (행 수 맞춤, 빈 셀 '')"""
+    row_count = max((len(values) for values in columns.values()), default=0)
+    data = {letter: list(columns.get(letter, [])) + [''] * (row_count - len(columns.get(letter, []))) for letter in letters}
+    df = pd.DataFrame(data, columns=letters)
+    header_names = {}
+    if header and row_count > 0:
+        header_names = {letter: str(df.at[0, letter]).strip() for letter in letters}
+        df = df.iloc[1:].reset_index(drop=True)
+    df.attrs['header'] = header_names
+    return df
+
+def _frame_from_rows(values, letters, header=True):
+    """get_all_values() 형태의 전체 행 → 지정 열만 잘라 DataFrame"""
+    indices = {letter: column_letter_to_index(letter) - 1 for letter in letters}
+    columns = {letter: [row[idx] if idx < len(row) else '' for row in values] for letter, idx in indices.items()}
+    return _frame_from_columns(columns, letters, header)
+
+def _frame_from_blocks(value_ranges, blocks, letters, header=True):
+    """열 범위별 valueRange 응답 → 하나의 DataFrame (범위마다 뒤쪽 빈 행/셀이 잘려 오므로 길이 맞춤)"""
+    columns = {}
+    for (first, _, width), value_range in zip(blocks, value_ranges):
+        rows = value_range.get('values', []); start_idx = column_letter_to_index(first) - 1
+        for offset in range(width):
+            columns[column_letter(start_idx + offset)] = [row[offset] if offset < len(row) else '' for row in rows]
+    return _frame_from_columns(columns, letters, header)
+
+def header_column(df, name):
+    """헤더 이름 → 열 문자 (없으면 None)"""
+    for letter, header_name in df.attrs.get('header', {}).items():
+        if header_name == name: return letter
+    return None
+# --- ---
+
+def read_columns(spreadsheet, specs, typed=False, use_mirror=True, header=True):
+    """
+    여러 탭의 지정 열을 읽어 {탭: DataFrame}으로 반환합니다.
+    specs: [(탭 이름, ['A', 'B:C', 'E']), ...]
+    미러에 없는 탭들은 values_batch_get 1회로 함께 읽습니다. 읽지 못한 탭은 빈 DataFrame (attrs['missing'] = True).
+    """
+    frames = {}; remote = []
+    if use_mirror and sheet_mirror is not None: sheet_mirror.ensure_synced(spreadsheet, [tab for tab, _ in specs], typed=typed) # 요청 탭들을 한 번에 동기화
+    for tab, col_specs in specs:
+        letters = expand_columns(col_specs)
+        if use_mirror and sheet_mirror is not None:
+            values = sheet_mirror.get_values(spreadsheet, tab, typed=typed)
+            if values is not None: frames[tab] = _frame_from_rows(values, letters, header); continue
+        remote.append((tab, _blocks(col_specs), letters))
+    if not remote: return frames
+
+    params = sheets_client.TYPED_READ_PARAMS if typed else None
+    ranges = [absolute_range_name(tab, f"{first}:{last}") for tab, blocks, _ in remote for first, last, _ in blocks]
+    try:
+        value_ranges = spreadsheet.values_batch_get(ranges, params=params).get('valueRanges', [])
+        position = 0
+        for tab, blocks, letters in remote:
+            frames[tab] = _frame_from_blocks(value_ranges[position:position + len(blocks)], blocks, letters, header); position += len(blocks)
+    except gspread.exceptions.APIError as e_api:
+        # 없는 탭이 섞여 있으면 요청 전체가 실패하므로 탭별로 다시 읽음
+        print(f"⚠️ [열 읽기] 일괄 읽기 실패 → 탭별 재시도: {e_api}")
+        for tab, blocks, letters in remote:
+            try:
+                tab_ranges = [absolute_range_name(tab, f"{first}:{last}") for first, last, _ in blocks]
+                frames[tab] = _frame_from_blocks(spreadsheet.values_batch_get(tab_ranges, params=params).get('valueRanges', []), blocks, letters, header)
+            except gspread.exceptions.APIError as e_tab:
+                print(f"❌ [열 읽기] '{tab}' 읽기 실패: {e_tab}")
+                frames[tab] = pd.DataFrame(columns=letters); frames[tab].attrs['missing'] = True
+            except Exception as e: print(f"❌ [열 읽기] '{tab}' 처리 중 오류: {e}"); traceback.print_exc(); frames[tab] = pd.DataFrame(columns=letters); frames[tab].attrs['missing'] = True
+    return frames
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# sheet_decode.py: 구글 시트 / 증권사 API 값 공용 변환 모듈 (숫자 / 날짜)
+# - 쉼표 구분 숫자, '-' 부호, '%' 값, '#N/A' 등 시트 오류 값을 같은 규칙으로 숫자로 변환
+# - 날짜는 형식 추론 없이 정해진 형식만 인식: YYYY-MM-DD, YYYY/MM/DD, YYYY.MM.DD (한 자리 월/일, 시각 포함 가능), YYYYMMDD
+# - 컬럼(Series) 단위 함수는 문자열 벡터 연산으로 한 번에 변환 (.apply / 행 루프 없음)
+# - 단일 값 함수 clean_num_str은 API 응답 필드 등 개별 값 변환용 (컬럼 변환과 동일 규칙)
+# - 원시 값 읽기(UNFORMATTED_VALUE + SERIAL_NUMBER) 결과의 숫자는 문자열 처리 없이 그대로, 날짜 일련번호는 바로 datetime64로 변환
+
+import re
+import numpy as np
+import pandas as pd
+
+# --- 변환 규칙 ---
+NON_NUMERIC_PATTERN = r'[^\d.\-]' # 숫자 / 소수점 / 부호 외 문자 제거 (쉼표, 공백, %, 통화 기호 등)
+ERROR_PREFIX = '#' # 시트 오류 값 (#N/A, #VALUE!, #REF!, #DIV/0! ...)
+DATE_PATTERN = r'^\s*(?P<year>\d{4})\s*[-./]\s*(?P<month>\d{1,2})\s*[-./]\s*(?P<day>\d{1,2})' # 2024-03-28 / 2024/3/28 / 2024. 3. 28
+COMPACT_DATE_PATTERN = r'^\s*(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})\s*$' # 20240328 (증권사 API)
+SHEETS_EPOCH = pd.Timestamp('1899-12-30') # 구글 시트 날짜 일련번호 기준일 (일련번호 = 기준일로부터의 일수)
+MAX_DATE_SERIAL = 2958465 # 9999-12-31 (이보다 큰 숫자는 일련번호가 아닌 값으로 취급)
+NUMBER_TYPES = (int, float, np.int64, np.float64, np.int32, np.float32) # 원시 값 읽기에서 숫자로 오는 값의 타입
+# --- ---
+
+_non_numeric_re = re.compile(NON_NUMERIC_PATTERN)
+
+def _number_mask(series):
+    """값이 이미 숫자(원시 값 읽기 결과)인 위치 (bool 제외)"""
+    return series.map(type).isin(NUMBER_TYPES)
+
+def _cast(number, type_func):
+    return int(number) if type_func is int else type_func(number)
+
+def clean_num_str(value, type_func=int, default=0):
+    """
+    단일 값을 숫자로 변환합니다. (예: '1,234' → 1234, '-00050' → -50, '12.5%' → 12.5, '#N/A' / '' / '-' → default)
+    int 변환 시 소수점 이하는 버립니다.
+    """
+    if value is None: return _cast(default, type_func)
+    if isinstance(value, (int, float, np.number)):
+        return _cast(default, type_func) if pd.isna(value) else _cast(value, type_func)
+    text = str(value).strip()
+    if not text or text.startswith(ERROR_PREFIX): return _cast(default, type_func)
+    try: return _cast(float(_non_numeric_re.sub('', text)), type_func)
+    except (ValueError, TypeError): return _cast(default, type_func)
+
+def to_numeric_series(values, type_func=float, default=0, percent_as_ratio=False):
+    """
+    컬럼(Series/리스트)을 숫자 Series로 일괄 변환합니다. 규칙은 clean_num_str과 동일합니다.
+    percent_as_ratio=True 이면 '%'로 끝나는 값을 100으로 나눈 비율로 변환합니다 ('12.5%' → 0.125).
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series): numbers = series.astype('float64')
+    else:
+        is_number = _number_mask(series)
+        numbers = pd.to_numeric(series.where(is_number), errors='coerce').astype('float64') # 원시 값 숫자는 그대로 사용
+        if not is_number.all(): # 표시 문자열만 정리 후 변환
+            text = series.where(~is_number & series.notna(), '').astype(str).str.strip()
+            is_error = text.str.startswith(ERROR_PREFIX)
+            parsed = pd.to_numeric(text.str.replace(NON_NUMERIC_PATTERN, '', regex=True).where(~is_error), errors='coerce')
+            if percent_as_ratio: parsed = parsed.where(~text.str.endswith('%'), parsed / 100.0)
+            numbers = numbers.where(is_number, parsed)
+    numbers = numbers.fillna(default)
+    return numbers.astype('int64') if type_func is int else numbers.astype('float64')
+
+def serial_to_datetime(values):
+    """구글 시트 날짜 일련번호(1899-12-30 기준 일수, 소수부 = 시각) → 날짜(datetime64) Series. 범위 밖 값은 NaT"""
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').astype('float64')
+    numbers = numbers.where((numbers >= 1) & (numbers <= MAX_DATE_SERIAL))
+    return SHEETS_EPOCH + pd.to_timedelta(np.floor(numbers), unit='D')
+
+def to_date_series(values):
+    """
+    컬럼(Series/리스트)을 날짜(datetime64) Series로 일괄 변환합니다. 인식하지 못한 값은 NaT.
+    숫자 값은 구글 시트 날짜 일련번호로 변환하고(원시 값 읽기), 문자열은 정해진 형식만 인식합니다.
+    시각이 포함된 값('2024-03-28 15:30:00', 소수부 일련번호)은 날짜 부분만 사용합니다.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.tz_localize(None) if getattr(series.dt, 'tz', None) is not None else series
+        return series.dt.normalize()
+    is_number = pd.Series(True, index=series.index) if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) else _number_mask(series)
+    numbers = pd.to_numeric(series.where(is_number), errors='coerce').astype('float64')
+    is_serial = numbers.between(1, MAX_DATE_SERIAL)
+    dates = serial_to_datetime(numbers.where(is_serial)).astype('datetime64[ns]')
+    if is_serial.all(): return dates
+    # 문자열 (및 일련번호 범위 밖 숫자: 20240328 등) → 정해진 형식으로 변환
+    text = series.where(~is_number & series.notna(), '').astype(str)
+    large_numbers = is_number & ~is_serial & numbers.notna()
+    if large_numbers.any(): text = text.where(~large_numbers, numbers.round().astype('Int64').astype(str))
+    parts = text.str.extract(DATE_PATTERN)
+    parts = parts.fillna(text.str.extract(COMPACT_DATE_PATTERN))
+    parsed = pd.to_datetime(parts.astype('float64'), errors='coerce').astype('datetime64[ns]')
+    return dates.where(is_serial, parsed)
+
+def to_date(value):
+    """단일 값을 Timestamp로 변환 (to_date_series와 동일 규칙, 실패 시 NaT)"""
+    return to_date_series([value]).iloc[0]
+
+def decode_columns(df, int_cols=(), float_cols=(), date_cols=(), default=0):
+    """DataFrame의 지정 컬럼들을 정수 / 실수 / 날짜로 변환한 복사본 반환 (없는 컬럼은 무시)"""
+    decoded = df.copy()
+    for col in int_cols:
+        if col in decoded.columns: decoded[col] = to_numeric_series(decoded[col], int, default)
+    for col in float_cols:
+        if col in decoded.columns: decoded[col] = to_numeric_series(decoded[col], float, default)
+    for col in date_cols:
+        if col in decoded.columns: decoded[col] = to_date_series(decoded[col])
+    return decoded
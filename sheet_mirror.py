@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# sheet_mirror.py: 구글 스프레드시트 탭들의 로컬 SQLite 미러 (증분 행 동기화)
+# - 요청된 탭만 동기화. 탭별로 마지막 동기화 때의 스프레드시트 수정 시각을 기록하여, 그 뒤 수정되지 않은 탭은 값 읽기 생략
+# - 끝부분 읽기 탭(Raw 탭, 수익률 시트): 마지막 동기화 행 수 이후의 행만 범위로 읽음
+#   (최근 몇 행은 재확인하여 다르면 전체 재동기화, 스프레드시트가 수정된 경우에 한해 일주일 1회 전체 읽기)
+# - 그 외 탭 (설정 / 배당일지 / 매매일지 등 임의 위치가 수정되는 탭): 전체 읽기 후 내용 해시가 바뀐 탭만 미러 교체
+# - 동기화할 탭들의 값 읽기는 values_batch_get 1회로 묶어서 요청 (서식 값 / 원시 값 읽기 방식별 1회)
+# - 동기화한 탭 목록은 DB(mirror_tabs)에 남아 단독 실행 / 데몬의 전체 동기화 대상에 포함됨
+# - typed=True 읽기: UNFORMATTED_VALUE + 날짜 일련번호(SERIAL_NUMBER)로 받은 원시 값을 별도로 미러 (숫자는 숫자 그대로)
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import traceback
+from datetime import datetime
+import gspread
+from gspread.utils import absolute_range_name, numericise_all
+
+# --- 설정 ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MIRROR_DB_PATH = os.path.join(CURRENT_DIR, 'sheet_mirror.sqlite3')
+GOOGLE_SHEET_NAME = 'KYI_자산배분'
+# 끝부분 읽기 탭 {탭 이름: 매 동기화 시 다시 읽어 확인할 최근 행 수}
+# - Raw 탭: 스크립트가 행을 추가만 함
+# - 수익률 시트: 날짜별 행 추가. 과거 입금/평가액을 고치면 누적 수식 때문에 마지막 행 값도 바뀌므로 재확인 구간에서 감지됨
+TAIL_READ_TABS = {'일별잔고_Raw': 3, '일별비중_Raw': 3, '매매일지_Raw': 3,
+                  '📈ISA 수익률': 5, '📈IRP 수익률': 5, '📈연금 수익률': 5, '📈금현물 수익률': 5}
+# 임의 위치가 수정될 수 있는 탭 (요청 시 전체 읽기 후 내용 해시 비교하여 교체)
+FULL_REFRESH_TABS = ['⚙️설정', '🗓️배당일지', '🗓️매매일지']
+FULL_SYNC_INTERVAL_SECONDS = 7 * 24 * 60 * 60 # 끝부분 읽기 탭도 이 간격마다 전체 읽기 (재확인 구간 밖의 수정 반영, 스프레드시트가 수정된 경우만)
+DEFAULT_MAX_AGE_SECONDS = 60 # 같은 프로세스 내 재동기화 최소 간격
+TYPED_READ_PARAMS = {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'SERIAL_NUMBER'} # 원시 값 읽기 옵션
+TYPED_KEY_SUFFIX = '::typed' # 원시 값 미러의 탭 키 접미사 (예: '일별잔고_Raw::typed')
+# --- ---
+
+_sync_lock = threading.Lock()
+_last_sync_times = {} # {(스프레드시트 ID, 탭 키): 같은 프로세스에서 마지막으로 동기화(확인)한 시각(epoch)}
+
+# --- DB 유틸리티 ---
+def _connect_db():
+    conn = sqlite3.connect(MIRROR_DB_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS mirror_rows (sheet_id TEXT, tab TEXT, row_no INTEGER, row_json TEXT, PRIMARY KEY (sheet_id, tab, row_no))")
+    conn.execute("CREATE TABLE IF NOT EXISTS mirror_tabs (sheet_id TEXT, tab TEXT, row_count INTEGER, content_hash TEXT, synced_at TEXT, PRIMARY KEY (sheet_id, tab))")
+    conn.execute("CREATE TABLE IF NOT EXISTS mirror_meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+def _hash_rows(rows):
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _mirror_tabs(conn, sheet_id):
+    """전체 동기화 대상 탭 키 목록 (설정된 탭 + 이전에 요청되어 미러에 있는 탭 / 원시 값 탭 키)"""
+    mirrored = [r[0] for r in conn.execute("SELECT tab FROM mirror_tabs WHERE sheet_id=? ORDER BY tab", (sheet_id,))]
+    return list(dict.fromkeys(list(TAIL_READ_TABS) + FULL_REFRESH_TABS + mirrored))
+
+def _typed_key(tab):
+    return tab + TYPED_KEY_SUFFIX
+
+def _tab_keys(tabs, typed=False):
+    return [_typed_key(tab) if typed else tab for tab in tabs]
+
+def _split_key(tab_key):
+    """탭 키 → (실제 탭 이름, 원시 값 여부)"""
+    if tab_key.endswith(TYPED_KEY_SUFFIX): return tab_key[:-len(TYPED_KEY_SUFFIX)], True
+    return tab_key, False
+
+def _batch_get(spreadsheet, plans):
+    """읽기 계획 [(탭 키, 시작 행, 범위)]을 읽기 방식별 values_batch_get 1회씩으로 읽어 계획 순서의 valueRanges 반환"""
+    value_ranges = [None] * len(plans)
+    for typed in (False, True):
+        indices = [i for i, plan in enumerate(plans) if _split_key(plan[0])[1] == typed]
+        if not indices: continue
+        response = spreadsheet.values_batch_get([plans[i][2] for i in indices], params=TYPED_READ_PARAMS if typed else None)
+        for i, value_range in zip(indices, response.get('valueRanges', [])): value_ranges[i] = value_range
+    return [value_range or {} for value_range in value_ranges]
+
+def _get_tab_state(conn, sheet_id, tab):
+    row = conn.execute("SELECT row_count, content_hash FROM mirror_tabs WHERE sheet_id=? AND tab=?", (sheet_id, tab)).fetchone()
+    return {'row_count': row[0], 'content_hash': row[1]} if row else None
+
+def _read_rows(conn, sheet_id, tab, start_row=1):
+    cursor = conn.execute("SELECT row_json FROM mirror_rows WHERE sheet_id=? AND tab=? AND row_no>=? ORDER BY row_no", (sheet_id, tab, start_row))
+    return [json.loads(r[0]) for r in cursor]
+
+def _write_rows(conn, sheet_id, tab, start_row, rows):
+    """start_row 이후 행을 rows로 교체하고 탭 상태(행 수, 해시) 갱신"""
+    conn.execute("DELETE FROM mirror_rows WHERE sheet_id=? AND tab=? AND row_no>=?", (sheet_id, tab, start_row))
+    conn.executemany("INSERT INTO mirror_rows (sheet_id, tab, row_no, row_json) VALUES (?, ?, ?, ?)",
+                     [(sheet_id, tab, start_row + i, json.dumps(row, ensure_ascii=False)) for i, row in enumerate(rows)])
+    row_count = start_row - 1 + len(rows)
+    content_hash = _hash_rows(_read_rows(conn, sheet_id, tab))
+    conn.execute("INSERT OR REPLACE INTO mirror_tabs (sheet_id, tab, row_count, content_hash, synced_at) VALUES (?, ?, ?, ?, ?)",
+                 (sheet_id, tab, row_count, content_hash, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    return row_count
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM mirror_meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO mirror_meta (key, value) VALUES (?, ?)", (key, value))
+
+def _full_sync_due(conn, sheet_id, tab):
+    """끝부분 읽기 탭의 마지막 전체 읽기 후 FULL_SYNC_INTERVAL_SECONDS가 지났는지 여부"""
+    last_full_sync = _get_meta(conn, f"{sheet_id}:{tab}:full_synced_at")
+    return last_full_sync is None or time.time() - float(last_full_sync) >= FULL_SYNC_INTERVAL_SECONDS
+# --- ---
+
+# --- 동기화 ---
+def _get_last_update_time(spreadsheet):
+    """스프레드시트 최종 수정 시각 (Drive 메타데이터). 확인 불가 시 None"""
+    try:
+        getter = getattr(spreadsheet, 'get_lastUpdateTime', None)
+        return getter() if callable(getter) else spreadsheet.lastUpdateTime
+    except Exception as e: print(f"⚠️ [미러] 스프레드시트 수정 시각 확인 실패: {e}"); return None
+
+def sync_mirror(spreadsheet, tabs=None, force_full=False):
+    """
+    미러 동기화. tabs: 탭 키 목록 (None이면 설정된 탭 + 미러에 있는 모든 탭).
+    반환: {탭 키: 'unchanged' | 'appended:N' | 'refreshed' | 'missing' | 'error'} (연결 실패 시 None)
+    """
+    sheet_id = spreadsheet.id; results = {}
+    with _sync_lock:
+        conn = _connect_db()
+        try:
+            tabs = list(dict.fromkeys(tabs)) if tabs else _mirror_tabs(conn, sheet_id)
+            # 0. 탭별로 마지막 동기화 이후 스프레드시트가 수정되지 않았으면 읽기 생략 (미러에 없는 탭은 항상 읽음)
+            modified_time = _get_last_update_time(spreadsheet)
+            stale = [tab for tab in tabs if force_full or not modified_time or not _get_tab_state(conn, sheet_id, tab)
+                     or _get_meta(conn, f"{sheet_id}:{tab}:modified_time") != modified_time]
+            results = {tab: 'unchanged' for tab in tabs if tab not in stale}
+            if not stale:
+                print(f"ℹ️ [미러] 스프레드시트 변경 없음 ({modified_time}). 동기화 생략.")
+                _last_sync_times.update({(sheet_id, tab): time.time() for tab in tabs})
+                return results
+
+            # 1. 워크시트 목록 (행 수 확인용, 메타데이터 1회 조회)
+            worksheets = {ws.title: ws for ws in spreadsheet.worksheets()}
+
+            # 2. 탭별 읽기 범위 결정 (끝부분 읽기 탭은 재확인 행부터 끝까지, 전체 읽기 주기가 됐으면 전체)
+            plans = []; full_read = set()
+            for tab in stale:
+                tab_name = _split_key(tab)[0]
+                if tab_name not in worksheets:
+                    state = _get_tab_state(conn, sheet_id, tab)
+                    if not state or state['row_count'] >= 0: print(f"⚠️ [미러] 워크시트 '{tab_name}' 없음.")
+                    results[tab] = 'missing' # 행 수 -1로 기록 (없는 탭도 '동기화됨'으로 취급)
+                    conn.execute("DELETE FROM mirror_rows WHERE sheet_id=? AND tab=?", (sheet_id, tab))
+                    conn.execute("INSERT OR REPLACE INTO mirror_tabs (sheet_id, tab, row_count, content_hash, synced_at) VALUES (?, ?, -1, '', ?)", (sheet_id, tab, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                    continue
+                state = _get_tab_state(conn, sheet_id, tab); grid_rows = worksheets[tab_name].row_count
+                if tab_name in TAIL_READ_TABS and state and state['row_count'] > 0 and not force_full and not _full_sync_due(conn, sheet_id, tab) and grid_rows >= state['row_count']:
+                    start_row = max(1, state['row_count'] - max(1, TAIL_READ_TABS[tab_name]) + 1)
+                    plans.append((tab, start_row, absolute_range_name(tab_name, f"{start_row}:{grid_rows}")))
+                else: plans.append((tab, 1, absolute_range_name(tab_name))); full_read.add(tab)
+
+            # 3. 값 읽기 (읽기 방식별 1회 요청) 및 반영
+            retry_full = []
+            if plans:
+                value_ranges = _batch_get(spreadsheet, plans)
+                for (tab, start_row, _), value_range in zip(plans, value_ranges):
+                    rows = value_range.get('values', [])
+                    try:
+                        if start_row == 1:
+                            state = _get_tab_state(conn, sheet_id, tab)
+                            if state and state['content_hash'] == _hash_rows(rows) and state['row_count'] == len(rows): results[tab] = 'unchanged'
+                            else: _write_rows(conn, sheet_id, tab, 1, rows); results[tab] = 'refreshed'
+                            continue
+                        # 재확인 구간 검증: 재확인 행 중 하나라도 미러와 다르거나 행이 줄었으면 전체 재동기화
+                        state = _get_tab_state(conn, sheet_id, tab); recheck_count = state['row_count'] - start_row + 1
+                        mirrored_recheck = _read_rows(conn, sheet_id, tab, start_row)
+                        if len(rows) < recheck_count or rows[:recheck_count] != mirrored_recheck:
+                            print(f"⚠️ [미러] '{tab}' 기존 행 변경/삭제 감지 → 전체 재동기화"); retry_full.append(tab); continue
+                        new_count = len(rows) - recheck_count
+                        if new_count == 0: results[tab] = 'unchanged'; continue
+                        _write_rows(conn, sheet_id, tab, start_row, rows); results[tab] = f"appended:{new_count}"
+                    except Exception as e_tab: print(f"❌ [미러] '{tab}' 반영 중 오류: {e_tab}"); traceback.print_exc(); results[tab] = 'error'
+            if retry_full:
+                retry_plans = [(tab, 1, absolute_range_name(_split_key(tab)[0])) for tab in retry_full]
+                for tab, value_range in zip(retry_full, _batch_get(spreadsheet, retry_plans)):
+                    _write_rows(conn, sheet_id, tab, 1, value_range.get('values', [])); results[tab] = 'refreshed'
+                full_read.update(retry_full)
+
+            # 4. 오류 없이 동기화한 탭만 수정 시각 / 전체 읽기 시각 기록
+            for tab in stale:
+                if results.get(tab) == 'error': continue
+                if modified_time: _set_meta(conn, f"{sheet_id}:{tab}:modified_time", modified_time)
+                if tab in full_read: _set_meta(conn, f"{sheet_id}:{tab}:full_synced_at", str(time.time()))
+            conn.commit()
+            _last_sync_times.update({(sheet_id, tab): time.time() for tab in tabs if results.get(tab) != 'error'})
+            changed = {tab: status for tab, status in results.items() if status not in ('unchanged', 'missing')}
+            print(f"✅ [미러] 동기화 완료 (변경: {changed if changed else '없음'})")
+            return results
+        except gspread.exceptions.APIError as e_api: conn.rollback(); print(f"❌ [미러] 동기화 중 API 오류: {e_api}"); return None
+        except Exception as e: conn.rollback(); print(f"❌ [미러] 동기화 중 오류: {e}"); traceback.print_exc(); return None
+        finally: conn.close()
+
+def ensure_synced(spreadsheet, tabs=None, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, typed=False):
+    """
+    요청한 탭(None이면 전체 동기화 대상)을 동기화합니다. 같은 프로세스에서 max_age_seconds 이내에 확인한 탭은 생략.
+    여러 탭을 한 번에 넘기면 values_batch_get 1회로 함께 동기화합니다. 반환: {탭 키: 상태} (실패 시 None)
+    """
+    if tabs is None: return sync_mirror(spreadsheet)
+    keys = _tab_keys(tabs, typed); now = time.time()
+    due = [key for key in keys if now - _last_sync_times.get((spreadsheet.id, key), float('-inf')) >= max_age_seconds]
+    results = {key: 'unchanged' for key in keys if key not in due}
+    if not due: return results
+    synced = sync_mirror(spreadsheet, due)
+    if synced is None: return None
+    results.update(synced); return results
+
+def invalidate(spreadsheet=None):
+    """같은 프로세스의 다음 읽기 때 다시 동기화하도록 표시 (시트에 쓴 뒤 호출). spreadsheet=None 이면 전체"""
+    if spreadsheet is None: _last_sync_times.clear(); return
+    for key in [key for key in _last_sync_times if key[0] == spreadsheet.id]: _last_sync_times.pop(key, None)
+# --- ---
+
+# --- 읽기 (get_all_values / get_all_records 대체) ---
+def get_values(spreadsheet, tab, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, typed=False):
+    """
+    미러에서 탭 전체 값을 get_all_values()와 같은 형태(행 길이 맞춤)로 반환합니다.
+    typed=True 이면 원시 값(숫자는 int/float, 날짜는 일련번호)을 반환합니다 (빈 셀은 '').
+    동기화 실패 또는 미러에 없는 탭이면 None (호출 측에서 시트 직접 읽기로 대체)
+    """
+    tab_key = _typed_key(tab) if typed else tab
+    synced = ensure_synced(spreadsheet, [tab], max_age_seconds, typed=typed)
+    if synced is None or synced.get(tab_key) == 'error': return None
+    conn = _connect_db()
+    try:
+        state = _get_tab_state(conn, spreadsheet.id, tab_key)
+        if not state or state['row_count'] < 0: return None
+        rows = _read_rows(conn, spreadsheet.id, tab_key)
+    finally: conn.close()
+    width = max((len(row) for row in rows), default=0)
+    return [row + [''] * (width - len(row)) for row in rows]
+
+def get_records(spreadsheet, tab, max_age_seconds=DEFAULT_MAX_AGE_SECONDS, typed=False):
+    """미러에서 탭을 get_all_records()와 같은 형태(첫 행 헤더, 숫자 문자열 변환)로 반환. typed=True 이면 원시 값 그대로. 실패 시 None"""
+    values = get_values(spreadsheet, tab, max_age_seconds, typed=typed)
+    if values is None: return None
+    if not values: return []
+    header = [str(h) for h in values[0]]
+    if typed: return [dict(zip(header, row)) for row in values[1:]]
+    return [dict(zip(header, numericise_all(row))) for row in values[1:]]
+# --- ---
+
+# --- 단독 실행: 미러 동기화 ---
+if __name__ == '__main__':
+    import sheets_client
+    try: spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME)
+    except Exception as e: print(f"❌ 구글 시트 연결 실패: {e}"); sys.exit(1)
+    sync_results = sync_mirror(spreadsheet, force_full='--full' in sys.argv)
+    if sync_results is None: sys.exit(1)
+    for tab_name, status in sync_results.items(): print(f"  - {tab_name}: {status}")
@@ -3,14 +3,16 @@
 # (Version 2.2: Yahoo Finance 종가 조회 오류 수정 - .item() 사용)
 
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_client
+from sheet_write_buffer import SheetWriteBuffer
+from sheet_decode import clean_num_str, to_numeric_series # 시트 값 숫자 변환 공용 규칙
+import price_cache # Yahoo Finance 로컬 가격 저장소 (증분 갱신)
 import pandas as pd
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import time
 import traceback # 오류 추적 정보 출력을 위해 임포트
 import os
 import sys
-import re
 
 # 공휴일 처리
 try:
@@ -67,32 +69,10 @@ SCRIPT_NAME = os.path.basename(__file__)
 # --- ---
 
 # --- 유틸리티 함수 ---
-def clean_num_str(num_str, type_func=int):
-    """숫자 문자열 정리 및 변환"""
-    if isinstance(num_str, (int, float)): return num_str
-    if not num_str: return type_func(0)
-    try:
-        cleaned_str = re.sub(r'[^\d.-]', '', str(num_str))
-        if not cleaned_str or cleaned_str == '.': return type_func(0)
-        is_negative = cleaned_str.startswith('-')
-        numeric_part = cleaned_str.lstrip('-')
-        if not numeric_part: return type_func(0)
-        value = float(numeric_part)
-        value_final = type_func(value)
-        return -value_final if is_negative else value_final
-    except (ValueError, TypeError):
-        return type_func(0)
-
 def connect_google_sheets():
-    """구글 시트 연결 객체 반환"""
+    """구글 시트 연결 객체 반환 (공용 클라이언트 sheets_client 사용)"""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        if not os.path.exists(JSON_KEYFILE_PATH):
-             raise FileNotFoundError(f"서비스 계정 키 파일을 찾을 수 없습니다: {JSON_KEYFILE_PATH}")
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials)
-        print("✅ Google Sheets API 인증 성공.")
-        return gc
+        return sheets_client.get_client()
     except FileNotFoundError as e: print(f"❌ 오류: {e}"); return None
     except Exception as e: print(f"❌ 구글 시트 연결 오류: {e}"); traceback.print_exc(); return None
 
@@ -111,14 +91,14 @@ def is_market_open(check_date):
 # --- ---
 
 # --- 시트 작업 함수 ---
-def append_date_if_market_open(worksheet, target_date):
-    """워크시트 A열에 개장일인 경우 오늘 날짜를 추가 (중복 제외)하고 행 번호 반환"""
+def append_date_if_market_open(worksheet, target_date, write_buffer):
+    """워크시트 A열에 개장일인 경우 오늘 날짜 추가를 예약 (중복 제외)하고 (성공 여부, 행 번호, 예약 범위) 반환"""
     target_date_str = target_date.strftime('%Y-%m-%d')
     print(f"  > '{worksheet.title}' 시트 확인 (대상 날짜: {target_date_str})...")
 
     if not is_market_open(target_date):
         print(f"    - 정보: {target_date_str}은(는) 휴장일입니다. 날짜를 추가하지 않습니다.")
-        return False, -1
+        return False, -1, None
 
     try:
         date_col_values = worksheet.col_values(DATE_COLUMN_INDEX)
@@ -132,19 +112,19 @@ def append_date_if_market_open(worksheet, target_date):
 
         if date_exists:
             print(f"    - 정보: {target_date_str} 날짜가 이미 '{worksheet.title}' 시트 {row_number}행에 존재합니다.")
-            return True, row_number
+            return True, row_number, None
 
         next_row = len(date_col_values) + 1
-        worksheet.update_acell(f'A{next_row}', target_date_str)
-        print(f"    ✅ {target_date_str} 날짜를 '{worksheet.title}' 시트 A{next_row}에 추가했습니다.")
-        return True, next_row
+        pending_range = write_buffer.update_cell(worksheet, f'A{next_row}', target_date_str)
+        print(f"    - {target_date_str} 날짜를 '{worksheet.title}' 시트 A{next_row}에 추가 예약.")
+        return True, next_row, pending_range
     except gspread.exceptions.APIError as e_api:
          print(f"    ❌ API 오류 ('{worksheet.title}' 시트 날짜 추가 중): {e_api}")
-         return False, -1
+         return False, -1, None
     except Exception as e:
         print(f"    ❌ 오류 ('{worksheet.title}' 시트 날짜 추가 중): {e}")
         traceback.print_exc()
-        return False, -1
+        return False, -1, None
 
 def get_gold_price_from_settings(settings_ws):
     """설정 시트 J9 셀에서 금 가격을 읽어 숫자로 반환"""
@@ -173,7 +153,7 @@ def calculate_current_gold_quantity(trades_ws):
         if not all(h in trades_df.columns for h in required_headers): missing = [h for h in required_headers if h not in trades_df.columns]; print(f"    ❌ 오류: '{TRADES_SHEET}' 시트에 필수 헤더 누락: {missing}"); return 0.0
         gold_trades = trades_df[trades_df[TRADE_CODE_HEADER].astype(str).str.strip().str.upper() == GOLD_TRADE_CODE].copy()
         if gold_trades.empty: print(f"    - 정보: '{GOLD_TRADE_CODE}' 관련 거래 내역 없음."); return 0.0
-        gold_trades['Quantity'] = gold_trades[TRADE_QTY_HEADER].apply(lambda x: clean_num_str(x, float))
+        gold_trades['Quantity'] = to_numeric_series(gold_trades[TRADE_QTY_HEADER], float)
         buy_qty = gold_trades.loc[gold_trades[TRADE_TYPE_HEADER] == '매수', 'Quantity'].sum()
         sell_qty = gold_trades.loc[gold_trades[TRADE_TYPE_HEADER] == '매도', 'Quantity'].sum()
         total_quantity = buy_qty - sell_qty
@@ -183,104 +163,63 @@ def calculate_current_gold_quantity(trades_ws):
     except KeyError as e: print(f"    ❌ 오류: '{TRADES_SHEET}' 시트 처리 중 컬럼 '{e}' 없음."); return 0.0
     except Exception as e: print(f"    ❌ 오류 ('{TRADES_SHEET}' 시트 금 수량 계산 중): {e}"); traceback.print_exc(); return 0.0
 
-def update_gold_sheet_columns(gold_ws, row_number, gold_price, gold_qty):
-    """금현물 수익률 시트의 지정 행 E열(평가액)과 J열(금가격) 업데이트"""
-    print(f"  > '{GOLD_RATE_SHEET}' 시트 업데이트 시도 (행: {row_number})...")
-    update_success = True
+def update_gold_sheet_columns(write_buffer, gold_ws, row_number, gold_price, gold_qty):
+    """금현물 수익률 시트의 지정 행 E열(평가액)과 J열(금가격) 업데이트 예약. (입력 유효 여부, 예약 범위 목록) 반환"""
+    print(f"  > '{GOLD_RATE_SHEET}' 시트 업데이트 예약 (행: {row_number})...")
+    update_success = True; pending_ranges = []
     # E열: 총 평가액 업데이트
     if gold_price > 0 and gold_qty is not None:
-        total_gold_value = gold_price * gold_qty
+        total_gold_value = float(gold_price * gold_qty)
         print(f"    - 계산된 총 평가액: {total_gold_value:,.0f} 원 (가격: {gold_price:.2f}, 수량: {gold_qty:.2f})")
-        try:
-            gold_ws.update_acell(f'{GOLD_VALUE_COLUMN_LETTER}{row_number}', total_gold_value)
-            print(f"    ✅ {row_number}행 {GOLD_VALUE_COLUMN_LETTER}열(평가액) 업데이트 완료.")
-        except Exception as e:
-            print(f"    ❌ 오류 ({GOLD_VALUE_COLUMN_LETTER}열 업데이트 중): {e}")
-            traceback.print_exc(); update_success = False
+        pending_ranges.append(write_buffer.update_cell(gold_ws, f'{GOLD_VALUE_COLUMN_LETTER}{row_number}', total_gold_value))
     else:
         print(f"    - 정보: 유효한 금 가격({gold_price}) 또는 수량({gold_qty})이 없어 {GOLD_VALUE_COLUMN_LETTER}열 업데이트 불가.")
         update_success = False
 
     # J열: 금 1g당 가격 업데이트
     if gold_price > 0:
-        try:
-            gold_price_to_write = round(gold_price, 2)
-            gold_ws.update_acell(f'{GOLD_PRICE_COLUMN_LETTER}{row_number}', gold_price_to_write)
-            print(f"    ✅ {row_number}행 {GOLD_PRICE_COLUMN_LETTER}열(금가격) 업데이트 완료 ({gold_price_to_write}).")
-        except Exception as e:
-            print(f"    ❌ 오류 ({GOLD_PRICE_COLUMN_LETTER}열 업데이트 중): {e}")
-            traceback.print_exc(); update_success = False
+        gold_price_to_write = round(gold_price, 2)
+        pending_ranges.append(write_buffer.update_cell(gold_ws, f'{GOLD_PRICE_COLUMN_LETTER}{row_number}', gold_price_to_write))
+        print(f"    - {row_number}행 {GOLD_PRICE_COLUMN_LETTER}열(금가격) 업데이트 예약 ({gold_price_to_write}).")
     else:
         print(f"    - 정보: 유효한 금 가격({gold_price})이 없어 {GOLD_PRICE_COLUMN_LETTER}열 업데이트 불가.")
         update_success = False
 
-    return update_success
+    return update_success, pending_ranges
 
-def get_yahoo_finance_closing_price(ticker, target_date):
-    """Yahoo Finance에서 특정 티커의 target_date 종가 가져오기"""
-    if not yf: return 0.0
+def get_yahoo_finance_closing_prices(tickers, target_date):
+    """Yahoo Finance에서 여러 티커의 target_date 종가를 한 번에 가져오기. 반환: {티커: 종가 (실패 시 0.0)}"""
+    if not yf: return {ticker: 0.0 for ticker in tickers}
 
-    print(f"    > Yahoo Finance에서 {ticker} 종가 조회 (기준일: {target_date})...")
+    print(f"    > Yahoo Finance에서 {', '.join(tickers)} 종가 조회 (기준일: {target_date})...")
     try:
-        start_dt = target_date - timedelta(days=3)
-        end_dt = target_date + timedelta(days=1)
-        data = yf.download(ticker, start=start_dt, end=end_dt, progress=False, auto_adjust=True)
-
-        if data.empty:
-            print(f"      - 정보: {ticker} 데이터 없음 ({start_dt} ~ {end_dt}).")
-            return 0.0
-
-        data = data.sort_index()
-        filtered_data = data[data.index.date <= target_date]
-
-        if filtered_data.empty:
-             print(f"      - 정보: {ticker} 데이터 중 {target_date} 이전 데이터 없음.")
-             return 0.0
-
-        last_valid_close_series = filtered_data['Close'].dropna()
-        if last_valid_close_series.empty:
-            print(f"      - 정보: {ticker}의 {target_date} 이전 유효한 종가 없음.")
-            return 0.0
-
-        # --- 수정된 부분: .item() 사용 ---
-        last_close_series_element = last_valid_close_series.iloc[-1]
-        # 스칼라 값 추출
-        last_close_scalar = last_close_series_element.item()
-        # ------------------------------
-
-        last_close_date = last_valid_close_series.index[-1].date()
-
-        # 수정된 스칼라 값으로 출력 및 반환
-        print(f"      ✅ {ticker} 종가 확인: {last_close_scalar:,.2f} ({last_close_date})")
-        return float(last_close_scalar)
+        # 로컬 가격 저장소 경유: 이미 받아 둔 날짜는 다시 받지 않고, 부족한 구간은 티커 전체를 1회 요청으로 받음
+        last_closes = price_cache.get_last_closes(tickers, target_date, lookback_days=3)
+        closes = {}
+        for ticker in tickers:
+            last_close, last_close_date = last_closes.get(ticker, (None, None))
+            if last_close is None:
+                print(f"      - 정보: {ticker}의 {target_date} 이전 유효한 종가 없음.")
+                closes[ticker] = 0.0; continue
+            print(f"      ✅ {ticker} 종가 확인: {last_close:,.2f} ({last_close_date})")
+            closes[ticker] = last_close
+        return closes
 
     except Exception as e:
-        print(f"      ❌ 오류 (Yahoo Finance {ticker} 조회 중): {e}")
-        import traceback
+        print(f"      ❌ 오류 (Yahoo Finance {', '.join(tickers)} 조회 중): {e}")
         traceback.print_exc() # 전체 스택 트레이스 출력
-        return 0.0
-
-def update_irp_stock_prices(irp_ws, row_number, sp500_price, nasdaq_price):
-    """IRP 수익률 시트의 지정 행 O, P열에 종가 업데이트"""
-    print(f"  > '{IRP_RATE_SHEET}' 시트 업데이트 시도 (행: {row_number})...")
-    update_success = True
-    try:
-        sp500_to_write = float(sp500_price) if sp500_price is not None else 0.0
-        irp_ws.update_acell(f'{IRP_SP500_PRICE_COLUMN_LETTER}{row_number}', sp500_to_write)
-        print(f"    ✅ {row_number}행 {IRP_SP500_PRICE_COLUMN_LETTER}열(S&P500 TR) 업데이트 완료 ({sp500_to_write:.2f}).")
-    except Exception as e:
-        print(f"    ❌ 오류 ({IRP_SP500_PRICE_COLUMN_LETTER}열 업데이트 중): {e}")
-        traceback.print_exc(); update_success = False
-
-    try:
-        nasdaq_to_write = float(nasdaq_price) if nasdaq_price is not None else 0.0
-        irp_ws.update_acell(f'{IRP_NASDAQ_PRICE_COLUMN_LETTER}{row_number}', nasdaq_to_write)
-        print(f"    ✅ {row_number}행 {IRP_NASDAQ_PRICE_COLUMN_LETTER}열(Nasdaq TR) 업데이트 완료 ({nasdaq_to_write:.2f}).")
-    except Exception as e:
-        print(f"    ❌ 오류 ({IRP_NASDAQ_PRICE_COLUMN_LETTER}열 업데이트 중): {e}")
-        traceback.print_exc(); update_success = False
-
-    return update_success
+        return {ticker: 0.0 for ticker in tickers}
+
+def update_irp_stock_prices(write_buffer, irp_ws, row_number, sp500_price, nasdaq_price):
+    """IRP 수익률 시트의 지정 행 O, P열에 종가 업데이트 예약. 예약 범위 목록 반환"""
+    print(f"  > '{IRP_RATE_SHEET}' 시트 업데이트 예약 (행: {row_number})...")
+    sp500_to_write = float(sp500_price) if sp500_price is not None else 0.0
+    nasdaq_to_write = float(nasdaq_price) if nasdaq_price is not None else 0.0
+    pending_ranges = [
+        write_buffer.update_cell(irp_ws, f'{IRP_SP500_PRICE_COLUMN_LETTER}{row_number}', sp500_to_write),
+        write_buffer.update_cell(irp_ws, f'{IRP_NASDAQ_PRICE_COLUMN_LETTER}{row_number}', nasdaq_to_write)]
+    print(f"    - {row_number}행 {IRP_SP500_PRICE_COLUMN_LETTER}열(S&P500 TR: {sp500_to_write:.2f}), {IRP_NASDAQ_PRICE_COLUMN_LETTER}열(Nasdaq TR: {nasdaq_to_write:.2f}) 업데이트 예약.")
+    return pending_ranges
 
 # --- 메인 실행 로직 ---
 def main():
@@ -293,24 +232,27 @@ def main():
     if not gc: raise ConnectionError("🔥 구글 시트 연결 실패! 프로그램을 종료합니다.")
 
     try:
-        spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-        rate_worksheets = {name: spreadsheet.worksheet(name) for name in RATE_SHEET_NAMES}
-        settings_ws = spreadsheet.worksheet(SETTINGS_SHEET)
-        trades_ws = spreadsheet.worksheet(TRADES_SHEET)
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=gc)
+        rate_worksheets = {name: sheets_client.get_worksheet(name) for name in RATE_SHEET_NAMES} # 워크시트 목록 1회 조회
+        settings_ws = sheets_client.get_worksheet(SETTINGS_SHEET)
+        trades_ws = sheets_client.get_worksheet(TRADES_SHEET)
         print(f"✅ 필요한 워크시트 ({', '.join(RATE_SHEET_NAMES)}, {SETTINGS_SHEET}, {TRADES_SHEET}) 열기 성공.")
     except gspread.exceptions.WorksheetNotFound as e: raise ValueError(f"🔥 필수 워크시트 '{e.args[0]}'를 찾을 수 없습니다!") from e
     except Exception as e: raise ConnectionError(f"🔥 워크시트 열기 중 오류 발생: {e}") from e
 
     today_date = datetime.now().date()
     is_today_open = is_market_open(today_date)
-    target_row_numbers = {}
+    target_row_numbers = {}; date_pending_ranges = {} # {시트 이름: 날짜 추가 예약 범위}
+    write_buffer = SheetWriteBuffer() # 모든 시트 쓰기는 마지막에 1회 일괄 전송
+    task_pending_ranges = [] # [(작업 이름, 입력 유효 여부, 성공 판단에 필요한 예약 범위 목록)]
 
     if is_today_open:
         print(f"\n[날짜 추가] 오늘은 개장일({today_date.strftime('%Y-%m-%d')})입니다. 수익률 시트에 날짜 추가 시도...")
         for name, ws in rate_worksheets.items():
-            success, row_num = append_date_if_market_open(ws, today_date)
+            success, row_num, pending_range = append_date_if_market_open(ws, today_date, write_buffer)
             if success and row_num > 0:
                 target_row_numbers[name] = row_num
+                if pending_range: date_pending_ranges[name] = pending_range
             # 날짜 추가 실패는 후속 작업에서 처리됨 (target_row_numbers에 없으므로)
     else:
         print(f"\n[날짜 추가] 오늘은 휴장일({today_date.strftime('%Y-%m-%d')})입니다. 날짜 추가 작업을 건너<0xEB><0x81><0x91니다.")
@@ -322,8 +264,9 @@ def main():
     if gold_price > 0 and is_today_open and GOLD_RATE_SHEET in target_row_numbers:
         gold_row_num = target_row_numbers[GOLD_RATE_SHEET]
         gold_quantity = calculate_current_gold_quantity(trades_ws)
-        if update_gold_sheet_columns(rate_worksheets[GOLD_RATE_SHEET], gold_row_num, gold_price, gold_quantity):
-            tasks_succeeded += 1
+        inputs_valid, gold_ranges = update_gold_sheet_columns(write_buffer, rate_worksheets[GOLD_RATE_SHEET], gold_row_num, gold_price, gold_quantity)
+        date_range = [date_pending_ranges[GOLD_RATE_SHEET]] if GOLD_RATE_SHEET in date_pending_ranges else []
+        task_pending_ranges.append(('금 현물', inputs_valid, date_range + gold_ranges))
     else:
          if gold_price <= 0: print(f"  - 실패: 유효한 금 가격 읽지 못함.")
          elif not is_today_open: print(f"  - 정보: 휴장일이므로 업데이트 건너<0xEB><0x81><0x91.")
@@ -337,20 +280,26 @@ def main():
     elif is_today_open and IRP_RATE_SHEET in target_row_numbers:
         tasks_attempted += 1 # IRP 종가 업데이트 시도
         irp_row_num = target_row_numbers[IRP_RATE_SHEET]
-        sp500_close = get_yahoo_finance_closing_price(IRP_TICKER_SP500, today_date)
-        time.sleep(0.5)
-        nasdaq_close = get_yahoo_finance_closing_price(IRP_TICKER_NASDAQ, today_date)
-        time.sleep(0.5)
+        irp_closes = get_yahoo_finance_closing_prices([IRP_TICKER_SP500, IRP_TICKER_NASDAQ], today_date)
+        sp500_close = irp_closes[IRP_TICKER_SP500]; nasdaq_close = irp_closes[IRP_TICKER_NASDAQ]
 
         if sp500_close > 0 and nasdaq_close > 0:
-            if update_irp_stock_prices(rate_worksheets[IRP_RATE_SHEET], irp_row_num, sp500_close, nasdaq_close):
-                 tasks_succeeded += 1
+            irp_ranges = update_irp_stock_prices(write_buffer, rate_worksheets[IRP_RATE_SHEET], irp_row_num, sp500_close, nasdaq_close)
+            date_range = [date_pending_ranges[IRP_RATE_SHEET]] if IRP_RATE_SHEET in date_pending_ranges else []
+            task_pending_ranges.append(('IRP 종가', True, date_range + irp_ranges))
         else:
              print(f"  - 실패: S&P500({sp500_close:.2f}) 또는 Nasdaq({nasdaq_close:.2f}) 종가 조회 실패.")
     else:
          if not is_today_open: print(f"  - 정보: 휴장일이므로 업데이트 건너<0xEB><0x81><0x91.")
          elif IRP_RATE_SHEET not in target_row_numbers: print(f"  - 실패: '{IRP_RATE_SHEET}' 시트에 오늘 날짜 행 번호 없음.")
 
+    # 예약된 시트 쓰기 일괄 전송 (스프레드시트당 values_batch_update 1회)
+    print(f"\n[시트 쓰기] 예약된 {write_buffer.pending_count()}개 범위 일괄 전송...")
+    write_results = write_buffer.flush()
+    for range_name, ok in write_results.items(): print(f"  {'✅' if ok else '❌'} {range_name}")
+    for task_name, inputs_valid, ranges in task_pending_ranges:
+        if inputs_valid and write_buffer.succeeded(*ranges): tasks_succeeded += 1
+        else: print(f"  - 실패: {task_name} 시트 업데이트 실패.")
 
     # 최종 결과 요약
     elapsed_time = time.time() - start_time
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# sheet_write_buffer.py: 구글 시트 쓰기 버퍼 (write-behind)
+# - 실행 중 발생하는 셀/범위 쓰기를 모아 두었다가 flush() 시 스프레드시트당 values_batch_update 1회로 전송
+# - 범위별 결과(성공 여부)를 돌려주어 호출 측에서 작업별 성공/실패를 그대로 판단 가능
+
+import traceback
+import gspread
+from gspread.utils import absolute_range_name
+
+class SheetWriteBuffer:
+    """셀/범위 쓰기를 모아 스프레드시트당 1회의 values_batch_update로 전송하는 버퍼"""
+
+    def __init__(self, value_input_option='USER_ENTERED'):
+        self.value_input_option = value_input_option # update_acell 기본값과 동일 (날짜/수식 해석)
+        self._pending = {} # {스프레드시트 키: (Spreadsheet, [(범위, 값 2차원 리스트), ...])}
+        self.results = {} # {범위: True/False} (flush 결과 누적)
+
+    def update_range(self, worksheet, range_a1, values):
+        """범위 쓰기 예약. 결과 조회용 범위 이름('시트'!A1:B2) 반환"""
+        range_name = absolute_range_name(worksheet.title, range_a1)
+        spreadsheet = worksheet.spreadsheet
+        _, writes = self._pending.setdefault(spreadsheet.id, (spreadsheet, []))
+        writes.append((range_name, values))
+        return range_name
+
+    def update_cell(self, worksheet, cell_a1, value):
+        """단일 셀 쓰기 예약 (update_acell 대체). 결과 조회용 범위 이름 반환"""
+        return self.update_range(worksheet, cell_a1, [[value]])
+
+    def pending_count(self):
+        return sum(len(writes) for _, writes in self._pending.values())
+
+    def flush(self):
+        """예약된 쓰기를 스프레드시트별 1회 호출로 전송하고 {범위: 성공 여부} 반환 (이번 flush 분)"""
+        flush_results = {}
+        for spreadsheet_id, (spreadsheet, writes) in list(self._pending.items()):
+            if not writes: continue
+            body = {'valueInputOption': self.value_input_option, 'data': [{'range': r, 'values': v} for r, v in writes]}
+            try:
+                response = spreadsheet.values_batch_update(body=body)
+                responses = response.get('responses', []) if isinstance(response, dict) else []
+                for i, (range_name, _) in enumerate(writes):
+                    # 응답은 요청 순서와 동일. 응답 누락 시 전체 호출 성공 기준으로 처리
+                    flush_results[range_name] = (i >= len(responses)) or bool(responses[i].get('updatedCells', 1))
+                print(f"  ✅ [쓰기 버퍼] '{spreadsheet.title}' {len(writes)}개 범위 일괄 업데이트 완료 (API 1회).")
+            except gspread.exceptions.APIError as e_api:
+                print(f"  ❌ [쓰기 버퍼] '{spreadsheet.title}' 일괄 업데이트 API 오류: {e_api}")
+                for range_name, _ in writes: flush_results[range_name] = False
+            except Exception as e:
+                print(f"  ❌ [쓰기 버퍼] '{spreadsheet.title}' 일괄 업데이트 오류: {e}"); traceback.print_exc()
+                for range_name, _ in writes: flush_results[range_name] = False
+            del self._pending[spreadsheet_id]
+        self.results.update(flush_results)
+        return flush_results
+
+    def succeeded(self, *range_names):
+        """주어진 범위가 모두 flush 성공했는지 여부"""
+        return bool(range_names) and all(self.results.get(r, False) for r in range_names)
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# sheets_client.py: 구글 시트 공용 클라이언트 (프로세스 단위 캐시)
+# - 서비스 계정 인증 정보 / gspread 클라이언트를 프로세스당 1회만 생성
+# - 스프레드시트는 최초 1회 이름으로 찾은 뒤 키(ID)로 보관 (키는 파일에도 저장하여 다음 실행 시 Drive 검색 생략)
+# - 워크시트 핸들은 메타데이터 1회 조회로 한꺼번에 캐시
+# - HTTP 연결 풀(requests.Session)을 공유하여 재연결 비용 감소
+# - 원시 값 읽기(UNFORMATTED_VALUE + 날짜 일련번호): 숫자를 표시 서식(쉼표, %, 지역 설정)과 무관하게 숫자 그대로 받음
+
+import os
+import json
+import threading
+import traceback
+import gspread
+from gspread.utils import ValueRenderOption, DateTimeOption
+from requests.adapters import HTTPAdapter
+from oauth2client.service_account import ServiceAccountCredentials
+
+# --- 설정 ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+GOOGLE_SHEET_NAME = 'KYI_자산배분'
+JSON_KEYFILE_PATH = os.path.join(CURRENT_DIR, 'stock-auto-writer-44eaa06c140c.json')
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_KEYS_PATH = os.path.join(CURRENT_DIR, 'spreadsheet_keys.json') # {스프레드시트 이름: 키}
+HTTP_POOL_CONNECTIONS = 4; HTTP_POOL_MAXSIZE = 16
+TYPED_READ_PARAMS = {'valueRenderOption': ValueRenderOption.unformatted, 'dateTimeRenderOption': DateTimeOption.serial_number} # values_batch_get 원시 값 읽기 옵션
+# --- ---
+
+_lock = threading.RLock()
+_client = None
+_spreadsheets = {} # {키: Spreadsheet}
+_name_to_key = {} # {이름: 키}
+_worksheets = {} # {(키, 워크시트 이름): Worksheet}
+
+# --- 내부 유틸리티 ---
+def _load_saved_keys():
+    try:
+        with open(SPREADSHEET_KEYS_PATH, 'r', encoding='utf-8') as f: return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError): return {}
+    except Exception as e: print(f"⚠️ 스프레드시트 키 파일 읽기 오류: {e}"); return {}
+
+def _save_key(name, key):
+    saved_keys = _load_saved_keys()
+    if saved_keys.get(name) == key: return
+    saved_keys[name] = key
+    try:
+        with open(SPREADSHEET_KEYS_PATH, 'w', encoding='utf-8') as f: json.dump(saved_keys, f, ensure_ascii=False, indent=4)
+    except Exception as e: print(f"⚠️ 스프레드시트 키 파일 저장 오류: {e}")
+
+def _enlarge_connection_pool(client):
+    """클라이언트의 인증 세션(requests.Session) 연결 풀 크기 확장 (여러 스레드에서 공유)"""
+    session = getattr(getattr(client, 'http_client', None), 'session', None) or getattr(client, 'session', None)
+    if session is None: return
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', adapter); session.mount('http://', adapter)
+# --- ---
+
+# --- 클라이언트 / 스프레드시트 / 워크시트 ---
+def get_client(creds_dict=None):
+    """
+    gspread 클라이언트 반환 (프로세스당 1회 인증).
+    creds_dict가 주어지면 해당 정보(예: Streamlit secrets)로, 아니면 서비스 계정 키 파일로 인증합니다.
+    키 파일이 없으면 FileNotFoundError.
+    """
+    global _client
+    with _lock:
+        if _client is not None: return _client
+        if creds_dict is not None: credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
+        else:
+            if not os.path.exists(JSON_KEYFILE_PATH): raise FileNotFoundError(f"서비스 계정 키 파일을 찾을 수 없습니다: {JSON_KEYFILE_PATH}")
+            credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, SCOPE)
+        _client = gspread.authorize(credentials); _enlarge_connection_pool(_client)
+        print("✅ Google Sheets API 인증 성공 (공용 클라이언트).")
+        return _client
+
+def get_spreadsheet(name=GOOGLE_SHEET_NAME, client=None):
+    """
+    스프레드시트 반환. 최초 1회만 이름으로 검색(Drive)하고 이후에는 키로 보관/재사용합니다.
+    저장된 키로 열기에 실패하면 이름으로 다시 찾습니다.
+    """
+    with _lock:
+        key = _name_to_key.get(name)
+        if key and key in _spreadsheets: return _spreadsheets[key]
+        client = client or get_client()
+        spreadsheet = None; saved_key = key or _load_saved_keys().get(name)
+        if saved_key:
+            try: spreadsheet = client.open_by_key(saved_key)
+            except Exception as e: print(f"⚠️ 저장된 키로 스프레드시트 열기 실패 ({e}). 이름으로 다시 찾습니다.")
+        if spreadsheet is None: spreadsheet = client.open(name)
+        _name_to_key[name] = spreadsheet.id; _spreadsheets[spreadsheet.id] = spreadsheet
+        _save_key(name, spreadsheet.id)
+        return spreadsheet
+
+def get_worksheet(title, name=GOOGLE_SHEET_NAME, client=None):
+    """워크시트 핸들 반환 (캐시에 없으면 워크시트 목록을 한 번 새로 읽음). 없으면 WorksheetNotFound"""
+    with _lock:
+        spreadsheet = get_spreadsheet(name, client)
+        cache_key = (spreadsheet.id, title)
+        if cache_key not in _worksheets:
+            for ws in spreadsheet.worksheets(): _worksheets[(spreadsheet.id, ws.title)] = ws
+        if cache_key not in _worksheets: raise gspread.exceptions.WorksheetNotFound(title)
+        return _worksheets[cache_key]
+
+def add_worksheet(title, rows, cols, name=GOOGLE_SHEET_NAME):
+    """워크시트 생성 후 캐시에 등록"""
+    with _lock:
+        spreadsheet = get_spreadsheet(name)
+        worksheet = spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+        _worksheets[(spreadsheet.id, worksheet.title)] = worksheet
+        return worksheet
+
+def get_typed_values(worksheet):
+    """워크시트 전체 원시 값 (숫자는 int/float, 날짜는 일련번호, 빈 셀은 '')"""
+    return worksheet.get_all_values(value_render_option=ValueRenderOption.unformatted, date_time_render_option=DateTimeOption.serial_number)
+
+def get_typed_records(worksheet):
+    """워크시트 레코드를 원시 값으로 반환 (첫 행 헤더, get_all_records 형태)"""
+    values = get_typed_values(worksheet)
+    if not values: return []
+    header = [str(h) for h in values[0]]
+    return [dict(zip(header, row)) for row in values[1:]]
+
+def reset_cache():
+    """캐시 초기화 (시트 구조 변경 후 등)"""
+    global _client
+    with _lock: _client = None; _spreadsheets.clear(); _name_to_key.clear(); _worksheets.clear()
+# --- ---
+
+# --- 단독 실행: 연결 확인 ---
+if __name__ == '__main__':
+    try:
+        spreadsheet = get_spreadsheet()
+        print(f"✅ 스프레드시트 '{spreadsheet.title}' (키: {spreadsheet.id}) 연결 성공.")
+        for ws in spreadsheet.worksheets(): print(f"  - {ws.title} ({ws.row_count}행 x {ws.col_count}열)")
+    except Exception as e: print(f"❌ 구글 시트 연결 실패: {e}"); traceback.print_exc()
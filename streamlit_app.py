@@ -6,14 +6,19 @@ import numpy as np
 import json
 import os
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_client
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 import traceback
-import yfinance as yf
+import price_cache # Yahoo Finance 로컬 가격 저장소 (증분 갱신)
 from collections.abc import Mapping # Secrets 타입 체크 위해 추가
-import re # 숫자 처리 위해 추가
+from sheet_decode import to_numeric_series, to_date_series # 시트 값 숫자·날짜 변환 공용 규칙 (벡터화)
+import cost_basis # 이동평균 평단가 엔진 (벡터화)
+import benchmark_returns # 지수 누적 수익률(TWR) 공용 모듈
+import sheet_columns # 필요한 열만 골라 읽기
+try: import sheet_mirror # 로컬 시트 미러 (없으면 시트 직접 읽기)
+except ImportError: sheet_mirror = None
 
 # --- 기본 설정 ---
 PAGE_TITLE = "포트폴리오 대시보드"
@@ -30,30 +35,28 @@ WEIGHTS_RAW_SHEET = '일별비중_Raw'
 SETTINGS_SHEET = '⚙️설정'
 TRADES_SHEET = '🗓️매매일지'
 GOLD_RATE_SHEET = '📈금현물 수익률' # 금현물 시트 이름 정의
+USE_SHEET_MIRROR = True # True: 로컬 미러(sheet_mirror.py) 동기화 후 읽기, False: 시트 직접 읽기
 
 # --- 지수 티커 설정 ---
 KOSPI_TICKER = "^KS200"
 SP500_TICKER = "^GSPC"
 # --- ---
 
-# --- 유틸리티 함수 ---
-def clean_numeric_value(value, type_func=int):
-    """단일 값을 숫자로 변환 (쉼표 및 타입 처리 개선)"""
-    if isinstance(value, (int, float)):
-        # 이미 숫자 타입이면 원하는 타입으로 변환 시도
-        try: return type_func(value)
-        except (ValueError, TypeError): return type_func(0) # 변환 실패 시 0 반환
-    if not value: return type_func(0)
-    try:
-        # 숫자 및 소수점, 마이너스 부호 관련 문자 외 제거 (정규식 사용)
-        # (주의: 과학적 표기법 'e' 등은 처리 못함)
-        cleaned_str = re.sub(r'[^\d.-]+', '', str(value))
-        if not cleaned_str or cleaned_str in ['-', '.']: return type_func(0)
-        # float으로 먼저 변환 후 최종 타입으로 변환
-        num_val = float(cleaned_str)
-        return type_func(num_val)
-    except (ValueError, TypeError):
-        return type_func(0)
+def read_sheet_values(spreadsheet, sheet_name, typed=False):
+    """시트 전체 값 읽기 (미러 사용 가능 시 미러에서, 아니면 get_all_values). typed=True: 원시 값(숫자/날짜 일련번호)"""
+    if USE_SHEET_MIRROR and sheet_mirror is not None:
+        values = sheet_mirror.get_values(spreadsheet, sheet_name, typed=typed)
+        if values is not None: return values
+    worksheet = sheets_client.get_worksheet(sheet_name, spreadsheet.title)
+    return sheets_client.get_typed_values(worksheet) if typed else worksheet.get_all_values()
+
+def read_sheet_records(spreadsheet, sheet_name, typed=False):
+    """시트 레코드 읽기 (미러 사용 가능 시 미러에서, 아니면 get_all_records). typed=True: 원시 값(숫자/날짜 일련번호)"""
+    if USE_SHEET_MIRROR and sheet_mirror is not None:
+        records = sheet_mirror.get_records(spreadsheet, sheet_name, typed=typed)
+        if records is not None: return records
+    worksheet = sheets_client.get_worksheet(sheet_name, spreadsheet.title)
+    return sheets_client.get_typed_records(worksheet) if typed else worksheet.get_all_records()
 # --- ---
 
 # --- 데이터 로딩 함수들 ---
@@ -83,7 +86,6 @@ def load_gain_loss_data():
 def connect_google_sheets():
     """구글 시트 API에 연결하고 클라이언트 객체를 반환합니다."""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
         if "gcs_credentials" not in st.secrets: st.error("Streamlit Secrets에 'gcs_credentials'가 설정되지 않았습니다..."); return None
         creds_value = st.secrets["gcs_credentials"]; creds_dict = None
         if isinstance(creds_value, Mapping): print("Log: Reading secrets as dictionary-like object."); creds_dict = dict(creds_value)
@@ -95,7 +97,7 @@ def connect_google_sheets():
                 except json.JSONDecodeError as e_escaped: st.error(f"Secrets의 'gcs_credentials' 값 JSON 파싱 오류: {e_escaped}..."); return None
         else: st.error(f"Secrets의 'gcs_credentials' 값 타입 오류..."); return None
         if creds_dict:
-            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope); gc = gspread.authorize(creds)
+            gc = sheets_client.get_client(creds_dict) # 공용 클라이언트 (세션 연결 풀 공유)
             gc.list_spreadsheet_files(); print("Log: Google Sheets 연결 성공"); return gc
         else: st.error("인증 정보(creds_dict)를 준비하지 못했습니다."); return None
     except KeyError as e: st.error(f"Streamlit Secrets 접근 오류: 키 '{e}' 없음..."); return None
@@ -106,16 +108,16 @@ def load_latest_balances(_gc):
     """'일별잔고_Raw' 시트에서 가장 최근 날짜의 계좌별 총자산을 로드합니다."""
     if not isinstance(_gc, gspread.Client): st.error("load_latest_balances: 유효한 Google Sheets 클라이언트 객체(gc)가 아닙니다."); return {}, None
     try:
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME); worksheet = spreadsheet.worksheet(BALANCE_RAW_SHEET)
-        data = worksheet.get_all_records(); latest_date = None # 초기화
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=_gc)
+        data = read_sheet_records(spreadsheet, BALANCE_RAW_SHEET, typed=True); latest_date = None # 초기화 (원시 값: 총자산 숫자, 날짜 일련번호)
         if not data: st.warning(f"'{BALANCE_RAW_SHEET}' 시트 데이터 없음."); return {}, None
-        df = pd.DataFrame(data); df['날짜'] = pd.to_datetime(df['날짜'], errors='coerce')
+        df = pd.DataFrame(data); df['날짜'] = to_date_series(df['날짜'])
         valid_dates = df.dropna(subset=['날짜'])
         if valid_dates.empty: st.warning(f"'{BALANCE_RAW_SHEET}' 유효 날짜 데이터 없음."); return {}, None
         latest_date = valid_dates['날짜'].max() # 날짜 계산 후 할당
         latest_df = df[df['날짜'] == latest_date].copy()
         if '총자산' not in latest_df.columns: st.error(f"'{BALANCE_RAW_SHEET}' 시트에 '총자산' 컬럼 없음."); return {}, latest_date
-        latest_df['총자산_num'] = pd.to_numeric(latest_df['총자산'].astype(str).str.replace(',','', regex=False), errors='coerce')
+        latest_df['총자산_num'] = pd.to_numeric(latest_df['총자산'], errors='coerce') # 원시 값이므로 문자열 정리 불필요
         balances = latest_df.dropna(subset=['총자산_num']).set_index('계좌명')['총자산_num'].to_dict()
         print(f"Log: 최신 잔고 데이터 로드 완료 (날짜: {latest_date.strftime('%Y-%m-%d')})")
         return balances, latest_date
@@ -129,7 +131,7 @@ def load_allocation_data(_gc, latest_data_date):
     settings_df = pd.DataFrame(); target_allocation_map = {}; comparison_df_final = pd.DataFrame(); current_weights_df = pd.DataFrame()
     BASE_TOTAL_ASSET = 80000000 # 목표 금액 계산 기준값 (이 값은 설정 시트에서 읽어오거나 입력받는 것이 더 유연할 수 있습니다)
     try:
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME); settings_ws = spreadsheet.worksheet(SETTINGS_SHEET); settings_values = settings_ws.get_all_values()
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=_gc); settings_values = read_sheet_values(spreadsheet, SETTINGS_SHEET)
         if len(settings_values) > 1:
             header = settings_values[0]
             try:
@@ -170,7 +172,7 @@ def load_allocation_data(_gc, latest_data_date):
         else: print("Log: 설정 시트 데이터 없음.")
 
         # '일별비중_Raw' 시트에서 최신 데이터 가져오기
-        weights_ws = spreadsheet.worksheet(WEIGHTS_RAW_SHEET); weights_data = weights_ws.get_all_records()
+        weights_data = read_sheet_records(spreadsheet, WEIGHTS_RAW_SHEET)
         if not weights_data:
             # 데이터 없을 경우 빈 테이블 또는 목표 비중만 표시
             st.warning("'일별비중_Raw' 시트 데이터 없음."); comparison_df_final = pd.DataFrame(columns=['종합 분류', '현재 비중(%)', '현재 평가액', '목표 비중(%)', '목표 금액', '차이(%)', '현금차이'])
@@ -180,7 +182,7 @@ def load_allocation_data(_gc, latest_data_date):
             return comparison_df_final.round({'차이(%)': 2}), settings_df
 
         # 최신 날짜 데이터 필터링 및 처리
-        weights_df = pd.DataFrame(weights_data); weights_df['날짜'] = pd.to_datetime(weights_df['날짜'], errors='coerce')
+        weights_df = pd.DataFrame(weights_data); weights_df['날짜'] = to_date_series(weights_df['날짜'])
         latest_weights_df = weights_df[weights_df['날짜'] == latest_data_date].copy()
         if latest_weights_df.empty:
              # 최신 날짜 데이터 없을 경우 처리
@@ -249,74 +251,38 @@ def load_allocation_data(_gc, latest_data_date):
     return comparison_df_final[available_final_cols], settings_df
 
 @st.cache_data(ttl=3600)
-def download_yf_data(ticker, start_date, end_date):
-    """Yahoo Finance 데이터 다운로드"""
+def download_yf_closes(tickers, start_date, end_date):
+    """Yahoo Finance 종가 다운로드 (여러 티커 1회 요청). 반환: 날짜 × 티커 종가 DataFrame"""
+    tickers = tuple(tickers)
     try:
-        end_date_adj = pd.to_datetime(end_date) + timedelta(days=1) # 종료일 다음날까지 가져와야 해당일 포함
-        # auto_adjust=True: 수정 종가 사용 및 액면분할 등 자동 조정
-        data = yf.download(ticker, start=start_date, end=end_date_adj, progress=False, auto_adjust=True)
-        if data.empty: st.warning(f"⚠️ {ticker} 데이터 다운로드 실패."); return pd.DataFrame()
-        # 시간대 정보 제거 (naive datetime으로 통일)
-        if isinstance(data.index, pd.DatetimeIndex) and data.index.tz is not None:
-            data.index = data.index.tz_localize(None)
-        return data
-    except Exception as e: st.error(f"{ticker} 데이터 다운로드 중 오류: {e}"); return pd.DataFrame()
-
-@st.cache_data
-def calculate_index_twr(index_df, ticker):
-    """주가 데이터프레임으로 TWR(%) 계산 (수정: yfinance MultiIndex 핸들링 강화)"""
-    if index_df is None or index_df.empty or len(index_df) < 2: return pd.DataFrame()
-
-    # 'Close' 또는 'Adj Close' 컬럼 찾기 (MultiIndex 및 일반 Index 고려)
-    close_col_name = None
-    if isinstance(index_df.columns, pd.MultiIndex):
-        # yfinance가 ('Adj Close', '') 또는 ('Close', '') 처럼 반환하는 경우 확인
-        level_zero = index_df.columns.get_level_values(0)
-        if 'Adj Close' in level_zero: close_col_name = [c for c in index_df.columns if c[0] == 'Adj Close'][0]
-        elif 'Close' in level_zero: close_col_name = [c for c in index_df.columns if c[0] == 'Close'][0]
-    # 일반 컬럼 이름 확인
-    elif 'Adj Close' in index_df.columns: close_col_name = 'Adj Close'
-    elif 'Close' in index_df.columns: close_col_name = 'Close'
-
-    if close_col_name is None:
-        st.warning(f"{ticker} TWR 계산 불가: 종가('Close' 또는 'Adj Close') 컬럼을 찾을 수 없습니다. 컬럼: {index_df.columns}")
-        return pd.DataFrame()
-
-    # 선택된 종가 컬럼만 사용하고 이름 통일
-    df = index_df[[close_col_name]].copy(); df.columns = ['Close']
-    df = df.dropna().astype('float64') # float64로 명시적 변환
-    if not pd.api.types.is_float_dtype(df['Close']) or df.empty: return pd.DataFrame()
-
-    df = df.sort_index()
-    df['StartValue'] = df['Close'].shift(1)
-    df = df.iloc[1:].copy() # 첫 행 (StartValue NaN) 제거
-    if df.empty: return pd.DataFrame()
+        # 로컬 가격 저장소 경유: 저장되지 않은 구간만 다운로드 (수정 종가, 종료일 포함, naive datetime 인덱스)
+        closes = price_cache.get_close_frame(tickers, start_date, end_date)
+        for ticker in tickers:
+            if closes[ticker].dropna().empty: st.warning(f"⚠️ {ticker} 데이터 다운로드 실패.")
+        return closes
+    except Exception as e: st.error(f"{', '.join(tickers)} 데이터 다운로드 중 오류: {e}"); return pd.DataFrame(columns=list(tickers))
+
+def close_column_df(closes, ticker):
+    """날짜 × 티커 종가 프레임에서 한 티커를 'Close' 컬럼 DataFrame으로 추출 (NaN 제외)"""
+    if closes is None or ticker not in closes.columns: return pd.DataFrame(columns=['Close'])
+    return closes[[ticker]].rename(columns={ticker: 'Close'}).dropna(subset=['Close'])
 
-    # TWR 계산 (분모 0 또는 NaN 방지)
-    denominator = df['StartValue'] # TWR은 현금흐름 없으므로 StartValue가 분모
-    df['DailyFactor'] = 1.0 # 기본값 1
-    valid_calc_mask = (denominator.abs() > 1e-9) # 0으로 나누는 것 방지
-    df.loc[valid_calc_mask, 'DailyFactor'] = (df.loc[valid_calc_mask, 'Close'] / denominator.loc[valid_calc_mask])
-
-    # 무한대/NaN 처리 및 이상치 제한 (선택적)
-    df['DailyFactor'] = df['DailyFactor'].replace([np.inf, -np.inf], np.nan).fillna(1.0)
-    df['DailyFactor'] = df['DailyFactor'].clip(lower=0.1, upper=10.0) # 극단적인 일일 변동 제한
-
-    # 누적 수익률 계산
-    df['CumulativeFactor'] = df['DailyFactor'].cumprod()
-    df['TWR'] = (df['CumulativeFactor'] - 1.0) * 100.0
-    return df[['TWR']].reset_index() # 날짜 인덱스를 컬럼으로 변환하여 반환
+@st.cache_data(ttl=3600)
+def calculate_index_twr(tickers, start_date, end_date):
+    """지수들의 TWR(%) 일괄 계산 (benchmark_returns 공용 모듈). 반환: {티커: ['Date', 'TWR'] DataFrame}"""
+    try: return benchmark_returns.get_benchmark_twr(tickers, start_date, end_date)
+    except Exception as e: st.error(f"지수 TWR 계산 중 오류: {e}"); return {ticker: pd.DataFrame() for ticker in tickers}
 
 @st.cache_data(ttl=600)
 def load_current_holdings(_gc, latest_data_date):
     """'일별비중_Raw' 시트에서 현재 보유 종목 목록 로드"""
     if not isinstance(_gc, gspread.Client) or not isinstance(latest_data_date, pd.Timestamp): st.error("load_current_holdings: 유효한 gc 또는 latest_data_date 아님."); return pd.DataFrame(columns=['종목코드', '종목명'])
     try:
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME); weights_ws = spreadsheet.worksheet(WEIGHTS_RAW_SHEET)
-        weights_data = weights_ws.get_all_records(); holdings_df = pd.DataFrame(columns=['종목코드', '종목명']) # 기본값
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=_gc)
+        weights_data = read_sheet_records(spreadsheet, WEIGHTS_RAW_SHEET); holdings_df = pd.DataFrame(columns=['종목코드', '종목명']) # 기본값
         if not weights_data: st.warning(f"'{WEIGHTS_RAW_SHEET}' 시트 데이터 없음."); return holdings_df
 
-        weights_df = pd.DataFrame(weights_data); weights_df['날짜'] = pd.to_datetime(weights_df['날짜'], errors='coerce')
+        weights_df = pd.DataFrame(weights_data); weights_df['날짜'] = to_date_series(weights_df['날짜'])
         latest_weights_df = weights_df[weights_df['날짜'] == latest_data_date].copy()
         if latest_weights_df.empty: st.warning(f"{latest_data_date.strftime('%Y-%m-%d')} 날짜의 비중 데이터 없음."); return holdings_df
 
@@ -344,127 +310,84 @@ def load_current_holdings(_gc, latest_data_date):
     except gspread.exceptions.WorksheetNotFound: st.error(f"워크시트 '{WEIGHTS_RAW_SHEET}'를 찾을 수 없음."); return pd.DataFrame(columns=['종목코드', '종목명'])
     except Exception as e: st.error(f"보유 종목 목록 로딩 중 오류: {e}"); traceback.print_exc(); return pd.DataFrame(columns=['종목코드', '종목명'])
 
-@st.cache_data(ttl=300)
-def calculate_moving_avg_cost(_gc, stock_code):
-    """'🗓️매매일지' 시트에서 이동평균법으로 평단가 계산 (숫자 변환 함수 사용)"""
-    if not isinstance(_gc, gspread.Client): st.error("calculate_moving_avg_cost: 유효한 Google Sheets 클라이언트 객체(gc)가 아닙니다."); return 0.0
-    if not stock_code: return 0.0
+def normalize_trade_code(code):
+    """매매일지/보유 종목 코드 비교용 정규화 ('KRX:'·'A' 제거, 대문자, 공백 제거)"""
+    return str(code).strip().upper().replace('KRX:', '').replace('A','')
 
-    final_avg_cost = 0.0
+@st.cache_data(ttl=600)
+def load_trades_ledger(_gc):
+    """
+    '🗓️매매일지' 시트를 한 번 읽어 타입이 정리된 거래 원장 DataFrame으로 반환합니다.
+    컬럼: Date(datetime), Type(매수/매도), Qty(float), Price(float), Code(원본), CodeKey(정규화 코드). 날짜순 정렬.
+    """
+    empty_ledger = pd.DataFrame(columns=['Date', 'Type', 'Qty', 'Price', 'Code', 'CodeKey'])
+    if not isinstance(_gc, gspread.Client): st.error("load_trades_ledger: 유효한 Google Sheets 클라이언트 객체(gc)가 아닙니다."); return empty_ledger
     TRADE_DATE_HEADER = '날짜'; TRADE_TYPE_HEADER = '매매구분'; TRADE_PRICE_HEADER = '단가'; TRADE_QTY_HEADER = '수량'; TRADE_CODE_HEADER = '종목코드'
-
     try:
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME); trades_ws = spreadsheet.worksheet(TRADES_SHEET)
-        all_trades_records = trades_ws.get_all_records()
-        if not all_trades_records: return final_avg_cost # 데이터 없으면 0 반환
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=_gc)
+        all_trades_records = read_sheet_records(spreadsheet, TRADES_SHEET, typed=True) # 원시 값: 수량/단가 숫자, 날짜 일련번호
+        if not all_trades_records: return empty_ledger
 
         trades_df = pd.DataFrame(all_trades_records)
         # 필수 헤더 확인
         required_trade_headers = [TRADE_DATE_HEADER, TRADE_TYPE_HEADER, TRADE_PRICE_HEADER, TRADE_QTY_HEADER, TRADE_CODE_HEADER]
         missing_trade_headers = [h for h in required_trade_headers if h not in trades_df.columns]
-        if missing_trade_headers: st.error(f"'{TRADES_SHEET}' 필수 헤더 누락: {missing_trade_headers}"); return final_avg_cost
-
-        # 날짜 변환 및 정렬
-        trades_df['Date'] = pd.to_datetime(trades_df[TRADE_DATE_HEADER], errors='coerce')
-        trades_df = trades_df.dropna(subset=['Date']).sort_values(by='Date')
-
-        # 대상 종목 필터링 (코드 형식 정리: 'A' 제거, 대문자, 공백 제거)
-        stock_code_str = str(stock_code).strip().upper().replace('KRX:', '').replace('A','')
-        is_gold = (stock_code_str == 'GOLD')
-        def code_match(row_code):
-            row_code_str = str(row_code).strip().upper().replace('KRX:', '').replace('A','')
-            if is_gold: return row_code_str == 'GOLD'
-            else: return row_code_str == stock_code_str
-        filtered_trades_df = trades_df[trades_df[TRADE_CODE_HEADER].apply(code_match)]
-
-        if filtered_trades_df.empty: return final_avg_cost # 해당 종목 거래 없으면 0 반환
-
-        # 이동평균 계산 (수량, 비용 float 처리)
-        current_qty = 0.0; total_cost = 0.0
-        for index, row in filtered_trades_df.iterrows():
-            row_type = str(row[TRADE_TYPE_HEADER]).strip()
-            try:
-                # clean_numeric_value 사용하여 숫자 변환 (float)
-                qty = clean_numeric_value(row[TRADE_QTY_HEADER], float)
-                price = clean_numeric_value(row[TRADE_PRICE_HEADER], float)
-
-                if row_type == '매수':
-                    if qty > 0 and price >= 0:
-                        cost_of_buy = qty * price
-                        total_cost += cost_of_buy
-                        current_qty += qty
-                elif row_type == '매도':
-                    if qty > 0 and current_qty > 1e-9: # 0에 가까운지 비교
-                        sell_qty = min(qty, current_qty) # 보유 수량 초과 매도 방지
-                        # 매도 시 평균 단가 계산
-                        avg_cost_before_sell = total_cost / current_qty
-                        cost_of_sold = sell_qty * avg_cost_before_sell
-                        total_cost -= cost_of_sold
-                        current_qty -= sell_qty
-                        # 수량이 0에 가까워지면 비용도 0으로 초기화 (부동소수점 오류 방지)
-                        if abs(current_qty) < 1e-9: total_cost = 0.0
-            except Exception as e_row:
-                print(f"Log: Row {index} 처리 중 오류 (이동평균): {e_row}"); continue # 오류 발생 행 건너뛰기
-
-        # 최종 평균 단가 계산
-        if current_qty > 1e-9: final_avg_cost = total_cost / current_qty
-        else: final_avg_cost = 0.0
-
-        print(f"Log: {stock_code} 최종 평단가(이동평균): {final_avg_cost:.2f}")
-    except gspread.exceptions.WorksheetNotFound: st.error(f"워크시트 '{TRADES_SHEET}'를 찾을 수 없음.")
-    except KeyError as e: st.error(f"'{TRADES_SHEET}' 시트 처리 오류: 컬럼 '{e}' 확인 필요.")
-    except Exception as e: st.error(f"평단가(이동평균) 계산 중 오류: {e}"); traceback.print_exc()
-
-    # 금 가격은 소수점 필요할 수 있으므로 float 반환
-    return float(final_avg_cost)
+        if missing_trade_headers: st.error(f"'{TRADES_SHEET}' 필수 헤더 누락: {missing_trade_headers}"); return empty_ledger
+
+        ledger = pd.DataFrame({
+            'Date': to_date_series(trades_df[TRADE_DATE_HEADER]),
+            'Type': trades_df[TRADE_TYPE_HEADER].astype(str).str.strip(),
+            'Qty': to_numeric_series(trades_df[TRADE_QTY_HEADER], float),
+            'Price': to_numeric_series(trades_df[TRADE_PRICE_HEADER], float),
+            'Code': trades_df[TRADE_CODE_HEADER],
+            'CodeKey': trades_df[TRADE_CODE_HEADER].apply(normalize_trade_code)})
+        ledger = ledger.dropna(subset=['Date']).sort_values(by='Date', kind='stable').reset_index(drop=True)
+        print(f"Log: 매매일지 원장 로드 완료 ({len(ledger)}건)")
+        return ledger
+    except gspread.exceptions.WorksheetNotFound: st.error(f"워크시트 '{TRADES_SHEET}'를 찾을 수 없음."); return empty_ledger
+    except Exception as e: st.error(f"매매일지 로딩 중 오류: {e}"); traceback.print_exc(); return empty_ledger
 
-@st.cache_data(ttl=3600)
-def get_first_purchase_date(_gc, stock_code):
-    """'🗓️매매일지' 시트에서 최초 매수일 찾기"""
-    if not isinstance(_gc, gspread.Client): st.error("get_first_purchase_date: 유효한 Google Sheets 클라이언트 객체 아님."); return None
-    if not stock_code: return None
-
-    first_date = None
-    TRADE_DATE_HEADER = '날짜'; TRADE_TYPE_HEADER = '매매구분'; TRADE_CODE_HEADER = '종목코드'
+@st.cache_data(ttl=600)
+def load_trades_summary(_gc):
+    """
+    매매일지 원장에서 종목(정규화 코드)별 평단가(이동평균), 최초 매수일, 보유 수량을 한 번에 계산합니다.
+    반환: DataFrame (index: CodeKey, columns: AvgCost, FirstPurchaseDate, PositionQty)
+    """
+    ledger = load_trades_ledger(_gc)
+    history = load_avg_cost_history(_gc)
+    if history.empty: return pd.DataFrame(columns=['AvgCost', 'FirstPurchaseDate', 'PositionQty'])
+    last_state = history.groupby('CodeKey', sort=False).last() # 종목별 최종 상태 (원장 날짜순)
+    first_purchase = ledger[ledger['Type'] == '매수'].groupby('CodeKey')['Date'].min()
+    summary_df = pd.DataFrame({'AvgCost': last_state['AvgCost'], 'FirstPurchaseDate': first_purchase.reindex(last_state.index), 'PositionQty': last_state['Qty']})
+    print(f"Log: 매매일지 종목별 요약 계산 완료 ({len(summary_df)} 종목)")
+    return summary_df
 
-    try:
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME); trades_ws = spreadsheet.worksheet(TRADES_SHEET)
-        all_trades_records = trades_ws.get_all_records()
-        if not all_trades_records: return None # 데이터 없으면 None
+@st.cache_data(ttl=600)
+def load_avg_cost_history(_gc):
+    """매매일지 원장 전체의 종목별 이동평균 평단가 이력 (거래 행 단위, cost_basis 엔진)"""
+    return cost_basis.compute_avg_cost_history(load_trades_ledger(_gc))
 
-        trades_df = pd.DataFrame(all_trades_records)
-        # 필수 헤더 확인
-        required_trade_headers = [TRADE_DATE_HEADER, TRADE_TYPE_HEADER, TRADE_CODE_HEADER]
-        missing_trade_headers = [h for h in required_trade_headers if h not in trades_df.columns]
-        if missing_trade_headers: st.error(f"'{TRADES_SHEET}' 필수 헤더 누락: {missing_trade_headers}"); return None
-
-        # 날짜 변환 및 유효 데이터 필터링
-        trades_df['Date'] = pd.to_datetime(trades_df[TRADE_DATE_HEADER], errors='coerce')
-        trades_df = trades_df.dropna(subset=['Date'])
-
-        # 대상 종목 필터링 (코드 형식 정리)
-        stock_code_str = str(stock_code).strip().upper().replace('KRX:', '').replace('A','')
-        is_gold = (stock_code_str == 'GOLD')
-        def code_match(row_code):
-            row_code_str = str(row_code).strip().upper().replace('KRX:', '').replace('A','')
-            if is_gold: return row_code_str == 'GOLD'
-            else: return row_code_str == stock_code_str
-
-        # '매수' 거래만 필터링 후 가장 빠른 날짜 찾기
-        purchase_trades_df = trades_df[
-            (trades_df[TRADE_CODE_HEADER].apply(code_match)) &
-            (trades_df[TRADE_TYPE_HEADER] == '매수')
-        ]
-
-        if not purchase_trades_df.empty:
-            first_date = purchase_trades_df['Date'].min()
-            print(f"Log: Success! First purchase date for '{stock_code}': {first_date.strftime('%Y-%m-%d')}")
-        else:
-            print(f"Log: Failed to find valid purchase date for '{stock_code}'.")
+def get_avg_cost_series(_gc, stock_code):
+    """종목의 날짜별 평단가 시리즈 (index: 날짜, 당일 마지막 거래 기준). 거래 없으면 빈 Series"""
+    history = load_avg_cost_history(_gc)
+    if history.empty: return pd.Series(dtype=float)
+    stock_history = history[history['CodeKey'] == normalize_trade_code(stock_code)]
+    return cost_basis.daily_avg_cost_history(stock_history).set_index('Date')['AvgCost']
 
-    except gspread.exceptions.WorksheetNotFound: st.error(f"워크시트 '{TRADES_SHEET}'를 찾을 수 없음.")
-    except Exception as e: st.error(f"최초 매수일 조회 중 오류: {e}"); traceback.print_exc()
+def calculate_moving_avg_cost(_gc, stock_code):
+    """종목 평단가(이동평균) 조회 (캐시된 매매일지 요약 사용, 시트 재조회 없음)"""
+    if not stock_code: return 0.0
+    summary_df = load_trades_summary(_gc); code_key = normalize_trade_code(stock_code)
+    final_avg_cost = float(summary_df.at[code_key, 'AvgCost']) if code_key in summary_df.index else 0.0
+    print(f"Log: {stock_code} 최종 평단가(이동평균): {final_avg_cost:.2f}")
+    return final_avg_cost
 
+def get_first_purchase_date(_gc, stock_code):
+    """종목 최초 매수일 조회 (캐시된 매매일지 요약 사용, 시트 재조회 없음)"""
+    if not stock_code: return None
+    summary_df = load_trades_summary(_gc); code_key = normalize_trade_code(stock_code)
+    first_date = summary_df.at[code_key, 'FirstPurchaseDate'] if code_key in summary_df.index else None
+    if first_date is None or pd.isna(first_date): print(f"Log: Failed to find valid purchase date for '{stock_code}'."); return None
     return first_date
 
 def get_yf_ticker(stock_code):
@@ -494,35 +417,23 @@ def load_gold_price_data(_gc):
 
     try:
         print(f"Log: Loading gold price data from '{GOLD_RATE_SHEET}'...")
-        spreadsheet = _gc.open(GOOGLE_SHEET_NAME)
-        worksheet = spreadsheet.worksheet(GOLD_RATE_SHEET)
+        spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=_gc)
 
-        # A열과 J열 데이터 가져오기 (get_all_values가 더 효율적일 수 있음)
-        data = worksheet.get_all_values()
-        if len(data) < 2: # 헤더만 있거나 비어있는 경우
+        # A열과 J열만 가져오기 (로컬 미러 또는 values_batch_get, 원시 값: 금가격 숫자, 날짜 일련번호)
+        date_col, price_col = sheet_columns.column_letter(DATE_COL-1), sheet_columns.column_letter(PRICE_COL-1)
+        raw_df = sheet_columns.read_columns(spreadsheet, [(GOLD_RATE_SHEET, [date_col, price_col])], typed=True, use_mirror=USE_SHEET_MIRROR)[GOLD_RATE_SHEET]
+        if raw_df.attrs.get('missing'): st.error(f"워크시트 '{GOLD_RATE_SHEET}'를 읽을 수 없습니다."); return pd.DataFrame()
+        if raw_df.empty: # 헤더만 있거나 비어있는 경우
             st.warning(f"'{GOLD_RATE_SHEET}' 시트에 데이터가 부족합니다 (헤더 제외).")
             return pd.DataFrame()
 
-        header = data[0]; records = data[1:]
-        dates = []; prices = []
-        expected_price_header = header[PRICE_COL-1] if len(header) >= PRICE_COL else f'Column_{PRICE_COL}'
-
-        for i, row in enumerate(records):
-            if len(row) >= PRICE_COL: # 행 길이 확인
-                date_str = row[DATE_COL-1]; price_str = row[PRICE_COL-1]
-                dt_obj = pd.to_datetime(date_str, errors='coerce') # 날짜 변환 시도
-
-                if pd.notna(dt_obj):
-                    dates.append(dt_obj)
-                    # 가격 숫자 변환 (소수점 유지 위해 float)
-                    prices.append(clean_numeric_value(price_str, float))
-                #else: # 파싱 실패 로그는 생략 (너무 많을 수 있음)
-                    #pass
+        # 컬럼 단위로 일괄 변환 (날짜 변환 실패 행 제외)
+        df = pd.DataFrame({'Date': to_date_series(raw_df[date_col]), 'Close': to_numeric_series(raw_df[price_col], float)}) # yfinance와 컬럼명 통일 위해 'Close' 사용
+        df = df.dropna(subset=['Date'])
 
-        if not dates: st.warning(f"'{GOLD_RATE_SHEET}' 시트에서 유효한 날짜 데이터를 찾지 못했습니다."); return pd.DataFrame()
+        if df.empty: st.warning(f"'{GOLD_RATE_SHEET}' 시트에서 유효한 날짜 데이터를 찾지 못했습니다."); return pd.DataFrame()
 
-        # 데이터프레임 생성, 날짜 인덱스 설정 및 정렬
-        df = pd.DataFrame({'Date': dates, 'Close': prices}) # yfinance와 컬럼명 통일 위해 'Close' 사용
+        # 날짜 인덱스 설정 및 정렬
         df = df.set_index('Date')
         df = df.sort_index()
         print(f"Log: Gold price data loaded successfully ({len(df)} rows).")
@@ -677,12 +588,9 @@ if twr_data_df is not None and not twr_data_df.empty:
     total_twr_df = twr_data_df[twr_data_df['Account'] == 'Total'].sort_values(by='Date')
     if not total_twr_df.empty:
         start_date = total_twr_df['Date'].min(); end_date = total_twr_df['Date'].max()
-        # Yahoo Finance 데이터 다운로드
-        kospi_raw_data = download_yf_data(KOSPI_TICKER, start_date, end_date)
-        sp500_raw_data = download_yf_data(SP500_TICKER, start_date, end_date)
-        # 지수 TWR 계산
-        kospi_twr_df = calculate_index_twr(kospi_raw_data, KOSPI_TICKER)
-        sp500_twr_df = calculate_index_twr(sp500_raw_data, SP500_TICKER)
+        # 지수 TWR 계산 (두 지수 종가 1회 요청 + 일괄 벡터 연산)
+        index_twr = calculate_index_twr((KOSPI_TICKER, SP500_TICKER), start_date, end_date)
+        kospi_twr_df = index_twr.get(KOSPI_TICKER); sp500_twr_df = index_twr.get(SP500_TICKER)
         # 그래프 생성 (plotly.graph_objects 사용)
         fig_total_compare = go.Figure()
         # 전체 포트폴리오 라인
@@ -732,6 +640,7 @@ if twr_data_df is not None and not twr_data_df.empty:
                 if stock_code:
                     # 평단가 및 최초 매수일 계산
                     avg_cost = calculate_moving_avg_cost(gc, stock_code) if gc else 0.0
+                    avg_cost_series = get_avg_cost_series(gc, stock_code) if gc else pd.Series(dtype=float)
                     first_purchase_dt = get_first_purchase_date(gc, stock_code) if gc else None
 
                     if first_purchase_dt:
@@ -763,22 +672,11 @@ if twr_data_df is not None and not twr_data_df.empty:
                                 else: st.metric(label=f"{selected_stock_name} 평단가 (이동평균)", value="계산 불가")
                             else:
                                 st.info(f"{selected_stock_name}({yf_ticker}) 주가 데이터를 Yahoo Finance에서 로드합니다.")
-                                stock_price_data = download_yf_data(yf_ticker, chart_start_date, current_date) # 데이터 다운로드
-                                if stock_price_data is not None and not stock_price_data.empty:
-                                    # 종가 컬럼 찾기 (MultiIndex 핸들링 강화)
-                                    close_col_found = None
-                                    if isinstance(stock_price_data.columns, pd.MultiIndex):
-                                        level_zero = stock_price_data.columns.get_level_values(0)
-                                        if 'Adj Close' in level_zero: close_col_found = [c for c in stock_price_data.columns if c[0] == 'Adj Close'][0]
-                                        elif 'Close' in level_zero: close_col_found = [c for c in stock_price_data.columns if c[0] == 'Close'][0]
-                                    elif 'Adj Close' in stock_price_data.columns: close_col_found = 'Adj Close'
-                                    elif 'Close' in stock_price_data.columns: close_col_found = 'Close'
-
-                                    if close_col_found:
-                                        temp_df = stock_price_data[[close_col_found]].copy(); temp_df.columns = ['Close'] # 컬럼명 통일
-                                        close_price_df = temp_df.dropna(subset=['Close'])
-                                        plot_title = f"{selected_stock_name} ({yf_ticker}) 주가 추이 및 평단가"
-                                    else: st.warning(f"{selected_stock_name}({yf_ticker}) 데이터에서 종가 컬럼을 찾을 수 없습니다.")
+                                stock_closes = download_yf_closes((yf_ticker,), chart_start_date, current_date) # 데이터 다운로드
+                                stock_close_df = close_column_df(stock_closes, yf_ticker) # 'Close' 컬럼으로 통일
+                                if not stock_close_df.empty:
+                                    close_price_df = stock_close_df
+                                    plot_title = f"{selected_stock_name} ({yf_ticker}) 주가 추이 및 평단가"
                                 else: st.warning(f"{selected_stock_name}({yf_ticker}) 주가 데이터를 다운로드하지 못했습니다.")
 
                         # 그래프 출력 (데이터가 있을 경우 공통)
@@ -786,12 +684,14 @@ if twr_data_df is not None and not twr_data_df.empty:
                             fig_stock = go.Figure()
                             # 종가/가격 라인
                             fig_stock.add_trace(go.Scatter(x=close_price_df.index, y=close_price_df['Close'], mode='lines', name='종가/가격', line=dict(color='skyblue', width=2)))
-                            # 평단가 라인 (0보다 클 때만)
-                            if avg_cost > 0:
+                            # 평단가 추이 라인 (매매일지 기준 이동평균, 거래일 사이에는 직전 값 유지)
+                            if not avg_cost_series.empty:
                                 avg_cost_format = "{:,.2f}" if stock_code == 'GOLD' else "{:,.0f}" # 금은 소수점, 나머지는 정수
-                                fig_stock.add_hline(y=avg_cost, line_dash="dot", line_color="tomato",
-                                                    annotation_text=f"평단가: {avg_cost_format.format(avg_cost)}",
-                                                    annotation_position="bottom right")
+                                chart_dates = close_price_df.index.union(avg_cost_series.index)
+                                avg_cost_line = avg_cost_series.reindex(chart_dates).ffill().reindex(close_price_df.index)
+                                avg_cost_line = avg_cost_line.where(avg_cost_line > 0) # 미보유 구간은 선 끊기
+                                fig_stock.add_trace(go.Scatter(x=avg_cost_line.index, y=avg_cost_line, mode='lines', name=f"평단가 (현재: {avg_cost_format.format(avg_cost)})",
+                                                               line=dict(color='tomato', width=2, dash='dot', shape='hv')))
                             # 레이아웃 설정
                             fig_stock.update_layout(
                                 title=plot_title,
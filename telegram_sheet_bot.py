@@ -8,11 +8,19 @@ import re # 정규표현식
 from datetime import datetime
 import os # os 모듈 추가
 import sys # sys 모듈 추가 (종료용)
+import asyncio # 데몬 요청을 스레드에서 실행 (봇 이벤트 루프 차단 방지)
 
 # --- 텔레그램 유틸리티 임포트 ---
 import telegram_utils # 설정 로드 및 상태 알림 발송용
 # --- ---
 
+# --- 스케줄러 데몬 (/run, /status 명령용) ---
+try:
+    import scheduler_daemon
+except ImportError:
+    scheduler_daemon = None
+# --- ---
+
 # 텔레그램 라이브러리
 try:
     from telegram import Update
@@ -26,7 +34,9 @@ except ImportError:
 # 구글 시트 라이브러리
 try:
     import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
+    import sheets_client
+    from gspread.utils import a1_range_to_grid_range
+    from sheet_write_buffer import SheetWriteBuffer
 except ImportError:
     print("오류: 'gspread' 또는 'oauth2client' 라이브러리가 설치되지 않았습니다.")
     print("설치 방법: pip install gspread oauth2client")
@@ -53,11 +63,7 @@ logger = logging.getLogger(__name__)
 def setup_google_sheet():
     """구글 시트에 연결하고 워크시트 객체를 반환합니다."""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials)
-        spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-        worksheet = spreadsheet.worksheet(WORKSHEET_NAME)
+        worksheet = sheets_client.get_worksheet(WORKSHEET_NAME, GOOGLE_SHEET_NAME) # 공용 클라이언트 (인증/핸들 캐시)
         logger.info(f"Google Sheet '{GOOGLE_SHEET_NAME}/{WORKSHEET_NAME}' 연결 성공.")
         return worksheet
     except FileNotFoundError:
@@ -163,14 +169,19 @@ def append_to_sheet(worksheet, data):
             data.get("계좌", "미분류계좌"), "", data.get("종목코드", "")
         ]
         logger.info(f"시트에 추가할 데이터: {row_to_append}")
-        worksheet.append_row(row_to_append, value_input_option='USER_ENTERED')
+        append_response = worksheet.append_row(row_to_append, value_input_option='USER_ENTERED')
         logger.info(f"데이터 추가 성공: {row_to_append[:9]}...")
-        last_row = len(worksheet.get_all_values()) # 행 번호 확인
+        # 행 번호는 append 응답의 updatedRange에서 확인 (시트 전체 재조회 생략)
+        updated_range = append_response.get('updates', {}).get('updatedRange', '')
+        last_row = a1_range_to_grid_range(updated_range.split('!')[-1])['startRowIndex'] + 1 if updated_range else len(worksheet.col_values(1))
         logger.info(f"마지막 행 번호 확인: {last_row}")
         formula_c = f'=IFERROR(VLOOKUP(B{last_row},\'⚙️설정\'!Q:R,2,FALSE),"미분류")'
-        worksheet.update_acell(f'C{last_row}', formula_c); logger.info(f"C{last_row} 수식 입력: {formula_c}")
         formula_i = f'=IFERROR(VLOOKUP(B{last_row},\'⚙️설정\'!Q:S,3,FALSE),"미분류")'
-        worksheet.update_acell(f'I{last_row}', formula_i); logger.info(f"I{last_row} 수식 입력: {formula_i}")
+        write_buffer = SheetWriteBuffer() # C, I열 수식을 1회 호출로 입력
+        pending_ranges = [write_buffer.update_cell(worksheet, f'C{last_row}', formula_c), write_buffer.update_cell(worksheet, f'I{last_row}', formula_i)]
+        write_buffer.flush()
+        if not write_buffer.succeeded(*pending_ranges): logger.error(f"{last_row}행 C/I열 수식 입력 실패."); return False
+        logger.info(f"C{last_row} 수식 입력: {formula_c}"); logger.info(f"I{last_row} 수식 입력: {formula_i}")
         return True
     except gspread.exceptions.APIError as e: logger.error(f"구글 시트 API 오류 (추가/업데이트 중): {e}"); return False
     except Exception as e: logger.error(f"구글 시트 데이터 추가/수식 입력 중 오류: {e}"); traceback.print_exc(); return False
@@ -184,6 +195,38 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         rf"안녕하세요, {user.mention_html()}님! 👋 증권사 체결 문자를 전달해주시면 '{WORKSHEET_NAME}' 시트에 기록해 드릴게요.",
     )
 
+def is_authorized_chat(update: Update):
+    """설정 파일(telegram_config.yaml)의 chat_id와 같은 채팅에서 온 요청인지 확인 (데몬 실행/상태 명령어 제한)"""
+    _, allowed_chat_id = telegram_utils.get_telegram_credentials()
+    chat = update.effective_chat
+    return bool(allowed_chat_id) and chat is not None and str(chat.id) == str(allowed_chat_id).strip()
+
+async def run_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/run [단계,...] [force] 명령어: 스케줄러 데몬에 일일 파이프라인 실행 요청 (결과는 데몬이 알림)"""
+    if not is_authorized_chat(update):
+        logger.warning(f"허용되지 않은 채팅({update.effective_chat.id if update.effective_chat else None})의 /run 요청 거부")
+        await update.message.reply_text("⛔ 이 채팅에서는 실행 요청을 할 수 없습니다."); return
+    if scheduler_daemon is None: await update.message.reply_text("⚠️ scheduler_daemon.py 모듈이 없어 실행 요청을 보낼 수 없습니다."); return
+    args = [arg.strip() for arg in (context.args or [])]
+    force = 'force' in args
+    steps = [name.strip() for arg in args if arg != 'force' for name in arg.split(',') if name.strip()] or None
+    logger.info(f"사용자({update.effective_user.id}) 파이프라인 실행 요청: 단계={steps or '전체'}, force={force}")
+    ok, message = await asyncio.to_thread(scheduler_daemon.request_run, steps, force, False, f"텔레그램 ({update.effective_user.id})")
+    await update.message.reply_text(f"{'✅' if ok else '❌'} {message}")
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/status 명령어: 스케줄러 데몬 상태 (실행 중 작업, 대기열, 최근 실행, 토큰 만료 시각)"""
+    if not is_authorized_chat(update):
+        logger.warning(f"허용되지 않은 채팅({update.effective_chat.id if update.effective_chat else None})의 /status 요청 거부")
+        await update.message.reply_text("⛔ 이 채팅에서는 상태를 조회할 수 없습니다."); return
+    if scheduler_daemon is None: await update.message.reply_text("⚠️ scheduler_daemon.py 모듈이 없어 상태를 조회할 수 없습니다."); return
+    status = await asyncio.to_thread(scheduler_daemon.request_status)
+    if not status: await update.message.reply_text("❌ 스케줄러 데몬에 연결할 수 없습니다."); return
+    lines = [f"🕒 데몬 시작: {status.get('started_at')}", f"▶️ 실행 중: {status.get('running') or '없음'} (대기열: {status.get('queued', 0)})"]
+    lines += [f"🔑 {acc_name} 토큰 만료: {expiry or '없음'}" for acc_name, expiry in status.get('token_expiry', {}).items()]
+    lines += [f"{'✅' if run['status'] == 'success' else '❌'} {run['finished_at']} ({run['source']})" for run in status.get('recent_runs', [])[-3:]]
+    await update.message.reply_text("\n".join(lines))
+
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """사용자로부터 텍스트 메시지 수신 시 처리"""
     message_text = update.message.text
@@ -255,6 +298,8 @@ def main() -> None:
 
         # 핸들러 등록
         application.add_handler(CommandHandler("start", start_command)) # /start 명령어 처리
+        application.add_handler(CommandHandler("run", run_command)) # /run 명령어: 스케줄러 데몬에 파이프라인 실행 요청
+        application.add_handler(CommandHandler("status", status_command)) # /status 명령어: 스케줄러 데몬 상태
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler)) # 텍스트 메시지 처리
 
         # 봇 실행 시작 (폴링 방식)
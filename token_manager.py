@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# token_manager.py: 증권사 API 접근 토큰 공용 관리 (프로세스 내 메모리 캐시 + 프로세스 간 토큰 파일 공유)
+# - 토큰은 메모리에 보관하여 API 호출마다 토큰 파일 / 설정 파일을 다시 읽지 않음
+# - 발급은 토큰 파일 잠금(<토큰 파일>.lock) 안에서만 수행: 동시에 실행 중인 다른 스크립트가 먼저 발급했으면 파일의 새 토큰을 그대로 사용 (중복 발급 / 덮어쓰기 방지)
+# - 토큰 파일은 임시 파일에 쓴 뒤 교체(os.replace)하여 읽는 쪽이 반쯤 쓰인 파일을 보지 않음
+# - 백그라운드 스레드가 만료 REFRESH_AHEAD 전에 미리 재발급 → API 호출 경로에서 발급을 기다리지 않음
+# - 사용: kis_auth_pension.py, kis_auth_irp.py, kiwoom_auth_isa.py (각 모듈이 발급 / 파일 읽기 / 파일 쓰기 함수를 register()로 등록)
+
+import os
+import time
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+if os.name == 'nt':
+    import msvcrt
+    fcntl = None
+else:
+    import fcntl
+    msvcrt = None
+
+# --- 설정 ---
+REFRESH_AHEAD = timedelta(minutes=30) # 만료까지 이 시간보다 적게 남은 (사용 중인) 토큰은 백그라운드에서 재발급
+MIN_VALID_REMAINING = timedelta(seconds=60) # 남은 시간이 이보다 적은 토큰은 사용하지 않음 (즉시 재발급)
+REFRESH_CHECK_INTERVAL_SECONDS = 60 # 백그라운드 만료 확인 간격
+LOCK_TIMEOUT_SECONDS = 30; LOCK_RETRY_INTERVAL = 0.1 # 토큰 파일 잠금 대기
+# --- ---
+
+_registry_lock = threading.Lock()
+_providers = {} # {이름: {'path', 'issue', 'load', 'save', 'lock'}}
+_tokens = {} # {이름: (토큰, 만료 시각)}
+_tokens_lock = threading.Lock() # _tokens 쓰기 / 전체 순회용 스냅샷 (백그라운드 갱신 스레드와 API 호출 스레드가 동시에 접근)
+_refresh_thread = None
+
+# --- 파일 잠금 / 원자적 쓰기 ---
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT_SECONDS):
+    """프로세스 간 배타 잠금 (<path>.lock 파일). timeout 초 안에 잠그지 못하면 TimeoutError"""
+    lock_path = path + '.lock'; deadline = time.time() + timeout
+    with open(lock_path, 'a+') as handle:
+        while True:
+            try:
+                if msvcrt: handle.seek(0); msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                else: fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.time() >= deadline: raise TimeoutError(f"토큰 파일 잠금 대기 시간 초과: {lock_path}")
+                time.sleep(LOCK_RETRY_INTERVAL)
+        try: yield
+        finally:
+            if msvcrt: handle.seek(0); msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+            else: fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+def atomic_write(path, text):
+    """같은 폴더의 임시 파일에 쓴 뒤 교체 (쓰는 도중 다른 프로세스가 읽어도 이전 내용 또는 새 내용만 보임)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: f.write(text); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+# --- ---
+
+# --- 토큰 관리 ---
+def register(name, path, issue, load, save):
+    """
+    토큰 등록 (모듈 로드 시 1회).
+    issue(): 새 토큰 발급 → (토큰, 만료 시각 datetime), 실패 시 (None, None)
+    load(): 토큰 파일 읽기 → (토큰, 만료 시각 datetime), 없으면 (None, None)
+    save(토큰, 만료 시각): 토큰 파일 쓰기 (atomic_write 사용)
+    """
+    with _registry_lock:
+        if name not in _providers: _providers[name] = {'path': path, 'issue': issue, 'load': load, 'save': save, 'lock': threading.Lock()}
+
+def _usable(entry, margin):
+    token, expires_at = entry if entry else (None, None)
+    return bool(token) and expires_at is not None and expires_at - datetime.now() > margin
+
+def _refresh(name, force_new=False, margin=MIN_VALID_REMAINING):
+    """
+    잠금(스레드 + 파일) 안에서 토큰 파일을 다시 확인하고, 쓸 수 있는 토큰이 없을 때만 발급합니다.
+    force_new=True 여도 잠금을 기다리는 동안 다른 스레드 / 프로세스가 새로 발급한 토큰(호출 시점의 토큰과 다른 토큰)이 있으면 그 토큰을 사용합니다.
+    """
+    provider = _providers[name]
+    seen = _tokens.get(name) # 호출 시점의 토큰 (잠금 대기 중 다른 곳에서 갱신됐는지 판단)
+    with provider['lock']:
+        known = _tokens.get(name)
+        refreshed_here = known is not None and (seen is None or known[0] != seen[0])
+        if (not force_new or refreshed_here) and _usable(known, margin): return known[0] # 다른 스레드가 이미 갱신
+        try:
+            with file_lock(provider['path']):
+                on_file = provider['load']()
+                refreshed_elsewhere = on_file[0] and (seen is None or on_file[0] != seen[0])
+                if _usable(on_file, margin) and (not force_new or refreshed_elsewhere): _set_token(name, on_file); return on_file[0]
+                issued = provider['issue']()
+                if not issued or not issued[0]: print(f"❌ [토큰] {name} 발급 실패"); return known[0] if _usable(known, MIN_VALID_REMAINING) else None
+                provider['save'](*issued); _set_token(name, tuple(issued))
+                print(f"✅ [토큰] {name} 발급 완료 (만료: {issued[1]})")
+                return issued[0]
+        except TimeoutError as e:
+            print(f"❌ [토큰] {e}")
+            return known[0] if _usable(known, MIN_VALID_REMAINING) else None
+
+def _set_token(name, entry):
+    with _tokens_lock: _tokens[name] = entry
+
+def _snapshot_tokens():
+    with _tokens_lock: return dict(_tokens)
+
+def get_token(name, force_new=False):
+    """유효한 토큰 반환 (메모리 → 토큰 파일 → 새 발급 순). 실패 시 None"""
+    entry = _tokens.get(name)
+    token = entry[0] if not force_new and _usable(entry, MIN_VALID_REMAINING) else _refresh(name, force_new=force_new)
+    _ensure_refresh_thread()
+    return token
+
+def get_expiry(name):
+    """토큰 만료 시각 (메모리에 없으면 토큰 파일에서). 없으면 None"""
+    entry = _tokens.get(name)
+    if entry and entry[1]: return entry[1]
+    provider = _providers.get(name)
+    return provider['load']()[1] if provider else None
+
+def refresh_due(ahead=REFRESH_AHEAD):
+    """사용 중인 토큰 중 만료까지 ahead 이하로 남은 토큰 재발급 (다른 프로세스가 이미 갱신했으면 파일에서 읽음). {이름: 만료 시각} 반환"""
+    for name, entry in _snapshot_tokens().items():
+        if entry and entry[0] and not _usable(entry, ahead):
+            try: _refresh(name, margin=ahead)
+            except Exception as e: print(f"❌ [토큰] {name} 미리 갱신 중 오류: {e}"); traceback.print_exc()
+    return {name: entry[1] for name, entry in _snapshot_tokens().items()}
+
+def _refresh_loop():
+    while True: # 한 번의 오류로 스레드가 끝나지 않도록 매 회차 예외 처리 (끝나면 만료 갱신이 API 호출 경로로 넘어감)
+        time.sleep(REFRESH_CHECK_INTERVAL_SECONDS)
+        try: refresh_due()
+        except Exception as e: print(f"❌ [토큰] 백그라운드 갱신 중 오류 (다음 확인 때 재시도): {e}"); traceback.print_exc()
+
+def _ensure_refresh_thread():
+    """백그라운드 미리 갱신 스레드 시작 (프로세스당 1회)"""
+    global _refresh_thread
+    with _registry_lock:
+        if _refresh_thread is None:
+            _refresh_thread = threading.Thread(target=_refresh_loop, name='token-refresh', daemon=True); _refresh_thread.start()
+# --- ---
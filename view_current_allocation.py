@@ -7,11 +7,12 @@ import os
 import sys
 from datetime import datetime
 import pandas as pd
+from sheet_decode import clean_num_str, to_numeric_series, to_date_series # 시트/API 값 숫자·날짜 변환 공용 규칙
 
 # 외부 라이브러리 임포트
 try:
     import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
+    import sheets_client
 except ImportError:
     print("오류: 'gspread' 또는 'oauth2client' 라이브러리가 필요합니다.")
     print("설치: pip install gspread oauth2client")
@@ -46,26 +47,10 @@ ACCOUNTS = {
 # --- ---
 
 # --- 유틸리티 함수 ---
-def clean_num_str(num_str, type_func=int):
-    """숫자 변환 함수"""
-    if isinstance(num_str, (int, float)): return num_str
-    if not num_str: return type_func(0)
-    try:
-        cleaned_str = str(num_str).replace(',', '')
-        is_negative = cleaned_str.startswith('-')
-        cleaned = cleaned_str.lstrip('-').lstrip('0')
-        if not cleaned: return type_func(0)
-        value = type_func(cleaned)
-        return -value if is_negative else value
-    except (ValueError, TypeError): return type_func(0)
-
 def connect_google_sheets():
-    """구글 시트 연결 객체 반환"""
+    """구글 시트 연결 객체 반환 (공용 클라이언트 sheets_client 사용)"""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(JSON_KEYFILE_PATH, scope)
-        gc = gspread.authorize(credentials)
-        return gc
+        return sheets_client.get_client()
     except FileNotFoundError: print(f"❌ 오류: 키 파일({JSON_KEYFILE_PATH}) 없음."); return None
     except Exception as e: print(f"❌ 구글 시트 연결 오류: {e}"); traceback.print_exc(); return None
 
@@ -111,22 +96,21 @@ def main():
             elif acc_info['type'] == 'KIS_IRP':
                 current_result = kis_api_irp.get_inquire_present_balance_irp() # TTTC2202R (DataFrame)
                 if isinstance(current_result, pd.DataFrame) and not current_result.empty and 'evlu_amt' in current_result.columns:
-                    current_result['evlu_amt_num'] = current_result['evlu_amt'].apply(lambda x: clean_num_str(x, int))
+                    current_result['evlu_amt_num'] = to_numeric_series(current_result['evlu_amt'], int)
                     current_balance = current_result['evlu_amt_num'].sum()
                     print(f"    - API(TTTC2202R) 성공. 보유종목 평가액 합계: {current_balance:,} 원")
                 else: print(f"    - API(TTTC2202R) 실패.")
             api_results[acc_name] = current_result; account_current_balances[acc_name] = current_balance
-            time.sleep(0.21)
         except Exception as e_fetch: print(f"  🔥 {acc_name} 조회 오류: {e_fetch}"); traceback.print_exc(); api_results[acc_name] = None; account_current_balances[acc_name] = 0
 
     # 금현물 조회
     print(f"  > 금현물: 최신 평가액 조회 중..."); gold_balance = 0; gc = connect_google_sheets()
     if gc:
         try:
-            spreadsheet = gc.open(GOOGLE_SHEET_NAME); gold_ws = spreadsheet.worksheet(GOLD_SHEET)
+            spreadsheet = sheets_client.get_spreadsheet(GOOGLE_SHEET_NAME, client=gc); gold_ws = sheets_client.get_worksheet(GOLD_SHEET)
             gold_data = gold_ws.get_all_records(expected_headers=['날짜', '평가액'])
             if gold_data:
-                df_gold = pd.DataFrame(gold_data); df_gold['날짜_dt'] = pd.to_datetime(df_gold['날짜'], errors='coerce')
+                df_gold = pd.DataFrame(gold_data); df_gold['날짜_dt'] = to_date_series(df_gold['날짜'])
                 latest_gold_row = df_gold.loc[df_gold['날짜_dt'].idxmax()]
                 if pd.notna(latest_gold_row['날짜_dt']):
                     gold_balance = clean_num_str(latest_gold_row['평가액']); latest_date_str = latest_gold_row['날짜_dt'].strftime('%Y-%m-%d')
@@ -142,8 +126,7 @@ def main():
     asset_map = {}; target_allocation_combined = {} # 목표 비중: {(자산구분, 국적구분): 목표%} 형태
     if gc:
         try:
-            if not 'spreadsheet' in locals(): spreadsheet = gc.open(GOOGLE_SHEET_NAME)
-            settings_ws = spreadsheet.worksheet(SETTINGS_SHEET); settings_values = settings_ws.get_all_values()
+            settings_ws = sheets_client.get_worksheet(SETTINGS_SHEET); settings_values = settings_ws.get_all_values()
             if len(settings_values) > 1:
                 header = settings_values[0]
                 col_idx = {'종목코드': 17, '종목명': 16, '구분': 18, '국적구분': 19, '목표비중': 22}